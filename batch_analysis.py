@@ -0,0 +1,254 @@
+"""
+Headless batch scoring of recorded dash-cam footage.
+
+Every video is split into frame ranges that are processed in a process pool
+(one dlib model load per worker). The per-frame EAR values are merged back in
+frame order and replayed through the same state machine used live, and a
+JSON report plus a per-frame CSV is written for every input file.
+
+    python batch_analysis.py recordings/ --workers 8 --out reports/
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from drowsiness import (MODEL_68, DlibLandmarkExtractor, DrowsinessStateMachine, ModelManager,
+                        TrackingFaceDetector, VideoFileSource, batch_eye_aspect_ratio)
+from drowsiness.state import EVENT_ALARM_STOPPED, EVENT_HIGH_ALARM, EVENT_LOW_ALARM
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".mpeg", ".wmv")
+
+# --- Per-worker models (loaded once by _init_worker) ---
+_hog = None
+_landmarks = None
+
+
+# -------------------------------------------------------------------------
+def _init_worker(model):
+    global _hog, _landmarks
+
+    # Each worker is already one process; keep OpenCV from spawning more threads
+    cv2.setNumThreads(1)
+    models = ModelManager.instance()
+    _hog = models.detector()
+    _landmarks = DlibLandmarkExtractor(model)
+
+
+def _process_range(path, start, end):
+    """
+    Runs detection + landmarks on frames [start, end) of one video.
+    Returns (start, landmarks (n, 68, 2) int32, found (n,) bool).
+    """
+    n = end - start
+    landmarks = np.zeros((n, 68, 2), dtype=np.int32)
+    found = np.zeros(n, dtype=bool)
+
+    source = VideoFileSource(path, start_frame=start)
+    if not source.open():
+        return start, landmarks, found
+    detector = TrackingFaceDetector(hog_detector=_hog)
+
+    gray = None
+    for i in range(n):
+        ret, frame, _ = source.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+
+        face = detector.detect(gray)
+        if face is None:
+            continue
+        landmarks[i] = _landmarks.extract(gray, face)
+        found[i] = True
+
+    source.close()
+    return start, landmarks, found
+
+
+# -------------------------------------------------------------------------
+def find_videos(inputs):
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if name.lower().endswith(VIDEO_EXTENSIONS):
+                        videos.append(os.path.join(root, name))
+        elif os.path.isfile(item):
+            videos.append(item)
+        else:
+            print(f"WARNING: '{item}' not found, skipping")
+    return videos
+
+
+def video_info(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return frames, fps
+
+
+def split_ranges(total_frames, chunk_frames):
+    return [(start, min(start + chunk_frames, total_frames))
+            for start in range(0, total_frames, chunk_frames)]
+
+
+def score_timeline(ears, found, fps, state=None):
+    """
+    Replays merged per-frame EAR through the drowsiness state machine.
+    Returns the list of alarm events with frame index and time in seconds.
+    """
+    if state is None:
+        state = DrowsinessStateMachine()
+
+    events = []
+    for i in range(len(ears)):
+        t = i / fps
+        if not found[i]:
+            state.no_face(t)
+            continue
+        ear = round(float(ears[i]), 2)
+        event = state.update(ear, t)
+        if event is not None:
+            events.append({"frame": i, "time_s": round(t, 3), "event": event, "ear": ear})
+    return events
+
+
+# -------------------------------------------------------------------------
+def write_report(path, out_dir, fps, ears, found, events, elapsed):
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+
+    with open(base + ".frames.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "time_s", "face", "left_ear", "right_ear", "ear"])
+        for i in range(len(ears)):
+            if found[i]:
+                writer.writerow([i, f"{i / fps:.3f}", 1, f"{ears[i, 0]:.4f}",
+                                 f"{ears[i, 1]:.4f}", f"{ears[i].mean():.4f}"])
+            else:
+                writer.writerow([i, f"{i / fps:.3f}", 0, "", "", ""])
+
+    valid = ears[found]
+    report = {
+        "video": os.path.abspath(path),
+        "frames": int(len(ears)),
+        "fps": fps,
+        "frames_with_face": int(found.sum()),
+        "mean_ear": float(valid.mean()) if len(valid) else None,
+        "high_alarms": sum(e["event"] == EVENT_HIGH_ALARM for e in events),
+        "low_alarms": sum(e["event"] == EVENT_LOW_ALARM for e in events),
+        "alarms_stopped": sum(e["event"] == EVENT_ALARM_STOPPED for e in events),
+        "events": events,
+        "processing_time_s": round(elapsed, 2),
+    }
+    with open(base + ".report.json", "w") as f:
+        json.dump(report, f, indent=2)
+    return base + ".report.json"
+
+
+def analyse(videos, out_dir, workers=None, chunk_frames=900, model=MODEL_68):
+    """
+    Scores every video and writes its report. A video whose frames could
+    not all be processed gets no report; returns {path: error} for those.
+    """
+    jobs = {}
+    for path in videos:
+        info = video_info(path)
+        if info is None or info[0] <= 0:
+            print(f"WARNING: Could not open '{path}', skipping")
+            continue
+        jobs[path] = {"frames": info[0], "fps": info[1], "parts": [],
+                      "pending": 0, "started": time.time(), "error": None}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model,)) as pool:
+        futures = {}
+        for path, job in jobs.items():
+            for start, end in split_ranges(job["frames"], chunk_frames):
+                futures[pool.submit(_process_range, path, start, end)] = path
+                job["pending"] += 1
+
+        for future in as_completed(futures):
+            path = futures[future]
+            job = jobs[path]
+            job["pending"] -= 1
+            try:
+                part = future.result()
+                if job["error"] is None:
+                    job["parts"].append(part)
+            except Exception as e:
+                # One corrupt video (or a crashed worker) must not end the batch
+                if job["error"] is None:
+                    print(f"WARNING: Could not analyse '{path}': {e!r}")
+                job["error"] = repr(e)
+                job["parts"] = []
+            if job["pending"]:
+                continue
+            if job["error"] is not None:
+                print(f"✗ {os.path.basename(path)}: failed, no report written")
+                continue
+
+            # All ranges of this video are done: merge in frame order
+            job["parts"].sort(key=lambda part: part[0])
+            landmarks = np.concatenate([part[1] for part in job["parts"]])
+            found = np.concatenate([part[2] for part in job["parts"]])
+            job["parts"] = []
+
+            ears = np.zeros((len(found), 2))
+            if found.any():
+                ears[found] = batch_eye_aspect_ratio(landmarks[found])
+            # A degenerate eye (zero width) gives no EAR: count the frame as
+            # no face rather than as closed eyes
+            found &= np.isfinite(ears).all(axis=1)
+            ears[~found] = 0.0
+
+            events = score_timeline(ears.mean(axis=1), found, job["fps"])
+            elapsed = time.time() - job["started"]
+            report = write_report(path, out_dir, job["fps"], ears, found, events, elapsed)
+            print(f"✓ {os.path.basename(path)}: {len(found)} frames, "
+                  f"{len(events)} alarm events -> {report}")
+
+    return {path: job["error"] for path, job in jobs.items() if job["error"] is not None}
+
+
+# -------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Offline drowsiness scoring of video files")
+    parser.add_argument("inputs", nargs="+", help="video files or directories")
+    parser.add_argument("--out", default="reports", help="output directory for reports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--chunk-frames", type=int, default=900,
+                        help="frames per work unit")
+    parser.add_argument("--model", default=MODEL_68,
+                        help="68-point shape predictor (file name on the model search path or a path)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("ERROR: No video files found")
+        return 1
+
+    print(f"Analysing {len(videos)} video(s) with {args.workers} worker(s)...")
+    start = time.time()
+    failed = analyse(videos, args.out, workers=args.workers,
+                     chunk_frames=args.chunk_frames, model=args.model)
+    print(f"[DONE] {time.time() - start:.1f}s")
+    if failed:
+        print(f"ERROR: {len(failed)} video(s) failed: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,456 @@
+"""
+Reproducible, headless benchmark of the drowsiness pipeline.
+
+Replays local video clips (or synthetic frames) through
+capture -> gray -> detect -> landmarks -> EAR -> state machine and reports
+frames/second, per-stage latency, memory (each run's sampled peak RSS and
+its RSS growth) and alert-onset latency. Results are saved as JSON so runs
+can be compared with --compare.
+
+Synthetic mode needs no camera, display, audio or model file: the frames
+still go through the real face detector, and the landmark stage is fed
+landmarks generated from a scripted EAR trace with known eye-closure onsets.
+
+For clips, an optional sidecar `<clip>.json` with
+{"closure_onsets_s": [12.5, 40.0]} enables onset-latency measurement.
+Alarms more than ALARM_SLACK_S after a closure (or outside the synthetic
+fatigue period) count as false alarms.
+
+--filters compares landmark / EAR filter combinations (see
+drowsiness/filters.py); --landmark-noise adds pixel jitter to the synthetic
+landmarks, as a real landmark fit would. --detectors times the face
+detector backends (drowsiness/detectors.py) on frames sampled from each clip.
+
+    python benchmark.py --synthetic 1800
+    python benchmark.py --synthetic 3600 --landmark-noise 1.0 --filters all
+    python benchmark.py --clips bench_clips/
+    python benchmark.py --clips bench_clips/ --detectors all
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+from drowsiness import (MODEL_68, DlibLandmarkExtractor, FaceDetector, FrameSource, LandmarkExtractor,
+                        Pipeline, RateGovernor, StageProfiler, TrackingFaceDetector, VideoFileSource)
+from drowsiness.detectors import RECALL_FLOOR, available_backends, benchmark_backends
+from drowsiness.ear import LEFT_EYE, RIGHT_EYE
+from drowsiness.filters import make_filters
+from drowsiness.models import current_rss_mb
+from drowsiness.state import EVENT_HIGH_ALARM, EVENT_LOW_ALARM
+
+RESULTS_DIR = "bench_results"
+
+# --- Synthetic scenario (seconds) ---
+OPEN_EAR = 0.34
+BLINK_EAR = 0.12
+CLOSED_EAR = 0.18
+FATIGUE_EAR = 0.28
+BLINK_EVERY = 4.0
+BLINK_LENGTH = 0.15
+CLOSURE_LENGTH = 3.0
+FATIGUE_PERIOD = (16.0, 24.0)
+ALARM_SLACK_S = 1.0
+
+# --filters all: landmark filter + EAR filter combinations
+FILTER_COMBOS = ("none+none", "one-euro+none", "none+median", "none+ema", "one-euro+median")
+
+
+# -------------------------------------------------------------------------
+def process_peak_rss_mb():
+    """Highest RSS of the whole process so far (it never goes down), or None."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / (1024 * 1024)
+    return rss / 1024
+
+
+class RssSampler:
+    """
+    Memory of one run: RSS before, after and the highest value sampled every
+    `every` frames in between. Unlike ru_maxrss this is per run, so a run
+    does not inherit the peak of the runs before it.
+    """
+
+    def __init__(self, every=30):
+        self.every = every
+        self.start = self.peak = current_rss_mb()
+        self._frames = 0
+
+    def sample(self):
+        self._frames += 1
+        if self.start is not None and self._frames % self.every == 0:
+            self.peak = max(self.peak, current_rss_mb())
+
+    def result(self):
+        if self.start is None:
+            return None, None
+        end = current_rss_mb()
+        self.peak = max(self.peak, end)
+        return round(self.peak, 1), round(end - self.start, 1)
+
+
+def synthetic_ear_trace(n_frames, fps, seed=0):
+    """
+    Scripted EAR: eyes open with small noise and regular blinks, plus 3 s
+    eye closures every 20 s (from t=10 s) and an 8 s fatigue period at 16 s.
+    Returns (ears, closure_onsets_s).
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_frames) / fps
+    ears = OPEN_EAR + rng.normal(0.0, 0.008, n_frames)
+
+    ears[(t % BLINK_EVERY) < BLINK_LENGTH] = BLINK_EAR
+
+    onsets = []
+    for onset in np.arange(10.0, t[-1] - 4.0, 20.0):
+        ears[(t >= onset) & (t < onset + CLOSURE_LENGTH)] = CLOSED_EAR + rng.normal(0.0, 0.005)
+        onsets.append(float(onset))
+
+    # One long fatigue period (no blinks) between the first two closures
+    fatigue = (t >= FATIGUE_PERIOD[0]) & (t < FATIGUE_PERIOD[1])
+    ears[fatigue] = FATIGUE_EAR + rng.normal(0.0, 0.004, int(fatigue.sum()))
+
+    return ears, onsets
+
+
+def synthetic_landmarks(ear, out):
+    """Writes a (68, 2) landmark array whose eyes have the given EAR."""
+    width = 30.0
+    h = ear * width / 2.0
+    for eye, x0 in ((LEFT_EYE, 250.0), (RIGHT_EYE, 360.0)):
+        y0 = 200.0
+        out[eye] = ((x0, y0), (x0 + width / 3, y0 - h), (x0 + 2 * width / 3, y0 - h),
+                    (x0 + width, y0), (x0 + 2 * width / 3, y0 + h), (x0 + width / 3, y0 + h))
+    return out
+
+
+def synthetic_frames(width, height, count=8, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = rng.integers(0, 255, (count, height, width, 3), dtype=np.uint8)
+    return [cv2.GaussianBlur(f, (9, 9), 0) for f in frames]
+
+
+def onset_latencies(events, onsets, max_delay=10.0):
+    """Delay from each ground-truth closure onset to the first high alarm after it."""
+    alarm_times = [e["time_s"] for e in events if e["event"] == EVENT_HIGH_ALARM]
+    latencies = []
+    for onset in onsets:
+        after = [a for a in alarm_times if onset <= a <= onset + max_delay]
+        latencies.append(round((after[0] - onset) * 1000.0, 1) if after else None)
+    return latencies
+
+
+def false_alarms(events, onsets, extra_windows=()):
+    """Alarms that start outside every closure (and `extra_windows`) plus ALARM_SLACK_S."""
+    windows = [(onset, onset + CLOSURE_LENGTH + ALARM_SLACK_S) for onset in onsets]
+    windows += [(start, end + ALARM_SLACK_S) for start, end in extra_windows]
+    return sum(1 for e in events
+               if e["event"] in (EVENT_HIGH_ALARM, EVENT_LOW_ALARM)
+               and not any(start <= e["time_s"] <= end for start, end in windows))
+
+
+# -------------------------------------------------------------------------
+class SyntheticFrameSource(FrameSource):
+    """Cycles through a few pre-generated noise frames; timestamps are i / fps."""
+
+    def __init__(self, n_frames, fps=30.0, width=640, height=480, seed=0):
+        self.n_frames = n_frames
+        self.fps = fps
+        self._pool = synthetic_frames(width, height, seed=seed)
+        self._frame = np.empty_like(self._pool[0])
+        self.index = 0
+
+    def read(self):
+        if self.index >= self.n_frames:
+            return False, None, 0.0
+        np.copyto(self._frame, self._pool[self.index % len(self._pool)])
+        timestamp = self.index / self.fps
+        self.index += 1
+        return True, self._frame, timestamp
+
+
+class ScriptedFaceDetector(FaceDetector):
+    """
+    Runs the real detector (so its cost is measured) but always reports a
+    fixed face box, because the synthetic frames contain no real face.
+    """
+
+    def __init__(self, detector):
+        import dlib
+        self.detector = detector
+        self.box = dlib.rectangle(220, 120, 420, 320)
+
+    def detect(self, gray):
+        self.detector.detect(gray)
+        return self.box
+
+    def stats(self):
+        return self.detector.stats()
+
+
+class ScriptedLandmarkExtractor(LandmarkExtractor):
+    """
+    Produces landmarks whose EAR follows the scripted trace for the source's
+    current frame, with optional Gaussian jitter of `noise_px` pixels.
+    """
+
+    def __init__(self, ears, source, noise_px=0.0, seed=0):
+        self.ears = ears
+        self.source = source
+        self.noise_px = noise_px
+        self._rng = np.random.default_rng(seed)
+        self._landmarks = np.zeros((68, 2), dtype=np.float64)
+        self._noise = np.zeros((68, 2), dtype=np.float64)
+
+    def extract(self, gray, face):
+        ear = self.ears[min(self.source.index - 1, len(self.ears) - 1)]
+        synthetic_landmarks(ear, self._landmarks)
+        if self.noise_px:
+            self._rng.standard_normal(out=self._noise)
+            self._noise *= self.noise_px
+            self._landmarks += self._noise
+        return self._landmarks
+
+
+# -------------------------------------------------------------------------
+def _result(name, profiler, frames, wall, events, onsets, fps, governor=None, extra_windows=(),
+            rss=None):
+    summary = profiler.summary()
+    peak_rss, rss_delta = rss.result() if rss is not None else (None, None)
+    result = {
+        "name": name,
+        "frames": frames,
+        "media_fps": fps,
+        "wall_time_s": round(wall, 3),
+        "throughput_fps": round(frames / wall, 2) if wall > 0 else 0.0,
+        "stages": summary["stages"],
+        "events": events,
+        "high_alarms": sum(e["event"] == EVENT_HIGH_ALARM for e in events),
+        "low_alarms": sum(e["event"] == EVENT_LOW_ALARM for e in events),
+        "closure_onsets_s": onsets,
+        "onset_latency_ms": onset_latencies(events, onsets),
+        "false_alarms": false_alarms(events, onsets, extra_windows),
+        "peak_rss_mb": peak_rss,
+        "rss_delta_mb": rss_delta,
+    }
+    if governor is not None:
+        result["governor"] = governor.stats()
+    return result
+
+
+def run_pipeline(name, pipeline, onsets, fps, window, extra_windows=()):
+    """Runs `pipeline` to the end of its source and collects the results."""
+    events = []
+    rss = RssSampler()
+
+    def on_frame(result):
+        rss.sample()
+        if result.event is not None:
+            events.append({"frame": result.index - 1, "time_s": round(result.timestamp, 3),
+                           "event": result.event, "ear": result.ear})
+
+    pipeline.profiler = StageProfiler(window=max(window, 1))
+    if not pipeline.open():
+        print(f"WARNING: Could not open source for '{name}', skipping")
+        return None
+
+    start = time.perf_counter()
+    frames = pipeline.run(on_frame)
+    wall = time.perf_counter() - start
+    pipeline.close()
+
+    return _result(name, pipeline.profiler, frames, wall, events, onsets, fps, pipeline.governor,
+                   extra_windows, rss)
+
+
+def run_synthetic(n_frames, fps=30.0, width=640, height=480, seed=0, adaptive=False,
+                  landmark_noise=0.0, filters="none+none"):
+    ears, onsets = synthetic_ear_trace(n_frames, fps, seed)
+    source = SyntheticFrameSource(n_frames, fps, width, height, seed)
+    landmark_filter, ear_filter = make_filters(*filters.split("+"))
+    pipeline = Pipeline(source,
+                        ScriptedFaceDetector(TrackingFaceDetector()),
+                        ScriptedLandmarkExtractor(ears, source, landmark_noise, seed),
+                        governor=RateGovernor() if adaptive else None,
+                        landmark_filter=landmark_filter, ear_filter=ear_filter)
+    name = "synthetic-adaptive" if adaptive else "synthetic"
+    if filters != "none+none":
+        name += f" [{filters}]"
+    fatigue = [FATIGUE_PERIOD] if n_frames / fps > FATIGUE_PERIOD[0] else []
+    return run_pipeline(name, pipeline, onsets, fps, n_frames, fatigue)
+
+
+def run_clip(path, landmarks, adaptive=False):
+    source = VideoFileSource(path)
+    if not source.open():
+        print(f"WARNING: Could not open '{path}', skipping")
+        return None
+    total = int(source.cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 10000
+    source.close()
+
+    onsets = []
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            onsets = json.load(f).get("closure_onsets_s", [])
+
+    pipeline = Pipeline(source, TrackingFaceDetector(), landmarks,
+                        governor=RateGovernor() if adaptive else None)
+    return run_pipeline(os.path.basename(path), pipeline, onsets, source.fps, total)
+
+
+def run_detectors(path, backends, samples=30):
+    """Detector backend timing / recall on `samples` frames spread over a clip."""
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or samples
+    step = max(1, total // samples)
+    frames = []
+    for index in range(0, total, step):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    cap.release()
+    if not frames:
+        return None
+    report, faces = benchmark_backends(frames, backends)
+    return {"clip": os.path.basename(path), "frames": len(frames), "faces": faces,
+            "backends": report}
+
+
+# -------------------------------------------------------------------------
+def print_run(run):
+    memory = ("peak RSS -" if run["peak_rss_mb"] is None else
+              f"peak RSS {run['peak_rss_mb']:.0f} MB ({run['rss_delta_mb']:+.0f} MB)")
+    print(f"--- {run['name']}: {run['frames']} frames, {run['throughput_fps']:.1f} FPS, {memory}")
+    for stage, s in run["stages"].items():
+        print(f"    {stage:<10} p50 {s['p50_ms']:7.2f}  p95 {s['p95_ms']:7.2f}  p99 {s['p99_ms']:7.2f} ms")
+    print(f"    alarms: high={run['high_alarms']} low={run['low_alarms']} "
+          f"onset latency (ms): {run['onset_latency_ms']} | false alarms: {run['false_alarms']}")
+    if "governor" in run:
+        gov = run["governor"]
+        print(f"    governor: analysed {gov['frames_processed']}/{gov['frames_seen']} frames, "
+              f"saved ~{gov['cpu_saved_s']:.2f}s CPU")
+
+
+def print_detectors(run):
+    print(f"--- detectors on {run['clip']}: {run['frames']} frames, {run['faces']} faces")
+    for name, r in run["backends"].items():
+        recall = f"{r['recall'] * 100:5.1f}%" if r["recall"] is not None else "    -"
+        flag = "" if r["recall"] is None or r["recall"] >= RECALL_FLOOR else "  (below recall floor)"
+        print(f"    {name:<9} {r['ms']:7.2f} ms/frame  recall {recall}  "
+              f"false positives {r['false_positives']}{flag}")
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = {run["name"]: run for run in json.load(f)["runs"]}
+    for run in current["runs"]:
+        old = previous.get(run["name"])
+        if old is None:
+            continue
+        delta = run["throughput_fps"] - old["throughput_fps"]
+        pct = 100.0 * delta / old["throughput_fps"] if old["throughput_fps"] else 0.0
+        print(f"[COMPARE] {run['name']}: {old['throughput_fps']:.1f} -> "
+              f"{run['throughput_fps']:.1f} FPS ({pct:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless drowsiness pipeline benchmark")
+    parser.add_argument("--clips", help="directory (or glob) of video clips to replay")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="FRAMES",
+                        help="also run N synthetic frames (default when no clips)")
+    parser.add_argument("--model", default=MODEL_68,
+                        help="68-point shape predictor (file name on the model search path or a path)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--adaptive", action="store_true",
+                        help="also run with the adaptive rate governor")
+    parser.add_argument("--landmark-noise", type=float, default=0.0, metavar="PX",
+                        help="Gaussian jitter (pixels) added to the synthetic landmarks")
+    parser.add_argument("--filters", default="none+none",
+                        help="comma separated <landmark>+<ear> filter combinations for the "
+                             "synthetic run, or 'all'")
+    parser.add_argument("--detectors", metavar="NAMES",
+                        help="comma separated face detector backends to compare on the clips, "
+                             "or 'all'")
+    parser.add_argument("--out", help="output JSON (default: bench_results/bench_<time>.json)")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "runs": [],
+    }
+
+    clips = []
+    if args.clips:
+        pattern = os.path.join(args.clips, "*") if os.path.isdir(args.clips) else args.clips
+        clips = sorted(p for p in glob.glob(pattern) if not p.endswith(".json"))
+
+    if clips:
+        landmarks = DlibLandmarkExtractor(args.model)
+        for path in clips:
+            for adaptive in ((False, True) if args.adaptive else (False,)):
+                run = run_clip(path, landmarks, adaptive)
+                if run is not None:
+                    if adaptive:
+                        run["name"] += " (adaptive)"
+                    results["runs"].append(run)
+                    print_run(run)
+
+        if args.detectors:
+            names = None if args.detectors == "all" else args.detectors.split(",")
+            backends = available_backends(names)
+            results["detectors"] = []
+            for path in clips:
+                run = run_detectors(path, backends)
+                if run is not None:
+                    results["detectors"].append(run)
+                    print_detectors(run)
+
+    if args.synthetic or not clips:
+        combos = FILTER_COMBOS if args.filters == "all" else args.filters.split(",")
+        for combo in combos:
+            for adaptive in ((False, True) if args.adaptive else (False,)):
+                run = run_synthetic(args.synthetic or 1800, seed=args.seed, adaptive=adaptive,
+                                    landmark_noise=args.landmark_noise, filters=combo)
+                results["runs"].append(run)
+                print_run(run)
+
+    peak = process_peak_rss_mb()
+    results["process_peak_rss_mb"] = round(peak, 1) if peak is not None else None
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[DONE] Results saved to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
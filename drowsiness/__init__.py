@@ -0,0 +1,34 @@
+"""
+Driver drowsiness detection.
+
+The pipeline is built from swappable stages (see stages.py) wired together
+by Pipeline. Importing the package has no side effects: the camera, the
+audio mixer and the dlib models are only touched when a stage is created
+or the pipeline is opened.
+"""
+from .audio import AlarmEngine
+from .calibration import DriverProfileStore, EarCalibrator
+from .clips import ClipRecorder
+from .control import CMD_QUIT, CMD_RESET, CMD_STATS, ControlChannel
+from .detectors import DETECTOR_BACKENDS, make_detector_backend, select_backend
+from .ear import batch_eye_aspect_ratio, eye_aspect_ratio, eye_metrics, landmarks_to_array
+from .event_sinks import (HttpSink, JsonlFileSink, MqttSink, UnixSocketSink, WebSocketSink,
+                          make_sink)
+from .events import DriverEvent, EventPublisher
+from .face_tracks import FaceTrack, FaceTrackSet
+from .filters import EmaEarFilter, MedianEarFilter, OneEuroFilter
+from .governor import RateGovernor
+from .models import EYE_MODEL, MODEL_5, MODEL_68, ModelManager
+from .motion import MotionGate
+from .perclos import EyeClosureStats
+from .pipeline import FrameResult, Pipeline
+from .preview import MjpegPreview, PreviewOutput, WindowPreview
+from .profiling import StageProfiler
+from .stages import (AlarmSink, AudioAlarmSink, CameraSource, DlibLandmarkExtractor, EarMetric,
+                     EyeMetric, EyeRegionLandmarkExtractor, FaceDetector, FrameSource,
+                     HogFaceDetector, LandmarkExtractor, MultiFaceDetector, NullAlarmSink,
+                     PygameAlarmSink, TrackingFaceDetector, VideoFileSource)
+from .state import (DrowsinessStateMachine, EVENT_ALARM_STOPPED, EVENT_HIGH_ALARM,
+                    EVENT_LOW_ALARM, STATUS_ACTIVE, STATUS_CLOSING, STATUS_DROWSY,
+                    STATUS_FATIGUE, STATUS_NO_FACE, STATUS_TIRED)
+from .telemetry import TelemetryLog, TelemetryWriter
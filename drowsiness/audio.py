@@ -0,0 +1,254 @@
+"""
+Non-blocking alarm engine.
+
+Every alarm sound is decoded to PCM once, when the engine starts. After
+that, the frame-processing thread only appends a command constant to a
+deque and sets an Event. Neither call blocks, and neither allocates (the
+command constants already exist). One long-lived audio thread takes the
+commands off the deque and drives the backend. All mixer calls happen on
+that thread.
+
+Backends:
+    PygameBackend    pygame.mixer; plays .wav and .mp3 (decoded by SDL_mixer)
+    NullBackend      no audio; keeps the played commands in memory (tests)
+    FileSinkBackend  no audio; appends one line per command to a text file
+"""
+import collections
+import os
+import threading
+import time
+
+LEVEL_NONE = 0
+LEVEL_LOW = 1
+LEVEL_HIGH = 2
+LEVEL_NAMES = {LEVEL_LOW: "low", LEVEL_HIGH: "high"}
+
+# --- Commands (preallocated, so queueing one never allocates) ---
+CMD_PLAY_LOW = ("play", LEVEL_LOW)
+CMD_PLAY_HIGH = ("play", LEVEL_HIGH)
+CMD_ESCALATE = ("escalate", None)
+CMD_STOP = ("stop", None)
+_CMD_QUIT = ("quit", None)
+_PLAY_COMMANDS = {LEVEL_LOW: CMD_PLAY_LOW, LEVEL_HIGH: CMD_PLAY_HIGH}
+
+
+# -------------------------------------------------------------------------
+# Backends
+# -------------------------------------------------------------------------
+class AudioBackend:
+    """
+    load(level, path) decodes one sound and returns its length in seconds.
+    play(level) and stop() are only ever called from the audio thread.
+    """
+
+    def open(self):
+        pass
+
+    def load(self, level, path):
+        raise NotImplementedError
+
+    def play(self, level):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PygameBackend(AudioBackend):
+    """pygame.mixer. Sound() decodes the whole file (wav or mp3) to PCM up front."""
+
+    def __init__(self):
+        import pygame
+        self._mixer = pygame.mixer
+        self._sounds = {}
+        self._channel = None
+
+    def open(self):
+        self._mixer.init()
+
+    def load(self, level, path):
+        sound = self._mixer.Sound(path)
+        self._sounds[level] = sound
+        return sound.get_length()
+
+    def play(self, level):
+        sound = self._sounds.get(level)
+        if sound is None:
+            return
+        if self._channel is not None:
+            self._channel.stop()
+        self._channel = sound.play()
+
+    def stop(self):
+        if self._channel is not None:
+            self._channel.stop()
+            self._channel = None
+
+    def close(self):
+        self._mixer.stop()
+        self._mixer.quit()
+
+
+class NullBackend(AudioBackend):
+    """Plays nothing. `played` holds (time, action, level) for inspection."""
+
+    def __init__(self):
+        self.played = []
+
+    def load(self, level, path):
+        return 0.0
+
+    def play(self, level):
+        self.played.append((time.time(), "play", level))
+
+    def stop(self):
+        self.played.append((time.time(), "stop", LEVEL_NONE))
+
+
+class FileSinkBackend(AudioBackend):
+    """Writes "<time>\t<action>\t<sound>" lines to `path` instead of playing audio."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", buffering=1)
+
+    def load(self, level, path):
+        self._file.write(f"{time.time():.3f}\tload\t{LEVEL_NAMES[level]}\t{path}\n")
+        return 0.0
+
+    def play(self, level):
+        self._file.write(f"{time.time():.3f}\tplay\t{LEVEL_NAMES[level]}\n")
+
+    def stop(self):
+        self._file.write(f"{time.time():.3f}\tstop\t-\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def make_backend(name, path=None):
+    """"pygame", "null" or "file" (`path` is the file sink's output)."""
+    if name == "pygame":
+        return PygameBackend()
+    if name == "null":
+        return NullBackend()
+    if name == "file":
+        return FileSinkBackend(path or "alarm_sink.log")
+    raise ValueError(f"Unknown audio backend '{name}'")
+
+
+# -------------------------------------------------------------------------
+class AlarmEngine:
+    """
+    Owns the audio thread. play(level), escalate() and stop() just queue a
+    command and return at once; `level` is the level most recently requested.
+    """
+
+    def __init__(self, backend, high_sound=None, low_sound=None):
+        self.backend = backend
+        self.sounds = {LEVEL_HIGH: high_sound, LEVEL_LOW: low_sound}
+        self.level = LEVEL_NONE
+        self.durations = {}
+
+        self._commands = collections.deque()
+        self._wake = threading.Event()
+        self._thread = None
+
+        # --- Statistics ---
+        self.commands_queued = 0
+        self.commands_handled = 0
+        self.errors = 0
+
+    # ---------------------------------------------------------------------
+    def start(self):
+        """Opens the backend and decodes every sound. Returns False if audio is unavailable."""
+        try:
+            self.backend.open()
+            for level, path in self.sounds.items():
+                if path is not None:
+                    self.durations[LEVEL_NAMES[level]] = self.backend.load(level, path)
+        except Exception as e:
+            print(f"ERROR loading sound files: {e}")
+            return False
+
+        self._thread = threading.Thread(target=self._run, name="alarm-audio", daemon=True)
+        self._thread.start()
+        return True
+
+    def _send(self, command):
+        if self._thread is None:
+            return
+        self._commands.append(command)
+        self.commands_queued += 1
+        self._wake.set()
+
+    def play(self, level):
+        self.level = level
+        self._send(_PLAY_COMMANDS[level])
+
+    def escalate(self):
+        """Moves the alarm up one level (none -> low -> high)."""
+        self.level = min(LEVEL_HIGH, self.level + 1)
+        self._send(CMD_ESCALATE)
+
+    def stop(self):
+        self.level = LEVEL_NONE
+        self._send(CMD_STOP)
+
+    # ---------------------------------------------------------------------
+    def _run(self):
+        playing = LEVEL_NONE
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._commands:
+                action, level = self._commands.popleft()
+                self.commands_handled += 1
+                try:
+                    if action == "play":
+                        self.backend.play(level)
+                        playing = level
+                    elif action == "escalate":
+                        playing = min(LEVEL_HIGH, playing + 1)
+                        self.backend.play(playing)
+                    elif action == "stop":
+                        self.backend.stop()
+                        playing = LEVEL_NONE
+                    else:
+                        self.backend.stop()
+                        self.backend.close()
+                        return
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error in audio thread ({action}): {e}")
+
+    def close(self, timeout=1.0):
+        if self._thread is None:
+            try:
+                self.backend.close()
+            except Exception:
+                pass
+            return
+        self._commands.append(_CMD_QUIT)
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "queued": self.commands_queued,
+            "handled": self.commands_handled,
+            "errors": self.errors,
+            "durations": self.durations,
+        }
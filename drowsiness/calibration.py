@@ -0,0 +1,153 @@
+"""
+Per-driver EAR calibration.
+
+The fixed EYE_AR_THRESH / EYE_AR_PRE_THRESH assume an open-eye EAR of about
+0.34. A driver whose eyes naturally sit near 0.28 would be "tired" all the
+time. EarCalibrator measures the driver's open-eye EAR over the first
+seconds of every session and scales the thresholds to it.
+
+Baselines are kept per driver in a small JSON store. The next session
+starts with the stored thresholds right away. Its own measurement is then
+blended in with an exponential moving average, so one odd session (glasses,
+bad light) can only move the baseline a little.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from .state import EYE_AR_PRE_THRESH, EYE_AR_THRESH
+
+# Default thresholds relative to the default open-eye EAR (0.26 / 0.34, 0.30 / 0.34)
+DEFAULT_OPEN_EAR = 0.34
+CLOSED_RATIO = EYE_AR_THRESH / DEFAULT_OPEN_EAR
+PRE_RATIO = EYE_AR_PRE_THRESH / DEFAULT_OPEN_EAR
+
+CALIBRATION_S = 5.0     # shorter than the low-alarm time, so calibration can't raise it
+MIN_SAMPLES = 30
+BASELINE_ALPHA = 0.2    # weight of the newest session in the stored baseline
+
+
+# -------------------------------------------------------------------------
+class DriverProfileStore:
+    """Open-eye baselines keyed by driver id, in one JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.profiles = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.profiles = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Could not read driver profiles '{path}': {e}")
+
+    def get(self, driver_id):
+        return self.profiles.get(driver_id)
+
+    def put(self, driver_id, profile):
+        self.profiles[driver_id] = profile
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write a temp file and swap it in, so a crash never leaves half a file
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.profiles, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+# -------------------------------------------------------------------------
+class EarCalibrator:
+    """
+    observe(ear, timestamp) for every frame with a face. Returns True when
+    new thresholds are ready (`ear_thresh`, `ear_pre_thresh`).
+
+    A stored baseline is applied immediately. Every session also measures
+    the median EAR over its first `calibration_s` seconds, which is robust
+    to blinks. That measurement becomes the baseline for a new driver, or is
+    blended into the stored one with weight `alpha`.
+    """
+
+    def __init__(self, store=None, driver_id="default", calibration_s=CALIBRATION_S,
+                 alpha=BASELINE_ALPHA, closed_ratio=CLOSED_RATIO, pre_ratio=PRE_RATIO,
+                 min_thresh=0.15, max_samples=1024):
+        self.store = store
+        self.driver_id = driver_id
+        self.calibration_s = calibration_s
+        self.alpha = alpha
+        self.closed_ratio = closed_ratio
+        self.pre_ratio = pre_ratio
+        self.min_thresh = min_thresh
+
+        self._samples = np.empty(max_samples, dtype=np.float64)
+        self._count = 0
+        self._started = None
+        self.done = False
+
+        self.open_ear = None
+        self.ear_thresh = EYE_AR_THRESH
+        self.ear_pre_thresh = EYE_AR_PRE_THRESH
+        self.sessions = 0
+
+        profile = store.get(driver_id) if store is not None else None
+        if profile is not None:
+            self.sessions = profile.get("sessions", 1)
+            self._set_baseline(profile["open_ear"])
+
+    @property
+    def loaded(self):
+        """True if the thresholds came from a stored baseline."""
+        return self.sessions > 0
+
+    def _set_baseline(self, open_ear):
+        self.open_ear = open_ear
+        self.ear_thresh = max(self.min_thresh, open_ear * self.closed_ratio)
+        self.ear_pre_thresh = max(self.ear_thresh + 0.01, open_ear * self.pre_ratio)
+
+    # ---------------------------------------------------------------------
+    def observe(self, ear, timestamp):
+        if self.done:
+            return False
+        if self._started is None:
+            self._started = timestamp
+            if self.loaded:
+                # Use the stored thresholds from the very first frame
+                return True
+
+        if self._count < len(self._samples):
+            self._samples[self._count] = ear
+            self._count += 1
+        if timestamp - self._started < self.calibration_s or self._count < MIN_SAMPLES:
+            return False
+
+        self.done = True
+        measured = float(np.median(self._samples[:self._count]))
+        if self.loaded:
+            measured = (1.0 - self.alpha) * self.open_ear + self.alpha * measured
+        self.sessions += 1
+        self._set_baseline(measured)
+
+        if self.store is not None:
+            self.store.put(self.driver_id, {
+                "open_ear": round(measured, 4),
+                "ear_thresh": round(self.ear_thresh, 4),
+                "ear_pre_thresh": round(self.ear_pre_thresh, 4),
+                "sessions": self.sessions,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        return True
+
+    def summary(self):
+        return {
+            "driver": self.driver_id,
+            "calibrated": self.done,
+            "open_ear": round(self.open_ear, 4) if self.open_ear is not None else None,
+            "ear_thresh": round(self.ear_thresh, 4),
+            "ear_pre_thresh": round(self.ear_pre_thresh, 4),
+            "sessions": self.sessions,
+        }
@@ -0,0 +1,231 @@
+"""
+Evidence clips around alarms.
+
+Recording all the time would wear out the SD card and fill it up, so the
+recorder keeps only the last `pre_s` seconds in memory: at most `fps`
+frames per second, downscaled by `scale` and stored as JPEG bytes (a few
+MB for ten seconds). It also keeps the telemetry rows of every frame in a
+small preallocated ring.
+
+When a high or low alarm fires, the buffered frames plus the next `post_s`
+seconds go to a background writer thread. The writer decodes them and
+encodes the clip with cv2.VideoWriter; the telemetry of the same window is
+written next to it (same file name, .drwtel, readable with TelemetryLog).
+An alarm during the post window extends the clip (up to `max_clip_s`).
+
+The analysis loop only converts (gray / raw camera frames to colour),
+downscales and JPEG-encodes the kept frames. It
+never waits for the video encoder: a clip that would exceed `max_pending`
+queued clips is dropped and counted instead.
+"""
+import collections
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .state import EVENT_HIGH_ALARM, EVENT_LOW_ALARM
+from .telemetry import TELEMETRY_DTYPE, TelemetryWriter, fill_record
+
+_ALARM_LEVELS = {EVENT_HIGH_ALARM: "high", EVENT_LOW_ALARM: "low"}
+
+
+# -------------------------------------------------------------------------
+class _Clip:
+    """One clip on its way to the writer: JPEG frames come in through `frames`."""
+
+    def __init__(self, path, level, reason, trigger_time, end_time):
+        self.path = path
+        self.level = level
+        self.reason = reason
+        self.trigger_time = trigger_time
+        self.end_time = end_time
+        self.frames = queue.Queue()     # (timestamp, jpeg), then None
+        self.drained = False            # the writer has taken the final None
+        self.telemetry = None
+
+
+class ClipRecorder:
+    """
+    From the analysis loop (Pipeline does this when given `recorder=`):
+
+        recorder.add(result, state, source.bgr)     # every frame, after the state update
+
+    `to_bgr` turns a gray / raw camera frame into colour; it is only called
+    for the kept frames. Without it gray frames are recorded in gray.
+
+    `telemetry_rate` bounds the frame rate the telemetry ring is sized for;
+    at a higher rate the oldest pre-event rows are lost first.
+    """
+
+    def __init__(self, out_dir="clips", pre_s=10.0, post_s=5.0, fps=10.0, scale=0.5, quality=75,
+                 max_clip_s=60.0, max_pending=4, codec="mp4v", extension=".mp4", telemetry_rate=60):
+        if fps <= 0:
+            raise ValueError("fps must be > 0")
+        self.out_dir = out_dir
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self.fps = fps
+        self.scale = scale
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.max_clip_s = max_clip_s
+        self.max_pending = max_pending
+        self.fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.extension = extension
+
+        self._interval = 1.0 / fps
+        self._ring = collections.deque(maxlen=int(np.ceil(pre_s * fps)) + 1)
+        self._small = None
+        self._last_kept = None
+        self._rows = np.zeros(int((pre_s + max_clip_s + post_s) * telemetry_rate), TELEMETRY_DTYPE)
+        self._row_count = 0
+        self._clip = None
+
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="clip-writer", daemon=True)
+        self._thread.start()
+
+        # --- Statistics ---
+        self.clips_started = 0
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.clips_failed = 0
+
+    # --- Analysis side ----------------------------------------------------
+    def add(self, result, state, to_bgr=None):
+        timestamp = result.timestamp
+        fill_record(self._rows[self._row_count % len(self._rows)], timestamp, result.index, state,
+                    np.nan if result.left_ear is None else result.left_ear,
+                    np.nan if result.right_ear is None else result.right_ear,
+                    np.nan if result.ear is None else result.ear, result.face, result.wall_time)
+        self._row_count += 1
+
+        if self._last_kept is None or timestamp - self._last_kept >= self._interval:
+            self._last_kept = timestamp
+            frame = result.frame if to_bgr is None else to_bgr(result.frame)
+            item = (timestamp, self._encode(frame))
+            self._ring.append(item)
+            if self._clip is not None:
+                self._clip.frames.put(item)
+
+        level = _ALARM_LEVELS.get(result.event)
+        if level is not None:
+            self._trigger(timestamp, level, state.alarm_reason)
+        elif self._clip is not None and timestamp >= self._clip.end_time:
+            self._finish()
+
+    def _encode(self, frame):
+        if self.scale != 1.0:
+            size = (int(frame.shape[1] * self.scale), int(frame.shape[0] * self.scale))
+            frame = self._small = cv2.resize(frame, size, dst=self._small,
+                                             interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, self.params)
+        return buf.tobytes() if ok else None
+
+    def _trigger(self, timestamp, level, reason):
+        clip = self._clip
+        if clip is not None:
+            # Another alarm inside the post window: keep the same clip going
+            if level == "high":
+                clip.level = level
+            clip.end_time = min(timestamp + self.post_s, clip.trigger_time + self.max_clip_s)
+            return
+        if self._jobs.qsize() >= self.max_pending:
+            self.clips_dropped += 1
+            print(f"WARNING: Clip writer is behind, alarm clip at {timestamp:.1f} dropped")
+            return
+
+        name = f"alarm_{time.strftime('%Y%m%d_%H%M%S')}_{level}"
+        clip = self._clip = _Clip(os.path.join(self.out_dir, name), level, reason,
+                                  timestamp, timestamp + self.post_s)
+        for item in self._ring:
+            clip.frames.put(item)
+        self.clips_started += 1
+        self._jobs.put(clip)
+
+    def _finish(self):
+        clip, self._clip = self._clip, None
+        start = clip.trigger_time - self.pre_s
+        count = min(self._row_count, len(self._rows))
+        pos = self._row_count % len(self._rows)
+        rows = np.concatenate((self._rows[pos:count], self._rows[:pos])) \
+            if self._row_count > len(self._rows) else self._rows[:count]
+        clip.telemetry = rows[(rows["timestamp"] >= start) & (rows["timestamp"] <= clip.end_time)].copy()
+        clip.frames.put(None)
+
+    # --- Writer thread ----------------------------------------------------
+    def _run(self):
+        while True:
+            clip = self._jobs.get()
+            if clip is None:
+                return
+            try:
+                self._write(clip)
+                self.clips_written += 1
+            except Exception as e:     # one bad clip must not stop the writer
+                self.clips_failed += 1
+                print(f"WARNING: Could not write clip {clip.path}: {e}")
+                if not clip.drained:
+                    while clip.frames.get() is not None:
+                        pass
+
+    def _write(self, clip):
+        os.makedirs(self.out_dir, exist_ok=True)
+        video_path = clip.path + self.extension
+        writer = None
+        first = None
+        written = 0
+        try:
+            while True:
+                item = clip.frames.get()
+                if item is None:
+                    clip.drained = True
+                    break
+                timestamp, jpeg = item
+                if jpeg is None:
+                    continue
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                if writer is None:
+                    writer = cv2.VideoWriter(video_path, self.fourcc, self.fps,
+                                             (frame.shape[1], frame.shape[0]))
+                    if not writer.isOpened():
+                        raise OSError(f"VideoWriter could not open '{video_path}'")
+                    first = timestamp
+                # Repeat frames over capture gaps so the clip plays in real time
+                target = int((timestamp - first) * self.fps) + 1
+                for _ in range(max(1, min(target - written, int(2 * self.fps)))):
+                    writer.write(frame)
+                    written += 1
+        finally:
+            if writer is not None:
+                writer.release()
+
+        metadata = {"level": clip.level, "reason": clip.reason, "trigger_time": clip.trigger_time,
+                    "video": os.path.basename(video_path) if writer is not None else None}
+        with TelemetryWriter(clip.path + ".drwtel", metadata=metadata) as telemetry:
+            telemetry.write_records(clip.telemetry)
+        print(f"🎞 Alarm clip saved -> {video_path} ({written} frames, "
+              f"{len(clip.telemetry)} telemetry rows)")
+
+    # ---------------------------------------------------------------------
+    def close(self, timeout=10.0):
+        """Ends a clip that is still recording and waits for the writer."""
+        if self._clip is not None:
+            self._finish()
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "clips_started": self.clips_started,
+            "clips_written": self.clips_written,
+            "clips_dropped": self.clips_dropped,
+            "clips_failed": self.clips_failed,
+            "buffered_frames": len(self._ring),
+            "buffered_kb": round(sum(len(j) for _, j in self._ring if j is not None) / 1024, 1),
+        }
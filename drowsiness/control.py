@@ -0,0 +1,126 @@
+"""
+Control channel for runs without a keyboard.
+
+Commands arrive from signals or from a local socket and are queued. The
+analysis loop picks them up with poll() between frames, so a command never
+interrupts a frame halfway.
+
+    SIGTERM     quit
+    SIGUSR1     reset (counters and alarm)
+    SIGUSR2     print statistics
+
+    echo reset | nc -U /tmp/drowsiness.sock         ("quit", "reset", "stats")
+"""
+import collections
+import os
+import signal
+import socket
+import threading
+
+CMD_QUIT = "quit"
+CMD_RESET = "reset"
+CMD_STATS = "stats"
+COMMANDS = (CMD_QUIT, CMD_RESET, CMD_STATS)
+
+_SIGNALS = {"SIGTERM": CMD_QUIT, "SIGUSR1": CMD_RESET, "SIGUSR2": CMD_STATS}
+
+
+# -------------------------------------------------------------------------
+class ControlChannel:
+    """
+    Queue of control commands. send() may be called from any thread or a
+    signal handler; poll() returns the next command or None and never blocks.
+    """
+
+    def __init__(self):
+        self._commands = collections.deque()
+        self._server = None
+        self._thread = None
+        self.address = None
+
+    def send(self, command):
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown command '{command}' ({', '.join(COMMANDS)})")
+        self._commands.append(command)
+
+    def poll(self):
+        try:
+            return self._commands.popleft()
+        except IndexError:
+            return None
+
+    # ---------------------------------------------------------------------
+    def install_signal_handlers(self):
+        """Maps SIGTERM / SIGUSR1 / SIGUSR2 to commands (main thread only)."""
+        installed = []
+        for name, command in _SIGNALS.items():
+            signum = getattr(signal, name, None)    # no SIGUSR* on Windows
+            if signum is None:
+                continue
+            signal.signal(signum, lambda *_, command=command: self.send(command))
+            installed.append(name)
+        return installed
+
+    def listen(self, address):
+        """Accepts line-based commands on a Unix socket path, or a TCP port on 127.0.0.1."""
+        if isinstance(address, int):
+            server = socket.create_server(("127.0.0.1", address))
+        else:
+            if os.path.exists(address):
+                os.unlink(address)      # stale socket from a previous run
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(address)
+            server.listen(4)
+        server.settimeout(0.5)
+
+        self._server = server
+        self.address = address
+        self._thread = threading.Thread(target=self._accept_loop, name="control", daemon=True)
+        self._thread.start()
+
+    def _accept_loop(self):
+        while self._server is not None:
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with conn:
+                conn.settimeout(2.0)
+                try:
+                    for line in conn.makefile("r"):
+                        command = line.strip().lower()
+                        if not command:
+                            continue
+                        if command in COMMANDS:
+                            self.send(command)
+                            conn.sendall(b"ok\n")
+                        else:
+                            conn.sendall(f"unknown command '{command}'\n".encode())
+                except OSError:
+                    pass
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        server.close()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+def send_command(address, command, timeout=2.0):
+    """Sends one command to a listening ControlChannel and returns its reply."""
+    if isinstance(address, int):
+        conn = socket.create_connection(("127.0.0.1", address), timeout=timeout)
+    else:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(timeout)
+        conn.connect(address)
+    with conn:
+        conn.sendall(f"{command}\n".encode())
+        conn.shutdown(socket.SHUT_WR)
+        return conn.makefile("r").readline().strip()
@@ -0,0 +1,315 @@
+"""
+Face detector backends.
+
+Every backend is a dlib-style callable: backend(gray, upsample=0) returns a
+list of dlib.rectangle in image coordinates, like
+dlib.get_frontal_face_detector(). Any of them can be passed as
+`hog_detector` to the detector stages (and so to PyramidFaceDetector and
+FaceTrackSet), and its boxes go straight into the shape predictor.
+
+    hog        dlib HOG (the default)
+    hog-half   dlib HOG one upsampling level lower (at upsample=0: on a
+               half-size image). ~3x faster, but only finds faces of
+               ~160 px and more
+    haar       OpenCV Haar cascade (frontal faces, ships with OpenCV)
+    res10      OpenCV DNN res10 300x300 SSD (needs the Caffe model files)
+    yunet      OpenCV FaceDetectorYN (needs the ONNX model, OpenCV >= 4.5.4)
+
+The 68-point predictor was trained on HOG boxes. Boxes from the other
+backends are moved and resized to HOG geometry (BOX_ALIGN) so that the
+landmark fit does not drift.
+
+select_backend() times every available backend on frames from the actual
+camera (at the scales PyramidFaceDetector runs it, see `pyramid=`) and
+picks the fastest one that still finds enough of the faces.
+"""
+import statistics
+import time
+
+import cv2
+
+from .face_tracks import box_iou
+from .models import RES10_MODEL, RES10_PROTOTXT, YUNET_MODEL, ModelManager
+
+# (dx, dy, scale) that turn a backend's box into a square HOG-like box:
+# centre moved by dx * width / dy * height, side = scale * width.
+# Haar was measured against HOG on test clips; the DNN values follow their
+# usual box shape (taller, starting at the forehead).
+BOX_ALIGN = {
+    "haar": (0.0, 0.13, 0.95),
+    "res10": (0.0, 0.12, 0.95),
+    "yunet": (0.0, 0.10, 0.95),
+}
+
+RECALL_FLOOR = 0.9
+
+
+# -------------------------------------------------------------------------
+class DetectorBackend:
+    """Base for the OpenCV backends: _boxes() yields (x, y, w, h) boxes."""
+
+    name = None
+
+    def __init__(self):
+        import dlib
+        self._rectangle = dlib.rectangle
+        self.align = BOX_ALIGN.get(self.name, (0.0, 0.0, 1.0))
+        self._bgr = None
+
+    def _boxes(self, gray, upsample):
+        raise NotImplementedError
+
+    def _color(self, gray):
+        """3-channel copy for the DNN backends (reused buffer)."""
+        self._bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=self._bgr)
+        return self._bgr
+
+    def __call__(self, gray, upsample=0):
+        dx, dy, scale = self.align
+        faces = []
+        for x, y, w, h in self._boxes(gray, upsample):
+            cx = x + w * (0.5 + dx)
+            cy = y + h * (0.5 + dy)
+            half = w * scale / 2.0
+            faces.append(self._rectangle(int(cx - half), int(cy - half),
+                                         int(cx + half), int(cy + half)))
+        return faces
+
+
+class HogBackend:
+    """dlib HOG, unchanged."""
+
+    name = "hog"
+
+    def __init__(self, hog_detector=None):
+        if hog_detector is None:
+            hog_detector = ModelManager.instance().detector()
+        self.detector = hog_detector
+
+    def __call__(self, gray, upsample=0):
+        return self.detector(gray, upsample)
+
+
+class HalfHogBackend(HogBackend):
+    """dlib HOG with one upsampling level less; below 0 the image is halved instead."""
+
+    name = "hog-half"
+
+    def __init__(self, hog_detector=None):
+        super().__init__(hog_detector)
+        import dlib
+        self._rectangle = dlib.rectangle
+        self._small = None
+
+    def __call__(self, gray, upsample=0):
+        if upsample > 0:
+            return self.detector(gray, upsample - 1)
+        self._small = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2),
+                                 dst=self._small, interpolation=cv2.INTER_AREA)
+        return [self._rectangle(r.left() * 2, r.top() * 2, r.right() * 2, r.bottom() * 2)
+                for r in self.detector(self._small, 0)]
+
+
+class HaarBackend(DetectorBackend):
+    """
+    OpenCV Haar cascade. Faces smaller than `min_size_ratio` of the shorter
+    image side are skipped; every upsample level halves that limit.
+    """
+
+    name = "haar"
+
+    def __init__(self, cascade="haarcascade_frontalface_default.xml", scale_factor=1.2,
+                 min_neighbors=4, min_size_ratio=0.15):
+        super().__init__()
+        self.classifier = cv2.CascadeClassifier(cv2.data.haarcascades + cascade)
+        if self.classifier.empty():
+            raise FileNotFoundError(f"Haar cascade '{cascade}' not found")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size_ratio = min_size_ratio
+
+    def _boxes(self, gray, upsample):
+        side = max(16, int(min(gray.shape[:2]) * self.min_size_ratio / (2 ** upsample)))
+        return self.classifier.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                minNeighbors=self.min_neighbors,
+                                                minSize=(side, side))
+
+
+class Res10Backend(DetectorBackend):
+    """OpenCV DNN res10 SSD (fixed 300x300 input, so `upsample` is ignored)."""
+
+    name = "res10"
+
+    def __init__(self, prototxt=RES10_PROTOTXT, model=RES10_MODEL, confidence=0.5, input_size=300):
+        super().__init__()
+        models = ModelManager.instance()
+        self.net = cv2.dnn.readNetFromCaffe(models.resolve(prototxt), models.resolve(model))
+        self.confidence = confidence
+        self.input_size = (input_size, input_size)
+
+    def _boxes(self, gray, upsample):
+        h, w = gray.shape[:2]
+        blob = cv2.dnn.blobFromImage(self._color(gray), 1.0, self.input_size, (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        for _, _, score, x0, y0, x1, y1 in detections:
+            if score < self.confidence:
+                continue
+            x0, y0 = max(0.0, x0) * w, max(0.0, y0) * h
+            x1, y1 = min(1.0, x1) * w, min(1.0, y1) * h
+            if x1 > x0 and y1 > y0:
+                yield x0, y0, x1 - x0, y1 - y0
+
+
+class YuNetBackend(DetectorBackend):
+    """OpenCV FaceDetectorYN (works at the input size, so `upsample` is ignored)."""
+
+    name = "yunet"
+
+    def __init__(self, model=YUNET_MODEL, score_threshold=0.6, nms_threshold=0.3):
+        super().__init__()
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError(f"OpenCV {cv2.__version__} has no FaceDetectorYN (needs >= 4.5.4)")
+        path = ModelManager.instance().resolve(model)
+        self.detector = cv2.FaceDetectorYN.create(path, "", (320, 320),
+                                                  score_threshold, nms_threshold)
+        self._size = None
+
+    def _boxes(self, gray, upsample):
+        size = (gray.shape[1], gray.shape[0])
+        if size != self._size:
+            self.detector.setInputSize(size)
+            self._size = size
+        _, faces = self.detector.detect(self._color(gray))
+        if faces is None:
+            return ()
+        return [tuple(face[:4]) for face in faces]
+
+
+# -------------------------------------------------------------------------
+DETECTOR_BACKENDS = {
+    "hog": HogBackend,
+    "hog-half": HalfHogBackend,
+    "haar": HaarBackend,
+    "res10": Res10Backend,
+    "yunet": YuNetBackend,
+}
+
+
+def make_detector_backend(name, **options):
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown face detector '{name}' ({', '.join(DETECTOR_BACKENDS)})")
+    return DETECTOR_BACKENDS[name](**options)
+
+
+def available_backends(names=None):
+    """Creates every backend that can run here; the others are skipped with a note."""
+    backends = {}
+    for name in names or DETECTOR_BACKENDS:
+        try:
+            backends[name] = make_detector_backend(name)
+        except (FileNotFoundError, RuntimeError, cv2.error) as e:
+            print(f"[DETECTOR] '{name}' not available: {e}")
+    return backends
+
+
+# -------------------------------------------------------------------------
+def benchmark_backends(frames, backends, reference="hog", min_votes=2, iou_thresh=0.3,
+                       pyramid=None):
+    """
+    Times every backend on `frames` (gray images) and estimates its recall.
+
+    A live camera has no ground truth. A face counts as real when the
+    `reference` backend (today's detector) finds it, or when at least
+    `min_votes` backends agree on it (boxes overlapping by `iou_thresh`),
+    e.g. a turned face HOG misses. Other detections are false positives.
+
+    `pyramid` (PyramidFaceDetector keyword arguments, e.g. {"scale": 0.5})
+    benchmarks every backend the way the pipeline runs it: through its own
+    PyramidFaceDetector, i.e. on the ROI crop and the downscaled frame, so
+    `frames` should be consecutive. A backend that is fine at full
+    resolution but misses the small faces of those images loses recall
+    here, and pays for the fallback searches in its time. The reference
+    backend also runs on the full frames (untimed); the largest face it
+    finds there is the driver's and counts even when every backend misses
+    it, other faces it finds do not count (the pyramid follows one face).
+
+    Returns ({name: {"ms", "recall", "false_positives"}}, number of faces).
+    """
+    min_votes = max(1, min(min_votes, len(backends)))
+    times = {name: [] for name in backends}
+    found = {name: 0 for name in backends}
+    false_positives = {name: 0 for name in backends}
+    faces = 0
+
+    for backend in backends.values():
+        backend(frames[0])          # warm-up (DNN graph set-up, buffers)
+
+    runners = backends
+    if pyramid is not None:
+        from .face_detection import PyramidFaceDetector
+        runners = {name: PyramidFaceDetector(backend, **pyramid)
+                   for name, backend in backends.items()}
+
+    for gray in frames:
+        clusters = []               # [(first box, {backend names}, reference face)]
+        if pyramid is not None and reference in backends:
+            # The pyramid follows one face: the driver's (the largest) must be
+            # found, other real faces are neither hits nor false positives
+            truth = sorted(backends[reference](gray), key=lambda r: r.area(), reverse=True)
+            clusters = [(box, set(), i == 0 or None) for i, box in enumerate(truth)]
+        for name, backend in runners.items():
+            start = time.perf_counter()
+            boxes = backend(gray)
+            times[name].append((time.perf_counter() - start) * 1000.0)
+            for box in boxes:
+                for first, names, _ in clusters:
+                    if name not in names and box_iou(first, box) >= iou_thresh:
+                        names.add(name)
+                        break
+                else:
+                    clusters.append((box, {name}, False))
+
+        for _, names, seeded in clusters:
+            if seeded is None:
+                continue
+            if seeded or reference in names or len(names) >= min_votes:
+                faces += 1
+                for name in names:
+                    found[name] += 1
+            else:
+                for name in names:
+                    false_positives[name] += 1
+
+    report = {}
+    for name in backends:
+        report[name] = {
+            "ms": round(statistics.median(times[name]), 2),
+            "recall": round(found[name] / faces, 3) if faces else None,
+            "false_positives": false_positives[name],
+        }
+    return report, faces
+
+
+def select_backend(frames, backends=None, recall_floor=RECALL_FLOOR, **options):
+    """
+    Picks the fastest backend whose recall on `frames` is at least
+    `recall_floor` (the best-recall one if none is). Falls back to "hog"
+    when no face was seen. Pass `pyramid=` (see benchmark_backends) when
+    the backend will run inside a PyramidFaceDetector. Returns (name,
+    backend, report).
+    """
+    if backends is None:
+        backends = available_backends()
+    report, faces = benchmark_backends(frames, backends, **options)
+    if faces == 0:
+        print("WARNING: No face seen during the detector benchmark, keeping 'hog'")
+        name = "hog" if "hog" in backends else next(iter(backends))
+        return name, backends[name], report
+
+    good = [name for name in backends if report[name]["recall"] >= recall_floor]
+    if good:
+        name = min(good, key=lambda n: report[n]["ms"])
+    else:
+        name = max(backends, key=lambda n: (report[n]["recall"], -report[n]["ms"]))
+    return name, backends[name], report
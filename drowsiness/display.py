@@ -0,0 +1,62 @@
+import cv2
+
+from .ear import eye_contours
+from .state import STATUS_ACTIVE, STATUS_DROWSY, STATUS_NO_FACE, STATUS_TIRED
+
+
+# -------------------------------------------------------------------------
+def draw_result(frame, result, state):
+    """Draws eye contours, driver status, EAR and the counter bar on the frame."""
+    if result.status == STATUS_NO_FACE:
+        cv2.putText(frame, "No Face Detected", (20, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        return
+
+    if result.landmarks is None or result.ear is None:
+        return
+
+    # Draw both eye contours (points 36-41 and 42-47)
+    cv2.polylines(frame, eye_contours(result.landmarks), True, (0, 255, 0), 2)
+
+    if result.status == STATUS_DROWSY:
+        cv2.putText(frame, "!!! DROWSY ALERT !!!", (20, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 4)
+    elif result.status == STATUS_TIRED:
+        cv2.putText(frame, "Tired - Take a Break!", (20, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 165, 255), 3)
+    elif result.status == STATUS_ACTIVE:
+        cv2.putText(frame, "Active - Monitoring", (20, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+    # Display information
+    cv2.putText(frame, f"EAR: {result.ear}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    # Status bar at bottom
+    status_text = (f"Drowsy: {state.drowsy_ms:.0f}/{state.closed_ms_high} ms | "
+                   f"Tired: {state.pre_drowsy_ms:.0f}/{state.fatigue_ms_low} ms | "
+                   f"Awake: {state.awake_ms:.0f} ms")
+    cv2.putText(frame, status_text, (10, 450),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+
+def draw_tracks(frame, result, driver_id=None):
+    """Boxes with stable IDs for every tracked face; the driver is drawn in green."""
+    if not result.tracks:
+        return
+
+    for track in result.tracks:
+        if not track.visible:
+            continue
+        box = track.box
+        if track.id == driver_id:
+            color = (0, 255, 0)
+            label = f"Driver #{track.id}"
+        else:
+            color = (200, 200, 200)
+            label = f"#{track.id}"
+            if track.ear is not None:
+                label += f" EAR {track.ear} {track.state.status}"
+        cv2.rectangle(frame, (box.left(), box.top()), (box.right(), box.bottom()), color, 1)
+        cv2.putText(frame, label, (box.left(), max(12, box.top() - 6)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
@@ -0,0 +1,125 @@
+from itertools import chain
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+# 68-point iBUG layout: left eye = points 36-41, right eye = points 42-47
+LEFT_EYE = np.arange(36, 42)
+RIGHT_EYE = np.arange(42, 48)
+EYES = np.stack([LEFT_EYE, RIGHT_EYE])          # (2, 6)
+# Eye-only layout (EyeRegionLandmarkExtractor): the same 12 points, renumbered 0-11
+EYE_PARTS = 12
+EYES_12 = np.arange(EYE_PARTS).reshape(2, 6)
+
+# Eye band of a dlib HOG face box, as fractions of its width / height: both
+# eyes (points 36-47) plus room for head roll and a loose box
+EYE_REGION = (0.05, 0.08, 0.95, 0.45)
+
+# 5-point predictor (MODEL_5): points 0 / 2 are the outer eye corners, 0-3
+# all four corners. A HOG-like face box rebuilt from them: side = 1.40 x the
+# outer-corner distance, centre 0.27 of that distance below the corners'
+# mean (measured against HOG boxes on test clips)
+CORNER_BOX = (1.40, 0.0, 0.27)
+
+# Point pairs inside one eye (p1..p6 in the EAR paper, 0-based here)
+_VERTICAL_A = (1, 5)
+_VERTICAL_B = (2, 4)
+_HORIZONTAL = (0, 3)
+
+
+# -------------------------------------------------------------------------
+def landmarks_to_array(shape, dtype=np.int32):
+    """Converts a dlib full_object_detection into a (num_parts, 2) array."""
+    n = shape.num_parts
+    coords = np.fromiter(chain.from_iterable((p.x, p.y) for p in shape.parts()),
+                         dtype=dtype, count=2 * n)
+    return coords.reshape(n, 2)
+
+
+def eye_region(left, top, right, bottom):
+    """The eye band (left, top, right, bottom) of a face box, see EYE_REGION."""
+    w = right - left
+    h = bottom - top
+    x0, y0, x1, y1 = EYE_REGION
+    return (int(round(left + x0 * w)), int(round(top + y0 * h)),
+            int(round(left + x1 * w)), int(round(top + y1 * h)))
+
+
+def corner_face_box(corners):
+    """Face box (left, top, right, bottom) from the 5-point landmarks, see CORNER_BOX."""
+    scale, dx, dy = CORNER_BOX
+    d = float(np.hypot(*(corners[0] - corners[2])))
+    cx, cy = corners[:4].mean(axis=0)
+    cx += dx * d
+    cy += dy * d
+    half = scale * d / 2.0
+    return (int(round(cx - half)), int(round(cy - half)),
+            int(round(cx + half)), int(round(cy + half)))
+
+
+def _eye_index(landmarks):
+    return EYES_12 if landmarks.shape[-2] == EYE_PARTS else EYES
+
+
+def _eye_points(landmarks):
+    # (..., 68, 2) or (..., 12, 2) -> (..., 2, 6, 2) as float so the norms are exact
+    return landmarks[..., _eye_index(landmarks), :].astype(np.float64, copy=False)
+
+
+def _eye_distances(eyes):
+    A = np.linalg.norm(eyes[..., _VERTICAL_A[0], :] - eyes[..., _VERTICAL_A[1], :], axis=-1)
+    B = np.linalg.norm(eyes[..., _VERTICAL_B[0], :] - eyes[..., _VERTICAL_B[1], :], axis=-1)
+    C = np.linalg.norm(eyes[..., _HORIZONTAL[0], :] - eyes[..., _HORIZONTAL[1], :], axis=-1)
+    return A, B, C
+
+
+# -------------------------------------------------------------------------
+def eye_aspect_ratio(landmarks):
+    """
+    Returns (left_ear, right_ear) for a single (68, 2) or (12, 2) landmark array.
+    """
+    A, B, C = _eye_distances(_eye_points(landmarks))
+    ears = (A + B) / (2.0 * C)
+    return float(ears[0]), float(ears[1])
+
+
+def batch_eye_aspect_ratio(landmarks):
+    """
+    Vectorised EAR for many frames at once.
+
+    `landmarks` has shape (N, 68, 2) or (N, 12, 2); the result has shape (N, 2) with the
+    left and right EAR per frame. Frames with a degenerate eye (zero width)
+    give NaN instead of raising.
+    """
+    landmarks = np.asarray(landmarks)
+    if landmarks.ndim != 3 or landmarks.shape[-1] != 2:
+        raise ValueError(f"expected (N, 68, 2) landmarks, got {landmarks.shape}")
+
+    A, B, C = _eye_distances(_eye_points(landmarks))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ears = (A + B) / (2.0 * C)
+    ears[~np.isfinite(ears)] = np.nan
+    return ears
+
+
+def eye_metrics(landmarks):
+    """
+    EAR plus raw eye geometry (pixels) for one (68, 2) / (12, 2) landmark
+    array or a batch of them. Every value has shape (..., 2) for (left, right).
+    """
+    A, B, C = _eye_distances(_eye_points(np.asarray(landmarks)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ear = (A + B) / (2.0 * C)
+    return {
+        "ear": ear,
+        "opening": (A + B) / 2.0,   # mean lid-to-lid distance
+        "width": C,                 # corner-to-corner distance
+    }
+
+
+def eye_contours(landmarks):
+    """Left and right eye outlines as int32 arrays ready for cv2.polylines."""
+    left, right = _eye_index(landmarks)
+    return [landmarks[left].astype(np.int32, copy=False),
+            landmarks[right].astype(np.int32, copy=False)]
@@ -0,0 +1,342 @@
+"""
+Alert events for the fleet backend.
+
+Until now an alert transition only existed as a printed line. EventPublisher
+turns the state machine's transitions into typed events:
+
+    onset          an alarm started (level "low" / "high", with its reason;
+                   PERCLOS / micro-sleep alarms are one-shot onsets that are
+                   never followed by "cleared")
+    escalation     a low alarm became a high one
+    cleared        the eyes reopened and the alarm stopped
+    face_lost      no driver face for `face_lost_s` seconds
+    manual_reset   the counters were reset by hand (key, control channel)
+
+Every event carries the wall-clock time of its frame ("time"); durations
+come from the pipeline's monotonic frame timestamps.
+
+The events are delivered to one or more sinks (see event_sinks.py) from an
+asyncio loop on its own thread. The analysis loop only calls observe()
+once per frame - a few comparisons - and, on a transition, hands the
+event over with call_soon_threadsafe(). It never waits for a sink.
+
+Events are batched (up to `batch_size`, at most `batch_delay_s` late) and
+every sink has its own bounded queue of batches and its own delivery task,
+so a dead backend does not hold up the local log. A failed batch is retried
+with exponential backoff; when a queue is full the oldest entry is dropped
+and counted, which bounds the memory of a long outage.
+"""
+import asyncio
+import threading
+import time
+
+from .event_sinks import make_sink
+from .state import EVENT_HIGH_ALARM, STATUS_NO_FACE
+
+KIND_ONSET = "onset"
+KIND_ESCALATION = "escalation"
+KIND_CLEARED = "cleared"
+KIND_FACE_LOST = "face_lost"
+KIND_MANUAL_RESET = "manual_reset"
+
+LEVEL_LOW = "low"
+LEVEL_HIGH = "high"
+
+
+# -------------------------------------------------------------------------
+class DriverEvent:
+    """One alert event. to_dict() is what the sinks receive."""
+
+    __slots__ = ("kind", "timestamp", "wall_time", "seq", "level", "reason", "ear", "status",
+                 "duration_s")
+
+    def __init__(self, kind, timestamp, seq, level=None, reason=None, ear=None, status=None,
+                 duration_s=None, wall_time=None):
+        self.kind = kind
+        self.timestamp = timestamp      # the pipeline's (monotonic) frame time
+        self.wall_time = wall_time      # published as "time"
+        self.seq = seq
+        self.level = level
+        self.reason = reason
+        self.ear = ear
+        self.status = status
+        self.duration_s = duration_s
+
+    def to_dict(self, source_id=None, driver_id=None):
+        wall_time = self.timestamp if self.wall_time is None else self.wall_time
+        event = {"type": self.kind, "time": round(wall_time, 3), "seq": self.seq}
+        if source_id is not None:
+            event["source"] = source_id
+        if driver_id is not None:
+            event["driver"] = driver_id
+        for key in ("level", "reason", "status", "duration_s"):
+            value = getattr(self, key)
+            if value is not None:
+                event[key] = value
+        if self.ear is not None:
+            event["ear"] = round(float(self.ear), 4)
+        return event
+
+
+def _alarm_level(state):
+    if state.alarm_high_on:
+        return LEVEL_HIGH
+    if state.alarm_low_on:
+        return LEVEL_LOW
+    return None
+
+
+# -------------------------------------------------------------------------
+class _Delivery:
+    """One sink, its queue of batches and its counters."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.queue = None
+        self.delivered = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_error = None
+
+
+class EventPublisher:
+    """
+    From the analysis loop (Pipeline does this when given `events=`):
+
+        publisher.observe(result, state)    # every frame
+        publisher.manual_reset()            # on a manual reset
+
+    `sinks` are EventSink objects or spec strings for make_sink().
+    """
+
+    def __init__(self, sinks, source_id=None, driver_id=None, batch_size=32, batch_delay_s=0.25,
+                 max_queue=1024, sink_queue=64, retry_initial_s=0.5, retry_max_s=30.0,
+                 send_timeout_s=10.0, face_lost_s=1.0):
+        self._deliveries = [_Delivery(make_sink(s) if isinstance(s, str) else s) for s in sinks]
+        self.source_id = source_id
+        self.driver_id = driver_id
+        self.batch_size = batch_size
+        self.batch_delay_s = batch_delay_s
+        self.max_queue = max_queue
+        self.sink_queue = sink_queue
+        self.retry_initial_s = retry_initial_s
+        self.retry_max_s = retry_max_s
+        self.send_timeout_s = send_timeout_s
+        self.face_lost_s = face_lost_s
+
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._closing = False
+        self._flush_timeout = 0.0
+
+        # --- Transition tracking (analysis thread only) ---
+        self._level = None
+        self._face_lost_since = None
+        self._face_lost_sent = False
+        self._seq = 0
+        self._last_timestamp = None     # of the last observed frame
+
+        # --- Statistics ---
+        self.published = 0
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        return self
+
+    # --- Analysis side ----------------------------------------------------
+    def observe(self, result, state):
+        """Turns the state after one frame into events; cheap when nothing changed."""
+        timestamp = self._last_timestamp = result.timestamp
+        if result.event is not None or self._level is not None:
+            level = _alarm_level(state)
+            if level != self._level:
+                if self._level is None:
+                    self._emit(KIND_ONSET, timestamp, level, state.alarm_reason, result)
+                elif level is None:
+                    self._emit(KIND_CLEARED, timestamp, self._level, None, result)
+                elif level == LEVEL_HIGH:
+                    self._emit(KIND_ESCALATION, timestamp, level, state.alarm_reason, result)
+                self._level = level
+            elif result.event is not None and level is None:
+                # PERCLOS / micro-sleep warning: one-shot, the flags stay off
+                level = LEVEL_HIGH if result.event == EVENT_HIGH_ALARM else LEVEL_LOW
+                self._emit(KIND_ONSET, timestamp, level, state.alarm_reason, result)
+
+        if result.status == STATUS_NO_FACE:
+            if self._face_lost_since is None:
+                self._face_lost_since = timestamp
+            elif not self._face_lost_sent and timestamp - self._face_lost_since >= self.face_lost_s:
+                self._face_lost_sent = True
+                self._emit(KIND_FACE_LOST, timestamp, self._level, None, result,
+                           duration_s=round(timestamp - self._face_lost_since, 3))
+        elif self._face_lost_since is not None:
+            self._face_lost_since = None
+            self._face_lost_sent = False
+
+    def manual_reset(self, timestamp=None):
+        """
+        A reset between frames: stamped with the last frame's timestamp
+        (the pipeline's clock, as every other event) unless `timestamp` is
+        given; its published "time" is the wall clock now.
+        """
+        if timestamp is None:
+            timestamp = self._last_timestamp
+            if timestamp is None:
+                timestamp = time.monotonic()
+        self._level = None
+        self._emit(KIND_MANUAL_RESET, timestamp, None, None, None)
+
+    def _emit(self, kind, timestamp, level, reason, result, duration_s=None):
+        self._seq += 1
+        wall_time = result.wall_time if result is not None else None
+        event = DriverEvent(kind, timestamp, self._seq, level, reason,
+                            result.ear if result is not None else None,
+                            result.status if result is not None else None, duration_s,
+                            time.time() if wall_time is None else wall_time)
+        self.publish(event)
+
+    def publish(self, event):
+        """Hands an event to the publisher thread. Never blocks; thread-safe."""
+        loop = self._loop
+        if loop is None or self._closing:
+            self.dropped += 1
+            return
+        self.published += 1
+        try:
+            loop.call_soon_threadsafe(self._enqueue, event.to_dict(self.source_id, self.driver_id))
+        except RuntimeError:    # loop already closed
+            self.dropped += 1
+
+    # --- Publisher thread -------------------------------------------------
+    def _enqueue(self, event):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._main(loop))
+        finally:
+            self._loop = None
+            loop.close()
+
+    async def _main(self, loop):
+        self._queue = asyncio.Queue(self.max_queue)
+        for d in self._deliveries:
+            d.queue = asyncio.Queue(self.sink_queue)
+        workers = [loop.create_task(self._deliver(d)) for d in self._deliveries]
+        self._loop = loop
+        self._ready.set()
+
+        await self._batch()
+
+        # Closing: let the sinks catch up for at most `_flush_timeout` seconds
+        for d in self._deliveries:
+            self._dispatch(d, None)
+        if workers:
+            _, pending = await asyncio.wait(workers, timeout=self._flush_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        for d in self._deliveries:
+            while not d.queue.empty():
+                batch = d.queue.get_nowait()
+                if batch is not None:
+                    d.dropped += len(batch)
+            try:
+                await d.sink.close()
+            except Exception as e:
+                print(f"WARNING: Could not close event sink {d.sink.name}: {e}")
+
+    async def _batch(self):
+        queue = self._queue
+        while True:
+            event = await queue.get()
+            if event is not None and queue.qsize() < self.batch_size - 1 and self.batch_delay_s > 0:
+                await asyncio.sleep(self.batch_delay_s)
+            batch = []
+            stop = False
+            while True:
+                if event is None:
+                    stop = True
+                else:
+                    batch.append(event)
+                if stop or len(batch) >= self.batch_size or queue.empty():
+                    break
+                event = queue.get_nowait()
+            if batch:
+                for d in self._deliveries:
+                    self._dispatch(d, batch)
+            if stop:
+                return
+
+    @staticmethod
+    def _dispatch(d, batch):
+        if d.queue.full():
+            oldest = d.queue.get_nowait()
+            if oldest is not None:
+                d.dropped += len(oldest)
+        d.queue.put_nowait(batch)
+
+    async def _deliver(self, d):
+        delay = self.retry_initial_s
+        while True:
+            batch = await d.queue.get()
+            if batch is None:
+                return
+            try:
+                while True:
+                    try:
+                        await asyncio.wait_for(d.sink.send(batch), self.send_timeout_s)
+                        break
+                    except Exception as e:
+                        d.failures += 1
+                        if d.last_error is None:
+                            print(f"WARNING: Event sink {d.sink.name} failed ({e!r}), retrying")
+                        d.last_error = repr(e)
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2.0, self.retry_max_s)
+            except asyncio.CancelledError:
+                d.dropped += len(batch)     # close() gave up on this sink
+                raise
+            d.delivered += len(batch)
+            d.batches += 1
+            d.last_error = None
+            delay = self.retry_initial_s
+
+    # ---------------------------------------------------------------------
+    def close(self, timeout=3.0):
+        """Delivers what is still queued (for up to `timeout` seconds) and stops."""
+        loop = self._loop
+        if loop is None or self._closing:
+            return
+        self._flush_timeout = timeout
+        self._closing = True
+        loop.call_soon_threadsafe(self._enqueue, None)
+        self._thread.join(timeout + 2.0)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "dropped": self.dropped,
+            "sinks": {
+                d.sink.name: {
+                    "delivered": d.delivered,
+                    "batches": d.batches,
+                    "failures": d.failures,
+                    "dropped": d.dropped,
+                    "pending": d.queue.qsize() if d.queue is not None else 0,
+                    "last_error": d.last_error,
+                }
+                for d in self._deliveries
+            },
+        }
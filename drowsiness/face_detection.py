@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+class PyramidFaceDetector:
+    """
+    Wraps a dlib-style face detector so that it scans as few pixels as
+    possible:
+
+      1. an ROI around the last known face box, downscaled so the face is
+         about `target_face_size` pixels wide (HOG misses faces close to its
+         80 px window, so keep some headroom),
+      2. a downscaled copy of the whole frame (`scale`),
+      3. after `max_misses` consecutive misses, the full-resolution frame.
+
+    Rectangles are always returned in full-resolution frame coordinates, so
+    they can go straight into the landmark predictor.
+    """
+
+    def __init__(self, detector, scale=0.5, roi_margin=0.4, target_face_size=120,
+                 max_misses=5, upsample=0):
+        if not 0 < scale <= 1:
+            raise ValueError("scale must be in (0, 1]")
+
+        import dlib
+        self._rectangle = dlib.rectangle
+
+        self.detector = detector
+        self.scale = scale
+        self.roi_margin = roi_margin
+        self.target_face_size = target_face_size
+        self.max_misses = max_misses
+        self.upsample = upsample
+
+        self.last_box = None
+        self.misses = 0
+
+        # --- Statistics ---
+        self.calls = 0
+        self.roi_hits = 0
+        self.downscaled_hits = 0
+        self.full_frame_searches = 0
+
+    # ---------------------------------------------------------------------
+    def _search(self, gray, x0, y0, scale):
+        if scale < 1.0:
+            image = cv2.resize(gray, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA)
+        else:
+            image = np.ascontiguousarray(gray)
+
+        found = self.detector(image, self.upsample)
+        return [self._rectangle(int(r.left() / scale) + x0,
+                                int(r.top() / scale) + y0,
+                                int(r.right() / scale) + x0,
+                                int(r.bottom() / scale) + y0)
+                for r in found]
+
+    def _search_roi(self, gray):
+        box = self.last_box
+        h, w = gray.shape[:2]
+        mx = int(box.width() * self.roi_margin)
+        my = int(box.height() * self.roi_margin)
+        x0 = max(0, box.left() - mx)
+        y0 = max(0, box.top() - my)
+        x1 = min(w, box.right() + mx)
+        y1 = min(h, box.bottom() + my)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return []
+
+        scale = min(1.0, self.target_face_size / max(1, box.width()))
+        return self._search(gray[y0:y1, x0:x1], x0, y0, scale)
+
+    # ---------------------------------------------------------------------
+    def __call__(self, gray):
+        self.calls += 1
+
+        faces = []
+        if self.last_box is not None:
+            faces = self._search_roi(gray)
+            if faces:
+                self.roi_hits += 1
+
+        if not faces:
+            faces = self._search(gray, 0, 0, self.scale)
+            if faces:
+                self.downscaled_hits += 1
+
+        if not faces:
+            self.misses += 1
+            if self.misses < self.max_misses:
+                return faces
+            # Too many misses: forget the old position and scan everything
+            self.last_box = None
+            self.misses = 0
+            self.full_frame_searches += 1
+            faces = self._search(gray, 0, 0, 1.0)
+            if not faces:
+                return faces
+
+        self.last_box = faces[0]
+        self.misses = 0
+        return faces
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "roi_hits": self.roi_hits,
+            "downscaled_hits": self.downscaled_hits,
+            "full_frame_searches": self.full_frame_searches,
+        }
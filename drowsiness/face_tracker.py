@@ -0,0 +1,82 @@
+# -------------------------------------------------------------------------
+class FaceTracker:
+    """
+    Detect-once, track-between face localisation.
+
+    The (expensive) face detector only runs every `redetect_interval` frames,
+    or as soon as the correlation tracker's confidence (peak-to-sidelobe
+    ratio) drops below `min_confidence`. In between, the face box is followed
+    with dlib.correlation_tracker, which is much cheaper than a HOG scan.
+    """
+
+    def __init__(self, detector, redetect_interval=10, min_confidence=7.0):
+        if redetect_interval < 1:
+            raise ValueError("redetect_interval must be >= 1")
+
+        import dlib
+        self._dlib = dlib
+
+        self.detector = detector
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+
+        self._tracker = None
+        self._frames_since_detect = 0
+        self.last_confidence = 0.0
+
+        # --- Statistics ---
+        self.frames = 0
+        self.detections_run = 0
+        self.low_confidence_redetects = 0
+
+    # ---------------------------------------------------------------------
+    def _detect(self, gray):
+        self.detections_run += 1
+        self._frames_since_detect = 0
+
+        faces = self.detector(gray)
+        if len(faces) == 0:
+            self._tracker = None
+            return None
+
+        face = faces[0]
+        self._tracker = self._dlib.correlation_tracker()
+        self._tracker.start_track(gray, face)
+        self.last_confidence = float("inf")
+        return face
+
+    def update(self, gray):
+        """Returns the face rectangle for this frame, or None if no face."""
+        self.frames += 1
+
+        if self._tracker is None or self._frames_since_detect >= self.redetect_interval:
+            return self._detect(gray)
+
+        self._frames_since_detect += 1
+        self.last_confidence = self._tracker.update(gray)
+        if self.last_confidence < self.min_confidence:
+            self.low_confidence_redetects += 1
+            return self._detect(gray)
+
+        pos = self._tracker.get_position()
+        return self._dlib.rectangle(int(pos.left()), int(pos.top()),
+                                    int(pos.right()), int(pos.bottom()))
+
+    def reset(self):
+        self._tracker = None
+        self._frames_since_detect = 0
+
+    # ---------------------------------------------------------------------
+    def detection_rate(self):
+        """Fraction of frames on which the full detector actually ran."""
+        if self.frames == 0:
+            return 0.0
+        return self.detections_run / self.frames
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "detections_run": self.detections_run,
+            "low_confidence_redetects": self.low_confidence_redetects,
+            "detection_rate": round(self.detection_rate(), 3),
+        }
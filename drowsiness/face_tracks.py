@@ -0,0 +1,272 @@
+"""
+Multi-face tracking with stable track IDs.
+
+Each face gets a FaceTrack that keeps its ID from frame to frame, even
+though the detector returns faces in a different order on every scan.
+Detections are matched to tracks by box overlap (IoU), with a fallback to
+centroid distance for fast head movements. Between detections, each track
+is followed with its own dlib.correlation_tracker.
+
+One track is the driver. Only the driver's state machine should trigger the
+alarm, so passengers or a co-driver can not start or stop it. The driver
+keeps the "driver seat" state machine (`driver_state`). If the driver's
+track is lost and a new one is picked, the counters and alarm state carry
+over instead of starting from zero.
+"""
+from .state import DrowsinessStateMachine
+
+DRIVER_LARGEST = "largest"    # biggest face = closest to the camera
+DRIVER_LEFT = "left"          # leftmost face in the image
+DRIVER_RIGHT = "right"        # rightmost face in the image
+DRIVER_POLICIES = (DRIVER_LARGEST, DRIVER_LEFT, DRIVER_RIGHT)
+
+
+def box_iou(a, b):
+    """Intersection over union of two dlib rectangles."""
+    w = min(a.right(), b.right()) - max(a.left(), b.left())
+    h = min(a.bottom(), b.bottom()) - max(a.top(), b.top())
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = a.width() * a.height() + b.width() * b.height() - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center(box):
+    return (box.left() + box.right()) / 2, (box.top() + box.bottom()) / 2
+
+
+# -------------------------------------------------------------------------
+class FaceTrack:
+    """One face followed across frames, with its own drowsiness state."""
+
+    def __init__(self, track_id, box, state):
+        self.id = track_id
+        self.box = box
+        self.state = state
+        self.tracker = None
+
+        self.hits = 1           # frames the detector confirmed this face
+        self.misses = 0         # consecutive detector scans without it
+        self.age = 0            # frames since the track was created
+        self.visible = True     # has a box on the current frame
+
+        # --- Per-frame results (filled in by the pipeline) ---
+        self.landmarks = None
+        self.left_ear = None
+        self.right_ear = None
+        self.ear = None
+        self.event = None
+
+    def clear_results(self):
+        self.landmarks = None
+        self.left_ear = None
+        self.right_ear = None
+        self.ear = None
+        self.event = None
+
+
+# -------------------------------------------------------------------------
+class FaceTrackSet:
+    """
+    Detects all faces every `redetect_interval` frames and tracks them in
+    between.
+
+    `detector(gray)` must return a list of dlib rectangles (e.g. the HOG
+    detector with a fixed upsample). A track is dropped after `max_misses`
+    scans in a row without a matching detection. A face must be confirmed on
+    `min_hits` scans before it can become the driver.
+    """
+
+    def __init__(self, detector, state_factory=DrowsinessStateMachine,
+                 driver_policy=DRIVER_LARGEST, redetect_interval=5, min_confidence=7.0,
+                 iou_thresh=0.3, max_center_shift=0.5, max_misses=3, min_hits=2):
+        if driver_policy not in DRIVER_POLICIES:
+            raise ValueError(f"driver_policy must be one of {DRIVER_POLICIES}")
+        if redetect_interval < 1:
+            raise ValueError("redetect_interval must be >= 1")
+
+        import dlib
+        self._dlib = dlib
+
+        self.detector = detector
+        self.state_factory = state_factory
+        self.driver_policy = driver_policy
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+        self.iou_thresh = iou_thresh
+        self.max_center_shift = max_center_shift
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+
+        # The driver seat's state machine; Pipeline replaces it with its own
+        self.driver_state = state_factory()
+
+        self.tracks = []
+        self.driver_id = None
+        self._next_id = 1
+        self._frames_since_detect = 0
+
+        # --- Statistics ---
+        self.frames = 0
+        self.detections_run = 0
+        self.tracks_created = 0
+        self.driver_changes = 0
+
+    # ---------------------------------------------------------------------
+    @property
+    def driver(self):
+        for track in self.tracks:
+            if track.id == self.driver_id:
+                return track
+        return None
+
+    def set_driver(self, track_id):
+        """Makes `track_id` the driver (e.g. picked by the operator)."""
+        for track in self.tracks:
+            if track.id == track_id:
+                self._assign_driver(track)
+                return True
+        return False
+
+    def _assign_driver(self, track):
+        old = self.driver
+        if old is track:
+            return
+        if old is not None:
+            # The old driver becomes a passenger with a fresh state
+            old.state = self.state_factory()
+        track.state = self.driver_state
+        self.driver_id = track.id
+        self.driver_changes += 1
+
+    def _pick_driver(self):
+        candidates = [t for t in self.tracks if t.hits >= self.min_hits and t.visible]
+        if not candidates:
+            return
+        if self.driver_policy == DRIVER_LARGEST:
+            track = max(candidates, key=lambda t: t.box.area())
+        elif self.driver_policy == DRIVER_LEFT:
+            track = min(candidates, key=lambda t: _center(t.box)[0])
+        else:
+            track = max(candidates, key=lambda t: _center(t.box)[0])
+        self._assign_driver(track)
+
+    # ---------------------------------------------------------------------
+    def _start_tracker(self, track, gray):
+        track.tracker = self._dlib.correlation_tracker()
+        track.tracker.start_track(gray, track.box)
+
+    def _match(self, detections):
+        """Greedy matching: best IoU first, then nearest centroid. Returns {track: box}."""
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for di, box in enumerate(detections):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_thresh:
+                    pairs.append((iou, ti, di))
+        pairs.sort(reverse=True)
+
+        matches = {}
+        used = set()
+        for _, ti, di in pairs:
+            if ti in matches or di in used:
+                continue
+            matches[ti] = di
+            used.add(di)
+
+        # Fast movement can break the overlap: fall back to centre distance
+        for ti, track in enumerate(self.tracks):
+            if ti in matches:
+                continue
+            tx, ty = _center(track.box)
+            limit = self.max_center_shift * track.box.width()
+            best = None
+            for di, box in enumerate(detections):
+                if di in used:
+                    continue
+                dx, dy = _center(box)
+                dist = ((dx - tx) ** 2 + (dy - ty) ** 2) ** 0.5
+                if dist <= limit and (best is None or dist < best[0]):
+                    best = (dist, di)
+            if best is not None:
+                matches[ti] = best[1]
+                used.add(best[1])
+        return matches, used
+
+    def _detect(self, gray):
+        self.detections_run += 1
+        self._frames_since_detect = 0
+
+        detections = list(self.detector(gray))
+        matches, used = self._match(detections)
+
+        kept = []
+        for ti, track in enumerate(self.tracks):
+            if ti in matches:
+                track.box = detections[matches[ti]]
+                track.hits += 1
+                track.misses = 0
+                track.visible = True
+                self._start_tracker(track, gray)
+            else:
+                track.misses += 1
+                track.visible = False
+                if track.misses >= self.max_misses:
+                    continue
+            kept.append(track)
+        self.tracks = kept
+
+        for di, box in enumerate(detections):
+            if di in used:
+                continue
+            track = FaceTrack(self._next_id, box, self.state_factory())
+            self._next_id += 1
+            self.tracks_created += 1
+            self._start_tracker(track, gray)
+            self.tracks.append(track)
+
+    def _track(self, gray):
+        self._frames_since_detect += 1
+        for track in self.tracks:
+            if track.tracker is None or not track.visible:
+                continue
+            if track.tracker.update(gray) < self.min_confidence:
+                return False
+            pos = track.tracker.get_position()
+            track.box = self._dlib.rectangle(int(pos.left()), int(pos.top()),
+                                             int(pos.right()), int(pos.bottom()))
+        return True
+
+    def update(self, gray):
+        """Advances every track by one frame. Returns the list of tracks."""
+        self.frames += 1
+        for track in self.tracks:
+            track.age += 1
+            track.clear_results()
+
+        if (not self.tracks or self._frames_since_detect >= self.redetect_interval
+                or not self._track(gray)):
+            self._detect(gray)
+
+        if self.driver is None:
+            self.driver_id = None
+            self._pick_driver()
+        return self.tracks
+
+    def reset(self):
+        self.tracks = []
+        self.driver_id = None
+        self._frames_since_detect = 0
+
+    # ---------------------------------------------------------------------
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "detections_run": self.detections_run,
+            "detection_rate": round(self.detections_run / self.frames, 3) if self.frames else 0.0,
+            "tracks": len(self.tracks),
+            "tracks_created": self.tracks_created,
+            "driver_id": self.driver_id,
+            "driver_changes": self.driver_changes,
+        }
@@ -0,0 +1,195 @@
+"""
+Temporal filters between the landmark fit and the state machine.
+
+A single dlib fit jitters by a pixel or so. On an eye that is ~30 px wide,
+that is a few hundredths of EAR: enough to flip frames across 0.26 / 0.30,
+which resets the closure timers (late alerts) or starts them by mistake
+(false alarms).
+
+    OneEuroFilter    on the (68, 2) landmark coordinates: smooths jitter
+                     while the face is still, follows fast moves with no lag
+    MedianEarFilter  median of the last few EAR values: removes single-frame
+                     spikes, keeps the edges of a real closure
+    EmaEarFilter     exponential moving average of EAR with a time constant
+
+All state is preallocated: filtering a frame does not allocate new arrays.
+Filters are reset when the face is lost.
+"""
+import math
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+class LandmarkFilter:
+    """apply(landmarks, timestamp) returns the filtered (N, 2) landmarks."""
+
+    def apply(self, landmarks, timestamp):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class EarFilter:
+    """apply(ear, timestamp) returns the filtered EAR (rounded to `decimals`)."""
+
+    decimals = 2
+
+    def apply(self, ear, timestamp):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+    def _round(self, value):
+        return round(value, self.decimals) if self.decimals is not None else value
+
+
+# -------------------------------------------------------------------------
+class OneEuroFilter(LandmarkFilter):
+    """
+    One-Euro filter (Casiez et al., 2012), vectorised over every coordinate.
+    A low `min_cutoff` (Hz) means more smoothing at rest. A higher `beta`
+    means less lag when the landmarks move fast.
+    """
+
+    def __init__(self, num_parts=68, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+
+        shape = (num_parts, 2)
+        self._x = np.zeros(shape)           # filtered position
+        self._dx = np.zeros(shape)          # filtered speed
+        self._raw = np.zeros(shape)
+        self._tmp = np.zeros(shape)
+        self._alpha = np.zeros(shape)
+        self._out = np.zeros(shape)
+        self._last_time = None
+
+    @staticmethod
+    def _smoothing(cutoff, dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def apply(self, landmarks, timestamp):
+        np.copyto(self._raw, landmarks)
+        if self._last_time is None or timestamp <= self._last_time:
+            np.copyto(self._x, self._raw)
+            self._dx.fill(0.0)
+            self._last_time = timestamp
+            np.copyto(self._out, self._x)
+            return self._out
+        dt = timestamp - self._last_time
+        self._last_time = timestamp
+
+        # Speed estimate: dx = lerp(dx, (raw - x) / dt, a_d)
+        np.subtract(self._raw, self._x, out=self._tmp)
+        self._tmp /= dt
+        a_d = self._smoothing(self.d_cutoff, dt)
+        self._tmp -= self._dx
+        self._tmp *= a_d
+        self._dx += self._tmp
+
+        # Per-coordinate cutoff grows with speed: alpha = 1 / (1 + tau / dt)
+        np.abs(self._dx, out=self._alpha)
+        self._alpha *= self.beta
+        self._alpha += self.min_cutoff
+        np.reciprocal(self._alpha, out=self._alpha)
+        self._alpha *= 1.0 / (2.0 * math.pi * dt)     # tau / dt
+        self._alpha += 1.0
+        np.reciprocal(self._alpha, out=self._alpha)
+
+        # x = lerp(x, raw, alpha)
+        np.subtract(self._raw, self._x, out=self._tmp)
+        self._tmp *= self._alpha
+        self._x += self._tmp
+        np.copyto(self._out, self._x)
+        return self._out
+
+    def reset(self):
+        self._last_time = None
+
+
+class MedianEarFilter(EarFilter):
+    """
+    Median of the last `window` EAR values (odd windows keep it a real
+    sample). The window counts samples, not time: at a lower analysis rate
+    it spans longer, which is why the rate governor gets the raw EAR.
+    """
+
+    def __init__(self, window=5, decimals=2):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self.decimals = decimals
+        self._ring = np.zeros(window)
+        self._sorted = np.zeros(window)
+        self._count = 0
+        self._pos = 0
+
+    def apply(self, ear, timestamp):
+        self._ring[self._pos] = ear
+        self._pos = (self._pos + 1) % self.window
+        if self._count < self.window:
+            self._count += 1
+            # Not full yet: sort only the filled part (a view, no copy)
+            filled = self._sorted[:self._count]
+            np.copyto(filled, self._ring[:self._count])
+        else:
+            filled = self._sorted
+            np.copyto(filled, self._ring)
+        filled.sort()
+
+        n = self._count
+        if n % 2:
+            median = filled[n // 2]
+        else:
+            median = (filled[n // 2 - 1] + filled[n // 2]) / 2.0
+        return self._round(float(median))
+
+    def reset(self):
+        self._count = 0
+        self._pos = 0
+
+
+class EmaEarFilter(EarFilter):
+    """Exponential moving average with time constant `tau_ms` (frame-rate independent)."""
+
+    def __init__(self, tau_ms=100.0, decimals=2):
+        self.tau_ms = tau_ms
+        self.decimals = decimals
+        self._value = None
+        self._last_time = None
+
+    def apply(self, ear, timestamp):
+        if self._value is None:
+            self._value = ear
+        else:
+            dt_ms = max(0.0, (timestamp - self._last_time) * 1000.0)
+            alpha = 1.0 - math.exp(-dt_ms / self.tau_ms) if self.tau_ms > 0 else 1.0
+            self._value += alpha * (ear - self._value)
+        self._last_time = timestamp
+        return self._round(self._value)
+
+    def reset(self):
+        self._value = None
+        self._last_time = None
+
+
+# -------------------------------------------------------------------------
+LANDMARK_FILTERS = {"none": None, "one-euro": OneEuroFilter}
+EAR_FILTERS = {"none": None, "median": MedianEarFilter, "ema": EmaEarFilter}
+
+
+def make_filters(landmark="none", ear="none", num_parts=68):
+    """Builds (landmark_filter, ear_filter) from names; "none" gives None."""
+    if landmark not in LANDMARK_FILTERS:
+        raise ValueError(f"Unknown landmark filter '{landmark}' ({', '.join(LANDMARK_FILTERS)})")
+    if ear not in EAR_FILTERS:
+        raise ValueError(f"Unknown EAR filter '{ear}' ({', '.join(EAR_FILTERS)})")
+    landmark_cls = LANDMARK_FILTERS[landmark]
+    ear_cls = EAR_FILTERS[ear]
+    return (landmark_cls(num_parts) if landmark_cls is not None else None,
+            ear_cls() if ear_cls is not None else None)
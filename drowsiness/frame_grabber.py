@@ -0,0 +1,224 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# --- Pixel formats ---
+PIXEL_BGR = "bgr"       # OpenCV converts every frame to BGR (default)
+PIXEL_YUYV = "yuyv"     # raw YUYV 4:2:2, (h, w, 2): channel 0 is the Y (gray) plane
+PIXEL_GREY = "grey"     # raw 8-bit gray (IR / mono cameras)
+_FOURCC = {PIXEL_YUYV: "YUYV", PIXEL_GREY: "GREY"}
+
+
+def _detect_format(frame):
+    """Pixel format of a frame read with CONVERT_RGB off, or None if unusable."""
+    if frame.ndim == 3 and frame.shape[2] == 3:
+        return PIXEL_BGR
+    if frame.ndim == 3 and frame.shape[2] == 2:
+        return PIXEL_YUYV
+    if (frame.ndim == 2 and frame.shape[0] > 1) or (frame.ndim == 3 and frame.shape[2] == 1):
+        return PIXEL_GREY
+    return None
+
+
+# -------------------------------------------------------------------------
+class FrameGrabber:
+    """
+    Reads frames from a cv2.VideoCapture on its own thread into a fixed,
+    preallocated ring buffer and always hands the newest frame to the caller.
+
+    Frames that are captured but never read (because the detector was busy)
+    are counted in `frames_dropped` instead of piling up in the driver buffer.
+    The array returned by read() stays valid until the next call to read().
+
+    Capture times come from time.monotonic(): they drive the closure timers
+    and must not jump when the wall clock is set (NTP sync after boot, DST).
+    The wall-clock time of the same frame is kept next to it for display
+    and logs.
+
+    With pixel_format "yuyv" or "grey" the camera is asked for raw frames
+    (no BGR conversion in the driver). `pixel_format` then holds what the
+    camera actually delivers; it falls back to "bgr" if the request is
+    ignored.
+    """
+
+    def __init__(self, src=0, width=640, height=480, fps=30, buffer_size=4,
+                 pixel_format=PIXEL_BGR):
+        if buffer_size < 3:
+            raise ValueError("buffer_size must be at least 3")
+        if pixel_format not in (PIXEL_BGR, PIXEL_YUYV, PIXEL_GREY):
+            raise ValueError(f"Unknown pixel format '{pixel_format}'")
+
+        self.src = src
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.pixel_format = pixel_format
+
+        self.cap = None
+        self._ring = None
+        self._slots = []
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+        self._write_slot = 0
+        self._latest_slot = -1      # slot holding the newest complete frame
+        self._reading_slot = -1     # slot currently owned by the consumer
+        self._latest_seq = 0
+        self._read_seq = 0
+        self._latest_time = 0.0
+        self._slot_times = []
+        self._slot_wall_times = []
+        self.frame_time = 0.0       # capture time (monotonic) of the frame last returned by read()
+        self.frame_wall_time = 0.0  # the same moment on the wall clock
+
+        # --- Statistics ---
+        self.frames_captured = 0
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+    # ---------------------------------------------------------------------
+    def start(self):
+        self.cap = cv2.VideoCapture(self.src)
+        if not self.cap.isOpened():
+            return False
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep as few stale frames as possible inside the driver itself
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.pixel_format != PIXEL_BGR:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*_FOURCC[self.pixel_format]))
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+        # The first frame tells us the real frame shape the camera delivers
+        ret, first = self.cap.read()
+        if ret and self.pixel_format != PIXEL_BGR:
+            detected = _detect_format(first)
+            if detected is None:
+                # Raw mode gave something else (e.g. a compressed buffer): back to BGR
+                self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+                ret, first = self.cap.read()
+                detected = PIXEL_BGR
+            if detected != self.pixel_format:
+                print(f"WARNING: Camera ignored pixel format '{self.pixel_format}', using '{detected}'")
+            self.pixel_format = detected
+        if not ret:
+            self.cap.release()
+            return False
+
+        self._ring = np.empty((self.buffer_size,) + first.shape, dtype=first.dtype)
+        self._slots = [self._ring[i] for i in range(self.buffer_size)]
+        self._slot_times = [0.0] * self.buffer_size
+        self._slot_wall_times = [0.0] * self.buffer_size
+        np.copyto(self._slots[0], first)
+        self._publish(0, time.monotonic(), time.time())
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop,
+                                        name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return True
+
+    def isOpened(self):
+        return self._running
+
+    # ---------------------------------------------------------------------
+    def _next_write_slot(self):
+        # Never overwrite the frame being processed or the newest frame
+        slot = self._write_slot
+        for _ in range(self.buffer_size):
+            slot = (slot + 1) % self.buffer_size
+            if slot != self._reading_slot and slot != self._latest_slot:
+                break
+        self._write_slot = slot
+        return slot
+
+    def _publish(self, slot, timestamp, wall_time):
+        if self._latest_seq > self._read_seq:
+            self.frames_dropped += 1
+        self._latest_slot = slot
+        self._latest_seq += 1
+        self._latest_time = timestamp
+        self._slot_times[slot] = timestamp
+        self._slot_wall_times[slot] = wall_time
+        self.frames_captured += 1
+
+    def _capture_loop(self):
+        while self._running:
+            with self._lock:
+                slot = self._next_write_slot()
+            buf = self._slots[slot]
+
+            ret, image = self.cap.read(buf)
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.005)
+                continue
+
+            # read() only writes in place when shape and type match
+            if image is not buf:
+                if image.shape != buf.shape:
+                    self.read_failures += 1
+                    continue
+                np.copyto(buf, image)
+
+            with self._lock:
+                self._publish(slot, time.monotonic(), time.time())
+                self._new_frame.notify()
+
+    # ---------------------------------------------------------------------
+    def read(self, timeout=1.0):
+        """
+        Returns (ret, frame) with the newest frame not yet returned.
+        Waits up to `timeout` seconds for a new frame. Its capture time is
+        then in `frame_time` (monotonic) and `frame_wall_time`.
+        """
+        with self._lock:
+            if self._latest_seq == self._read_seq:
+                self._reading_slot = -1
+                if not self._new_frame.wait_for(
+                        lambda: self._latest_seq > self._read_seq or not self._running,
+                        timeout):
+                    return False, None
+                if self._latest_seq == self._read_seq:
+                    return False, None
+
+            self._reading_slot = self._latest_slot
+            self._read_seq = self._latest_seq
+            self.frame_time = self._slot_times[self._reading_slot]
+            self.frame_wall_time = self._slot_wall_times[self._reading_slot]
+            self.frames_delivered += 1
+            return True, self._slots[self._reading_slot]
+
+    def latest_timestamp(self):
+        with self._lock:
+            return self._latest_time
+
+    def stats(self):
+        with self._lock:
+            return {
+                "captured": self.frames_captured,
+                "delivered": self.frames_delivered,
+                "dropped": self.frames_dropped,
+                "read_failures": self.read_failures,
+            }
+
+    # ---------------------------------------------------------------------
+    def release(self):
+        self._running = False
+        with self._lock:
+            self._new_frame.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
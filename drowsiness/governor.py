@@ -0,0 +1,153 @@
+"""
+Adaptive analysis rate.
+
+While the driver is clearly alert (EAR stable and well above the fatigue
+threshold), there is no need to run face detection and landmarks on every
+frame. RateGovernor then lets through only `idle_hz` frames per second. It
+goes back to full rate on the first frame whose EAR comes near the
+thresholds, or as soon as the face is lost.
+
+The state machine measures eye closure in milliseconds from frame
+timestamps, so analysing fewer frames does not change alert timing; the
+alert moves by at most one idle interval. A blink shorter than one idle
+interval can fall between two analysed frames, though, and is then missing
+from the blink rate and PERCLOS; stats() reports that interval
+(`idle_sample_ms`) next to the share of frames skipped.
+"""
+import collections
+
+from .state import EYE_AR_PRE_THRESH
+
+MODE_FULL = "full"
+MODE_IDLE = "idle"
+
+
+# -------------------------------------------------------------------------
+class RateGovernor:
+    """
+    Decides which frames get analysed.
+
+    Call should_process(timestamp) for every captured frame, and
+    observe(ear, timestamp, cost_s) after every analysed one (ear=None when
+    there was no face).
+
+    Idle mode starts once EAR has stayed at or above `ear_pre_thresh +
+    margin` for `stable_ms`, with less than `max_spread` between the highest
+    and lowest value. Any lower EAR means full rate. A dip shorter than
+    `max_blink_ms` is a blink: it does not restart the stable period, so
+    idle mode resumes right after it.
+    """
+
+    def __init__(self, idle_hz=8.0, ear_pre_thresh=EYE_AR_PRE_THRESH, margin=0.02,
+                 stable_ms=2000, max_spread=0.06, max_blink_ms=400):
+        if idle_hz <= 0:
+            raise ValueError("idle_hz must be > 0")
+
+        self.idle_interval = 1.0 / idle_hz
+        self.margin = margin
+        self.alert_ear = ear_pre_thresh + margin
+        self.stable_ms = stable_ms
+        self.max_spread = max_spread
+        self.max_blink_ms = max_blink_ms
+        self.reset()
+
+    def reset(self):
+        self.mode = MODE_FULL
+        self._stable_since = None
+        self._ear_min = None
+        self._ear_max = None
+        self._dip_start = None
+        self._last_processed = None
+        self._processed_times = collections.deque(maxlen=32)
+
+        # --- Statistics ---
+        self.frames_seen = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.processing_s = 0.0
+
+    # ---------------------------------------------------------------------
+    def should_process(self, timestamp):
+        self.frames_seen += 1
+        if (self.mode == MODE_FULL or self._last_processed is None
+                or timestamp - self._last_processed >= self.idle_interval):
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def set_pre_thresh(self, ear_pre_thresh):
+        """Follows a new fatigue threshold (e.g. after calibration)."""
+        self.alert_ear = ear_pre_thresh + self.margin
+
+    def _full_rate(self):
+        self.mode = MODE_FULL
+        self._stable_since = None
+
+    def observe(self, ear, timestamp, cost_s=0.0):
+        self.frames_processed += 1
+        self.processing_s += cost_s
+        self._last_processed = timestamp
+        self._processed_times.append(timestamp)
+
+        if ear is None:
+            self._full_rate()
+            self._dip_start = None
+            return
+
+        if ear < self.alert_ear:
+            self.mode = MODE_FULL
+            if self._dip_start is None:
+                self._dip_start = timestamp
+            elif (timestamp - self._dip_start) * 1000.0 > self.max_blink_ms:
+                self._stable_since = None
+            return
+
+        if self._dip_start is not None:
+            # Back above the threshold: only a long dip restarts the stable period
+            if (timestamp - self._dip_start) * 1000.0 > self.max_blink_ms:
+                self._stable_since = None
+            self._dip_start = None
+
+        if self._stable_since is None:
+            self._stable_since = timestamp
+            self._ear_min = self._ear_max = ear
+            return
+
+        self._ear_min = min(self._ear_min, ear)
+        self._ear_max = max(self._ear_max, ear)
+        if self._ear_max - self._ear_min > self.max_spread:
+            # Not stable: restart the window from this frame
+            self._full_rate()
+            self._stable_since = timestamp
+            self._ear_min = self._ear_max = ear
+            return
+
+        if (timestamp - self._stable_since) * 1000.0 >= self.stable_ms:
+            self.mode = MODE_IDLE
+
+    # ---------------------------------------------------------------------
+    def rate_hz(self):
+        """Analysed frames per second over the last few analysed frames."""
+        times = self._processed_times
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def cpu_saved_s(self):
+        """Estimated processing time saved: skipped frames x mean analysis cost."""
+        if self.frames_processed == 0:
+            return 0.0
+        return self.frames_skipped * self.processing_s / self.frames_processed
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "rate_hz": round(self.rate_hz(), 1),
+            "frames_seen": self.frames_seen,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "skipped_fraction": round(self.frames_skipped / self.frames_seen, 3)
+            if self.frames_seen else 0.0,
+            "cpu_saved_s": round(self.cpu_saved_s(), 3),
+            "idle_sample_ms": round(self.idle_interval * 1000.0, 1),
+        }
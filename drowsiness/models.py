@@ -0,0 +1,189 @@
+"""
+Lazy, cached model loading.
+
+Model files are resolved from a search path instead of the current working
+directory:
+
+    1. directories passed to ModelManager(search_path=...)
+    2. $DROWSINESS_MODEL_PATH (os.pathsep separated)
+    3. the current directory and ./models
+    4. the repository root and <repo>/models
+    5. ~/.cache/drowsiness
+
+preload() starts loading in a background thread, so the (large) 68-point
+predictor loads while the camera warms up; predictor() / detector() then
+block only for whatever is still missing. ModelManager.instance() gives one
+shared manager, and therefore one copy of every model, per process.
+"""
+import os
+import threading
+import time
+
+MODEL_68 = "shape_predictor_68_face_landmarks.dat"
+# ~9 MB instead of ~100 MB. Only gives the two corners of each eye and the
+# nose tip, so it cannot compute EAR on its own: it places the eye band for
+# the eye predictor (EyeRegionLandmarkExtractor(anchor_model=MODEL_5)).
+MODEL_5 = "shape_predictor_5_face_landmarks.dat"
+
+# OpenCV DNN face detectors (see detectors.py); looked up on the same search path
+RES10_PROTOTXT = "deploy.prototxt"
+RES10_MODEL = "res10_300x300_ssd_iter_140000.caffemodel"
+YUNET_MODEL = "face_detection_yunet_2023mar.onnx"
+
+# 12 eye points only, fitted on the eye band of the face box (a few MB, build
+# it with train_eye_predictor.py)
+EYE_MODEL = "eye_predictor_12.dat"
+
+MODEL_ALIASES = {"68": MODEL_68, "5": MODEL_5, "eye": EYE_MODEL}
+ENV_MODEL_PATH = "DROWSINESS_MODEL_PATH"
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# -------------------------------------------------------------------------
+def current_rss_mb():
+    """Resident memory now: /proc on Linux, else psutil if installed, else None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def load_measured(path):
+    """Loads a dlib shape predictor outside the cache: (predictor, RSS growth in MB or None)."""
+    import dlib
+
+    before = current_rss_mb()
+    predictor = dlib.shape_predictor(path)
+    after = current_rss_mb()
+    return predictor, (after - before) if before is not None and after is not None else None
+
+
+# -------------------------------------------------------------------------
+class _Load:
+    """One (possibly still running) model load."""
+
+    def __init__(self, name):
+        self.name = name
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.seconds = None
+
+    def run(self, loader):
+        start = time.perf_counter()
+        try:
+            self.value = loader()
+        except Exception as e:
+            self.error = e
+        self.seconds = time.perf_counter() - start
+        self.done.set()
+
+    def result(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Timed out loading '{self.name}'")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class ModelManager:
+    _instance = None
+    _instance_pid = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, search_path=None):
+        self.search_path = list(search_path or [])
+        self._loads = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        """The shared manager of this process (re-created after a fork)."""
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance_pid != os.getpid():
+                cls._instance = cls()
+                cls._instance_pid = os.getpid()
+            return cls._instance
+
+    # ---------------------------------------------------------------------
+    def search_dirs(self):
+        dirs = list(self.search_path)
+        env = os.environ.get(ENV_MODEL_PATH)
+        if env:
+            dirs.extend(d for d in env.split(os.pathsep) if d)
+        dirs.extend([os.getcwd(), os.path.join(os.getcwd(), "models"),
+                     _REPO_ROOT, os.path.join(_REPO_ROOT, "models"),
+                     os.path.join(os.path.expanduser("~"), ".cache", "drowsiness")])
+        return dirs
+
+    def resolve(self, name):
+        """Returns the full path of a model file (an alias, file name or path)."""
+        name = MODEL_ALIASES.get(name, name)
+        if os.path.isabs(name) or os.path.dirname(name):
+            if os.path.isfile(name):
+                return os.path.abspath(name)
+            raise FileNotFoundError(f"Model file '{name}' not found")
+
+        searched = self.search_dirs()
+        for directory in searched:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                return path
+        raise FileNotFoundError(f"Model '{name}' not found in: " + ", ".join(searched))
+
+    # ---------------------------------------------------------------------
+    def _get(self, key, loader, background):
+        with self._lock:
+            load = self._loads.get(key)
+            if load is not None:
+                return load
+            load = self._loads[key] = _Load(key)
+
+        if background:
+            threading.Thread(target=load.run, args=(loader,),
+                             name=f"load-{os.path.basename(key)}", daemon=True).start()
+        else:
+            load.run(loader)
+        return load
+
+    def _load_detector(self, background=False):
+        def loader():
+            import dlib
+            return dlib.get_frontal_face_detector()
+        return self._get("hog_detector", loader, background)
+
+    def _load_predictor(self, name, background=False):
+        path = self.resolve(name)
+
+        def loader():
+            import dlib
+            return dlib.shape_predictor(path)
+        return self._get(path, loader, background)
+
+    def preload(self, landmark_model=MODEL_68):
+        """Starts loading the face detector and `landmark_model` in the background."""
+        self._load_detector(background=True)
+        self._load_predictor(landmark_model, background=True)
+
+    def detector(self, timeout=None):
+        """The shared dlib HOG face detector."""
+        return self._load_detector().result(timeout)
+
+    def predictor(self, name=MODEL_68, timeout=None):
+        """The shared dlib shape predictor for `name` (alias, file name or path)."""
+        return self._load_predictor(name).result(timeout)
+
+    # ---------------------------------------------------------------------
+    def load_times(self):
+        """Seconds each finished load took, keyed by model."""
+        with self._lock:
+            loads = list(self._loads.values())
+        return {os.path.basename(load.name): round(load.seconds, 3)
+                for load in loads if load.done.is_set() and load.error is None}
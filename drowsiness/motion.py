@@ -0,0 +1,115 @@
+"""
+Change gating: skip the analysis of frames in which nothing moved.
+
+In a parked or idling vehicle the cabin image barely changes, yet every
+frame would still go through gray conversion, detection and the landmark
+fit. MotionGate compares a small thumbnail of the eye band of the last
+face box (where a blink or a closure shows) with the one of the last
+analysed frame. If only a few thumbnail pixels changed, the frame is not
+analysed: the pipeline reuses the last landmarks and EAR and still feeds
+them to the state machine, so the closure timers keep running (eyes that
+stay closed and still must still raise the alarm).
+
+A full analysis is forced at least every `max_skip_s` seconds, and
+whenever there was no face on the last analysed frame.
+"""
+import cv2
+import numpy as np
+
+from .ear import eye_region
+
+
+# -------------------------------------------------------------------------
+class MotionGate:
+    """
+    should_process(frame, timestamp) for every frame that would be analysed;
+    set_reference(frame, face, timestamp) after every analysed one
+    (face=None when there was no face or no EAR).
+
+    A frame counts as changed when at least `change_thresh` of the
+    `thumb_size` thumbnail pixels differ by more than `pixel_delta` gray
+    levels. Downscaling averages the sensor noise away, so the count
+    stays near zero for a still image.
+    """
+
+    def __init__(self, change_thresh=0.02, pixel_delta=12, thumb_size=(48, 16), max_skip_s=1.0):
+        self.change_thresh = change_thresh
+        self.pixel_delta = pixel_delta
+        self.thumb_size = thumb_size
+        self.max_skip_s = max_skip_s
+
+        w, h = thumb_size
+        self._ref = np.zeros((h, w), dtype=np.uint8)
+        self._cur = np.zeros((h, w), dtype=np.uint8)
+        self._diff = np.zeros((h, w), dtype=np.uint8)
+        self._small = None
+        self.reset()
+
+    def reset(self):
+        self._roi = None
+        self._ref_time = None
+        self.change = None          # changed fraction of the last compared frame
+
+        # --- Statistics ---
+        self.frames_seen = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.forced_refreshes = 0
+
+    # ---------------------------------------------------------------------
+    def _thumbnail(self, frame, out):
+        x0, y0, x1, y1 = self._roi
+        crop = frame[y0:y1, x0:x1]
+        if frame.ndim == 3:
+            self._small = cv2.resize(crop, self.thumb_size, dst=self._small,
+                                     interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=out)
+        else:
+            cv2.resize(crop, self.thumb_size, dst=out, interpolation=cv2.INTER_AREA)
+        return out
+
+    def should_process(self, frame, timestamp):
+        self.frames_seen += 1
+        if self._roi is None:
+            self.frames_processed += 1
+            return True
+        if timestamp - self._ref_time >= self.max_skip_s:
+            self.forced_refreshes += 1
+            self.frames_processed += 1
+            return True
+
+        self._thumbnail(frame, self._cur)
+        cv2.absdiff(self._cur, self._ref, dst=self._diff)
+        cv2.threshold(self._diff, self.pixel_delta, 255, cv2.THRESH_BINARY, dst=self._diff)
+        self.change = cv2.countNonZero(self._diff) / self._diff.size
+        if self.change >= self.change_thresh:
+            self.frames_processed += 1
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def set_reference(self, frame, face, timestamp):
+        if face is None:
+            self._roi = None
+            return
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = eye_region(face.left(), face.top(), face.right(), face.bottom())
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(w, x1 + 1), min(h, y1 + 1)
+        if x1 - x0 < 8 or y1 - y0 < 4:
+            self._roi = None
+            return
+        self._roi = (x0, y0, x1, y1)
+        self._thumbnail(frame, self._ref)
+        self._ref_time = timestamp
+
+    # ---------------------------------------------------------------------
+    def stats(self):
+        return {
+            "frames_seen": self.frames_seen,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "skipped_fraction": round(self.frames_skipped / self.frames_seen, 3)
+            if self.frames_seen else 0.0,
+            "forced_refreshes": self.forced_refreshes,
+        }
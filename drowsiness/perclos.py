@@ -0,0 +1,229 @@
+"""
+Streaming eye-closure statistics: PERCLOS, blinks and micro-sleeps.
+
+Everything is kept over a sliding time window in fixed-size ring buffers
+with running sums, so update() costs O(1) per frame no matter how long the
+window is. Samples are weighted by the time since the previous frame, so
+the numbers do not depend on the frame rate (or on frames skipped by the
+rate governor).
+
+    perclos            fraction of the window with EAR below `closed_thresh`
+    blink rate         blinks per minute (closures up to `max_blink_ms`)
+    blink durations    running histogram over BLINK_BINS_MS
+    closing speed      mean EAR drop per second at the start of a closure
+    micro-sleeps       closures between `max_blink_ms` and `microsleep_max_ms`
+"""
+from array import array
+
+from .state import EYE_AR_THRESH, MAX_FRAME_GAP_MS
+
+PERCLOS_WINDOW_S = 60
+MAX_BLINK_MS = 400
+MICROSLEEP_MAX_MS = 2000
+# Upper edges of the blink-duration histogram bins (the last bin is open)
+BLINK_BINS_MS = (100, 150, 200, 300, 400)
+
+
+# -------------------------------------------------------------------------
+class EyeClosureStats:
+    """
+    Feed update(ear, timestamp) for every analysed frame; read the
+    properties at any time. `max_rate_hz` sizes the sample ring (frames per
+    second the window must hold); at higher rates, the window is simply
+    shorter.
+    """
+
+    def __init__(self, window_s=PERCLOS_WINDOW_S, closed_thresh=EYE_AR_THRESH,
+                 max_blink_ms=MAX_BLINK_MS, microsleep_max_ms=MICROSLEEP_MAX_MS,
+                 max_rate_hz=60, max_episodes=512, max_frame_gap_ms=MAX_FRAME_GAP_MS):
+        self.window_s = window_s
+        self.closed_thresh = closed_thresh
+        self.max_blink_ms = max_blink_ms
+        self.microsleep_max_ms = microsleep_max_ms
+        self.max_frame_gap_ms = max_frame_gap_ms
+
+        # --- Sample ring: (timestamp, duration ms, closed) ---
+        size = int(window_s * max_rate_hz) + 1
+        self._t = array("d", bytes(8 * size))
+        self._dt = array("d", bytes(8 * size))
+        self._closed = bytearray(size)
+
+        # --- Closure episode ring: (end time, duration ms, closing speed) ---
+        self._ep_t = array("d", bytes(8 * max_episodes))
+        self._ep_ms = array("d", bytes(8 * max_episodes))
+        self._ep_speed = array("d", bytes(8 * max_episodes))
+        self.reset()
+
+    def reset(self):
+        self._head = self._count = 0
+        self._ep_head = self._ep_count = 0
+
+        # --- Running sums over the window ---
+        self.total_ms = 0.0
+        self.closed_ms = 0.0
+        self.blinks = 0
+        self.blink_ms_sum = 0.0
+        self.blink_histogram = [0] * (len(BLINK_BINS_MS) + 1)
+        self.microsleeps = 0
+        self.long_closures = 0
+        self._speed_sum = 0.0
+        self._speed_count = 0
+        self.last_microsleep_time = float("-inf")   # end of the newest micro-sleep
+
+        # --- Current episode ---
+        self._last_time = None
+        self._last_open = None          # (timestamp, ear) of the last open-eye frame
+        self._closure_start = None
+        self._closure_speed = 0.0
+
+    # ---------------------------------------------------------------------
+    def _classify(self, duration_ms):
+        if duration_ms <= self.max_blink_ms:
+            return 0
+        if duration_ms <= self.microsleep_max_ms:
+            return 1
+        return 2
+
+    def _bin(self, duration_ms):
+        for i, edge in enumerate(BLINK_BINS_MS):
+            if duration_ms <= edge:
+                return i
+        return len(BLINK_BINS_MS)
+
+    def _count_episode(self, duration_ms, speed, sign):
+        kind = self._classify(duration_ms)
+        if kind == 0:
+            self.blinks += sign
+            self.blink_ms_sum += sign * duration_ms
+            self.blink_histogram[self._bin(duration_ms)] += sign
+        elif kind == 1:
+            self.microsleeps += sign
+        else:
+            self.long_closures += sign
+        if speed > 0:
+            self._speed_sum += sign * speed
+            self._speed_count += sign
+
+    def _push_episode(self, end_time, duration_ms, speed):
+        size = len(self._ep_t)
+        if self._ep_count == size:
+            self._pop_episode()
+        i = (self._ep_head + self._ep_count) % size
+        self._ep_t[i] = end_time
+        self._ep_ms[i] = duration_ms
+        self._ep_speed[i] = speed
+        self._ep_count += 1
+        self._count_episode(duration_ms, speed, 1)
+        if self._classify(duration_ms) == 1:
+            self.last_microsleep_time = end_time
+
+    def _pop_episode(self):
+        i = self._ep_head
+        self._count_episode(self._ep_ms[i], self._ep_speed[i], -1)
+        self._ep_head = (i + 1) % len(self._ep_t)
+        self._ep_count -= 1
+
+    def _push_sample(self, timestamp, dt, closed):
+        size = len(self._t)
+        if self._count == size:
+            self._pop_sample()
+        i = (self._head + self._count) % size
+        self._t[i] = timestamp
+        self._dt[i] = dt
+        self._closed[i] = closed
+        self._count += 1
+        self.total_ms += dt
+        if closed:
+            self.closed_ms += dt
+
+    def _pop_sample(self):
+        i = self._head
+        self.total_ms -= self._dt[i]
+        if self._closed[i]:
+            self.closed_ms -= self._dt[i]
+        self._head = (i + 1) % len(self._t)
+        self._count -= 1
+
+    # ---------------------------------------------------------------------
+    def update(self, ear, timestamp):
+        last = self._last_time
+        self._last_time = timestamp
+        dt = 0.0
+        if last is not None:
+            dt = min(max(0.0, (timestamp - last) * 1000.0), self.max_frame_gap_ms)
+
+        closed = ear < self.closed_thresh
+        self._push_sample(timestamp, dt, closed)
+
+        if closed:
+            if self._closure_start is None:
+                self._closure_start = timestamp
+                self._closure_speed = 0.0
+                if self._last_open is not None and timestamp > self._last_open[0]:
+                    self._closure_speed = (self._last_open[1] - ear) / (timestamp - self._last_open[0])
+        else:
+            if self._closure_start is not None:
+                self._push_episode(timestamp, (timestamp - self._closure_start) * 1000.0,
+                                   self._closure_speed)
+                self._closure_start = None
+            self._last_open = (timestamp, ear)
+
+        # Drop everything that slid out of the window
+        oldest = timestamp - self.window_s
+        while self._count and self._t[self._head] < oldest:
+            self._pop_sample()
+        while self._ep_count and self._ep_t[self._ep_head] < oldest:
+            self._pop_episode()
+
+    def gap(self):
+        """
+        No EAR for this frame (no face): the next update() starts a new
+        interval. A closure in progress ends at its last sample, so the
+        time without a face is never counted as closed eyes.
+        """
+        if self._closure_start is not None:
+            self._push_episode(self._last_time, (self._last_time - self._closure_start) * 1000.0,
+                               self._closure_speed)
+            self._closure_start = None
+        self._last_time = None
+        self._last_open = None
+
+    # ---------------------------------------------------------------------
+    def coverage(self):
+        """Fraction of the window that is covered by samples (0..1)."""
+        return min(1.0, self.total_ms / (self.window_s * 1000.0))
+
+    @property
+    def perclos(self):
+        return self.closed_ms / self.total_ms if self.total_ms > 0 else 0.0
+
+    @property
+    def blink_rate(self):
+        """Blinks per minute over the covered part of the window."""
+        if self.total_ms <= 0:
+            return 0.0
+        return self.blinks * 60000.0 / self.total_ms
+
+    @property
+    def mean_blink_ms(self):
+        return self.blink_ms_sum / self.blinks if self.blinks else 0.0
+
+    @property
+    def mean_closing_speed(self):
+        """Mean EAR drop per second when the eyes start to close."""
+        return self._speed_sum / self._speed_count if self._speed_count else 0.0
+
+    def summary(self):
+        return {
+            "window_s": self.window_s,
+            "coverage": round(self.coverage(), 3),
+            "perclos": round(self.perclos, 4),
+            "blinks": self.blinks,
+            "blink_rate_per_min": round(self.blink_rate, 1),
+            "mean_blink_ms": round(self.mean_blink_ms, 1),
+            "blink_histogram_ms": dict(zip([f"<={b}" for b in BLINK_BINS_MS] + [f">{BLINK_BINS_MS[-1]}"],
+                                           self.blink_histogram)),
+            "mean_closing_speed": round(self.mean_closing_speed, 3),
+            "microsleeps": self.microsleeps,
+            "long_closures": self.long_closures,
+        }
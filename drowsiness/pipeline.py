@@ -0,0 +1,345 @@
+import time
+
+import cv2
+
+from .profiling import StageProfiler
+from .stages import EarMetric, NullAlarmSink
+from .state import DrowsinessStateMachine
+
+
+# -------------------------------------------------------------------------
+class FrameResult:
+    """Everything the pipeline knows about one processed frame."""
+
+    __slots__ = ("index", "frame", "gray", "timestamp", "wall_time", "face", "landmarks",
+                 "left_ear", "right_ear", "ear", "event", "status", "tracks", "skipped")
+
+    def __init__(self, index, frame, gray, timestamp):
+        self.index = index
+        self.frame = frame
+        self.gray = gray
+        self.timestamp = timestamp      # monotonic / media time: all durations use it
+        self.wall_time = None           # time.time() of the frame, for display and logs
+        self.face = None
+        self.landmarks = None
+        self.left_ear = None
+        self.right_ear = None
+        self.ear = None
+        self.event = None
+        self.status = None
+        self.tracks = None      # all FaceTracks, with a multi-face detector
+        self.skipped = False    # not analysed (rate governor / motion gate); results are the last frame's
+
+
+# -------------------------------------------------------------------------
+class Pipeline:
+    """
+    Wires the stages together:
+
+        source -> gray -> detector -> landmarks -> metric -> state machine -> alarm
+
+    Nothing is opened until open() is called. step() processes one frame and
+    returns its FrameResult (or None if no frame could be read); run() loops
+    until the source is exhausted or the on_frame callback returns False.
+
+    With a multi-face detector, the driver goes through the path above and
+    `state` is the driver's state machine. Every other tracked face gets one
+    landmark call per frame and updates its own state, but never the alarm.
+
+    With a RateGovernor, frames it turns down are not analysed: they reuse
+    the last landmarks and EAR (`skipped` is set) and go through the state
+    machine like the motion gate's, so the closure timers and statistics
+    stay at the camera's frame rate. A blink that falls between two
+    analysed frames is still not seen; governor.stats() reports the idle
+    sampling interval.
+
+    Optional filters sit between the landmark fit and the state machine:
+    `landmark_filter` smooths the landmark coordinates, `ear_filter` the
+    combined EAR (see filters.py). Both are reset when the face is lost.
+    The rate governor gets the EAR before `ear_filter`.
+
+    With a MotionGate, frames in which the eye region did not change are
+    not analysed either: they reuse the last landmarks and EAR the same way.
+
+    With an EarCalibrator, its per-driver thresholds are pushed into the
+    state machine (and the closure statistics and governor) as soon as they
+    are known.
+
+    With an EventPublisher (`events`), every frame's outcome is handed to it
+    after the state machine ran; it publishes the alert transitions. A
+    ClipRecorder (`recorder`) gets every frame the same way and saves a clip
+    around each alarm.
+    """
+
+    def __init__(self, source, detector, landmarks, metric=None, state_machine=None,
+                 alarm=None, telemetry=None, profiler=None, governor=None, calibrator=None,
+                 landmark_filter=None, ear_filter=None, motion_gate=None, events=None,
+                 recorder=None):
+        self.source = source
+        self.detector = detector
+        self.landmarks = landmarks
+        self.metric = metric or EarMetric()
+        self.state = state_machine or DrowsinessStateMachine()
+        self.alarm = alarm or NullAlarmSink()
+        self.telemetry = telemetry
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.governor = governor
+        self.calibrator = calibrator
+        self.landmark_filter = landmark_filter
+        self.ear_filter = ear_filter
+        self.motion_gate = motion_gate
+        self.events = events
+        self.recorder = recorder
+
+        if self.landmarks.num_parts < self.metric.min_parts:
+            raise ValueError(f"{type(self.metric).__name__} needs {self.metric.min_parts} landmarks, "
+                             f"the landmark stage gives {self.landmarks.num_parts}")
+
+        self.multi_face = getattr(detector, "multi_face", False)
+        if self.multi_face:
+            # Whoever is the driver uses the pipeline's state machine
+            self.detector.track_set.driver_state = self.state
+
+        self.frame_count = 0
+        self.read_failures = 0
+        self._gray = None
+        self._last = None
+        self._raw_ear = None
+        self._wall_time = None
+
+    # ---------------------------------------------------------------------
+    def open(self):
+        return self.source.open()
+
+    def step(self):
+        profiler = self.profiler
+        profiler.begin()
+
+        ret, frame, timestamp = self.source.read()
+        if not ret:
+            self.read_failures += 1
+            return None
+        profiler.lap("capture")
+        self.frame_count += 1
+        self._wall_time = self.source.wall_time()
+
+        result = self._process(frame, timestamp)
+        result.wall_time = self._wall_time
+        if self.events is not None:
+            self.events.observe(result, self.state)
+        if self.recorder is not None:
+            self.recorder.add(result, self.state, self.source.bgr)
+        return result
+
+    def _process(self, frame, timestamp):
+        governor = self.governor
+        gate = self.motion_gate
+        if governor is None and gate is None:
+            return self._analyse(frame, timestamp)
+        if governor is not None and not governor.should_process(timestamp):
+            return self._reuse(frame, timestamp)
+        if gate is not None and not gate.should_process(frame, timestamp):
+            self.profiler.lap("gate")
+            return self._reuse(frame, timestamp)
+
+        start = time.perf_counter()
+        self._raw_ear = None
+        result = self._analyse(frame, timestamp)
+        ear = result.ear if result.face is not None else None
+        if gate is not None:
+            gate.set_reference(frame, result.face if ear is not None else None, timestamp)
+        if governor is not None:
+            # The unfiltered EAR: a smoothing filter at the idle rate would
+            # hold the first low samples back and delay the wake-up
+            governor.observe(self._raw_ear if ear is not None else None, timestamp,
+                             time.perf_counter() - start)
+        return result
+
+    def _copy_last(self, frame, timestamp):
+        result = FrameResult(self.frame_count, frame, None, timestamp)
+        result.skipped = True
+        last = self._last
+        if last is not None:
+            result.face = last.face
+            result.landmarks = last.landmarks
+            result.left_ear = last.left_ear
+            result.right_ear = last.right_ear
+            result.ear = last.ear
+            result.tracks = last.tracks
+        return result
+
+    def _reuse(self, frame, timestamp):
+        """Frame not analysed: the last EAR goes through the state machine again."""
+        result = self._copy_last(frame, timestamp)
+        if result.ear is None:
+            self.state.no_face(timestamp)
+            result.status = self.state.status
+            if self.telemetry is not None:
+                self.telemetry.record(timestamp, self.frame_count, self.state,
+                                      wall_time=self._wall_time)
+            self.profiler.lap("state")
+            return result
+
+        result.event = self.state.update(result.ear, timestamp)
+        result.status = self.state.status
+        if self.telemetry is not None:
+            self.telemetry.record(timestamp, self.frame_count, self.state,
+                                  result.left_ear, result.right_ear, result.ear, result.face,
+                                  self._wall_time)
+        if result.event is not None:
+            self.alarm.on_event(result.event, result)
+        self.profiler.lap("state")
+        return result
+
+    def _analyse(self, frame, timestamp):
+        profiler = self.profiler
+        gray = self.source.gray()
+        if gray is None:
+            gray = self._gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        result = self._last = FrameResult(self.frame_count, frame, gray, timestamp)
+        profiler.lap("gray")
+
+        result.face = self.detector.detect(gray)
+        profiler.lap("detect")
+
+        if self.multi_face:
+            result.tracks = self.detector.tracks
+            self._update_passengers(result.tracks, gray, timestamp)
+            profiler.lap("passengers")
+
+        if result.face is None:
+            self._reset_filters()
+            self.state.no_face(timestamp)
+            result.status = self.state.status
+            if self.telemetry is not None:
+                self.telemetry.record(timestamp, self.frame_count, self.state,
+                                      wall_time=self._wall_time)
+            profiler.lap("state")
+            return result
+
+        try:
+            result.landmarks = self.landmarks.extract(gray, result.face)
+        except Exception as e:
+            print(f"Warning: Could not extract landmarks: {e}")
+            return result
+        profiler.lap("landmarks")
+
+        if self.landmark_filter is not None:
+            result.landmarks = self.landmark_filter.apply(result.landmarks, timestamp)
+
+        try:
+            result.left_ear, result.right_ear, result.ear = self.metric.compute(result.landmarks)
+        except Exception as e:
+            print(f"Warning: EAR calculation error: {e}")
+            return result
+        self._raw_ear = result.ear
+        if self.ear_filter is not None:
+            result.ear = self.ear_filter.apply(result.ear, timestamp)
+        profiler.lap("ear")
+
+        if self.calibrator is not None and self.calibrator.observe(result.ear, timestamp):
+            self.apply_thresholds(self.calibrator.ear_thresh, self.calibrator.ear_pre_thresh)
+
+        result.event = self.state.update(result.ear, timestamp)
+        result.status = self.state.status
+        if self.telemetry is not None:
+            self.telemetry.record(timestamp, self.frame_count, self.state,
+                                  result.left_ear, result.right_ear, result.ear, result.face,
+                                  self._wall_time)
+        if result.event is not None:
+            self.alarm.on_event(result.event, result)
+        profiler.lap("state")
+        return result
+
+    def _reset_filters(self):
+        if self.landmark_filter is not None:
+            self.landmark_filter.reset()
+        if self.ear_filter is not None:
+            self.ear_filter.reset()
+
+    def _update_passengers(self, tracks, gray, timestamp):
+        driver = self.detector.driver
+        for track in tracks:
+            if track is driver:
+                continue
+            if not track.visible:
+                track.state.no_face(timestamp)
+                continue
+            try:
+                track.landmarks = self.landmarks.extract(gray, track.box)
+                track.left_ear, track.right_ear, track.ear = self.metric.compute(track.landmarks)
+            except Exception as e:
+                print(f"Warning: Could not analyse face #{track.id}: {e}")
+                continue
+            track.event = track.state.update(track.ear, timestamp)
+
+    def apply_thresholds(self, ear_thresh, ear_pre_thresh):
+        """Switches every stage that compares EAR to the given thresholds."""
+        self.state.ear_thresh = ear_thresh
+        self.state.ear_pre_thresh = ear_pre_thresh
+        if self.state.closure_stats is not None:
+            self.state.closure_stats.closed_thresh = ear_thresh
+        if self.governor is not None:
+            self.governor.set_pre_thresh(ear_pre_thresh)
+
+    def run(self, on_frame=None, max_frames=None):
+        """
+        Processes frames until the source ends, `max_frames` is reached or
+        `on_frame(result)` returns False.
+        """
+        live = getattr(self.source, "live", False)
+        processed = 0
+        while max_frames is None or processed < max_frames:
+            result = self.step()
+            if result is None:
+                if live:
+                    print("WARNING: Failed to read frame")
+                    continue
+                break
+
+            processed += 1
+            keep_going = on_frame(result) if on_frame is not None else True
+            self.profiler.end_frame()
+            if keep_going is False:
+                break
+        return processed
+
+    # ---------------------------------------------------------------------
+    def reset(self):
+        """Manual reset: clear the counters and silence the alarm."""
+        self.state.reset()
+        self.alarm.stop()
+        self._reset_filters()
+        if self.governor is not None:
+            self.governor.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.events is not None:
+            self.events.manual_reset()
+
+    def close(self):
+        self.source.close()
+        self.alarm.close()
+        if self.events is not None:
+            self.events.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+
+    def stats(self):
+        stats = {
+            "frames": self.frame_count,
+            "read_failures": self.read_failures,
+            "source": self.source.stats(),
+            "detector": self.detector.stats(),
+        }
+        if self.governor is not None:
+            stats["governor"] = self.governor.stats()
+        if self.motion_gate is not None:
+            stats["motion_gate"] = self.motion_gate.stats()
+        if self.events is not None:
+            stats["events"] = self.events.stats()
+        if self.recorder is not None:
+            stats["clips"] = self.recorder.stats()
+        return stats
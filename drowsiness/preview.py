@@ -0,0 +1,272 @@
+"""
+Optional live preview, decoupled from the analysis loop.
+
+The production units have no screen: without a preview nothing is drawn at
+all. With one, the analysis loop only draws the frames the preview will
+actually show (at most `max_fps` per second), on a copy of its own, and the
+slow part - imshow/waitKey or JPEG encoding - runs on the preview thread.
+A slow viewer never slows the analysis down; it just sees fewer frames.
+
+    WindowPreview   OpenCV window; keys go to a ControlChannel (ESC quits, r resets)
+    MjpegPreview    MJPEG over HTTP: http://127.0.0.1:8080/ (or /snapshot.jpg)
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from .control import CMD_QUIT, CMD_RESET
+
+
+# -------------------------------------------------------------------------
+class PreviewOutput:
+    """
+    From the analysis loop:
+
+        canvas = preview.canvas(result.frame, source.bgr)
+        if canvas is not None:
+            draw_result(canvas, result, state)
+            preview.publish()
+
+    canvas() returns None until the next preview frame is due, so the
+    colour conversion (`to_bgr`, e.g. FrameSource.bgr for a gray/raw
+    camera) and the overlays cost nothing on the other frames. Three reused buffers (draw /
+    ready / shown) keep the two threads from ever touching the same image.
+    """
+
+    def __init__(self, max_fps=10.0):
+        if max_fps <= 0:
+            raise ValueError("max_fps must be > 0")
+        self.interval = 1.0 / max_fps
+        self._buffers = [None, None, None]
+        self._draw, self._ready, self._shown = 0, 1, 2
+        self._has_ready = False
+        self._last = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        # --- Statistics ---
+        self.frames_published = 0
+        self.frames_shown = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    # --- Analysis side ----------------------------------------------------
+    def canvas(self, frame, to_bgr=None):
+        now = time.monotonic()
+        if self._last is not None and now - self._last < self.interval:
+            return None
+        self._last = now
+        if to_bgr is not None:
+            frame = to_bgr(frame)
+
+        buf = self._buffers[self._draw]
+        if buf is None or buf.shape != frame.shape:
+            buf = self._buffers[self._draw] = np.empty_like(frame)
+        np.copyto(buf, frame)
+        return buf
+
+    def publish(self):
+        with self._cond:
+            self._draw, self._ready = self._ready, self._draw
+            self._has_ready = True
+            self.frames_published += 1
+            self._cond.notify()
+
+    # --- Preview thread ---------------------------------------------------
+    def _take(self, timeout):
+        with self._cond:
+            if not self._has_ready:
+                self._cond.wait(timeout)
+            if not self._has_ready:
+                return None
+            self._shown, self._ready = self._ready, self._shown
+            self._has_ready = False
+            return self._buffers[self._shown]
+
+    def _run(self):
+        try:
+            while self._running:
+                frame = self._take(0.05)
+                if frame is None:
+                    self._idle()
+                    continue
+                self._show(frame)
+                self.frames_shown += 1
+        finally:
+            self._close()
+
+    def _show(self, frame):
+        raise NotImplementedError
+
+    def _idle(self):
+        pass
+
+    def _close(self):
+        pass
+
+    def close(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def stats(self):
+        return {"published": self.frames_published, "shown": self.frames_shown}
+
+
+# -------------------------------------------------------------------------
+class WindowPreview(PreviewOutput):
+    """OpenCV window on its own thread. ESC / 'r' are sent to `control`."""
+
+    def __init__(self, name, max_fps=15.0, control=None):
+        super().__init__(max_fps)
+        self.name = name
+        self.control = control
+
+    def _show(self, frame):
+        cv2.imshow(self.name, frame)
+        self._poll_keys()
+
+    def _idle(self):
+        self._poll_keys()
+
+    def _poll_keys(self):
+        key = cv2.waitKey(1) & 0xFF
+        if self.control is None:
+            return
+        if key == 27:  # ESC
+            self.control.send(CMD_QUIT)
+        elif key == ord('r'):
+            self.control.send(CMD_RESET)
+
+    def _close(self):
+        # HighGUI windows belong to the thread that created them
+        cv2.destroyWindow(self.name)
+        cv2.waitKey(1)
+
+
+# -------------------------------------------------------------------------
+class MjpegPreview(PreviewOutput):
+    """
+    Serves the preview as an MJPEG stream on http://host:port/ (and a
+    single frame on /snapshot.jpg). Frames are only JPEG-encoded while a
+    client is connected.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, max_fps=10.0, quality=80):
+        super().__init__(max_fps)
+        self.host = host
+        self.port = port
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._jpeg_cond = threading.Condition()
+        self._httpd = None
+        self.clients = 0
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]   # real port when 0 was asked
+        threading.Thread(target=self._httpd.serve_forever, name="mjpeg-http", daemon=True).start()
+        return super().start()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def _show(self, frame):
+        if self.clients == 0:
+            return
+        ok, buf = cv2.imencode(".jpg", frame, self.params)
+        if not ok:
+            return
+        with self._jpeg_cond:
+            self._jpeg = buf.tobytes()
+            self._jpeg_seq += 1
+            self._jpeg_cond.notify_all()
+
+    def _next_jpeg(self, seq, timeout=5.0):
+        """Waits for a JPEG newer than `seq`; returns (seq, jpeg) or (seq, None)."""
+        with self._jpeg_cond:
+            self._jpeg_cond.wait_for(lambda: self._jpeg_seq != seq or not self._running, timeout)
+            if self._jpeg_seq == seq or not self._running:
+                return seq, None
+            return self._jpeg_seq, self._jpeg
+
+    def _serve_stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        seq = self._jpeg_seq
+        while self._running:
+            seq, jpeg = self._next_jpeg(seq)
+            if jpeg is None:
+                continue
+            handler.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                b"Content-Length: %d\r\n\r\n" % len(jpeg))
+            handler.wfile.write(jpeg)
+            handler.wfile.write(b"\r\n")
+
+    def _serve_snapshot(self, handler):
+        _, jpeg = self._next_jpeg(self._jpeg_seq)
+        if jpeg is None:
+            handler.send_error(503, "No frame yet")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def _close(self):
+        with self._jpeg_cond:
+            self._jpeg_cond.notify_all()
+
+    def close(self):
+        super().close()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def stats(self):
+        stats = super().stats()
+        stats["clients"] = self.clients
+        return stats
+
+
+def _make_handler(preview):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/stream.mjpg", "/snapshot.jpg"):
+                self.send_error(404)
+                return
+            with preview._jpeg_cond:
+                preview.clients += 1
+            try:
+                if self.path == "/snapshot.jpg":
+                    preview._serve_snapshot(self)
+                else:
+                    preview._serve_stream(self)
+            except (BrokenPipeError, ConnectionResetError):
+                pass    # viewer went away
+            finally:
+                with preview._jpeg_cond:
+                    preview.clients -= 1
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,128 @@
+import time
+
+import cv2
+import numpy as np
+
+_perf_ns = time.perf_counter_ns
+
+
+# -------------------------------------------------------------------------
+class StageProfiler:
+    """
+    Per-stage latency timers for the detection loop.
+
+    Call begin() at the top of each iteration and lap("stage") after each
+    stage; end_frame() records the whole iteration as "total". The last
+    `window` samples of every stage are kept in a preallocated ring, from
+    which rolling p50/p95/p99 are computed on demand.
+
+    When `enabled` is False every call returns immediately, so the timers
+    can stay in the loop at (almost) no cost.
+    """
+
+    def __init__(self, enabled=True, window=1024, overlay_every=15):
+        self.enabled = enabled
+        self.window = window
+        self.overlay_every = overlay_every
+
+        self._rings = {}
+        self._counts = {}
+        self._order = []
+        self._frame_start = 0
+        self._last = 0
+        self.frames = 0
+
+        self._overlay_lines = []
+        self._overlay_age = overlay_every
+
+    # ---------------------------------------------------------------------
+    def _ring(self, stage):
+        ring = self._rings.get(stage)
+        if ring is None:
+            ring = self._rings[stage] = np.zeros(self.window, dtype=np.int64)
+            self._counts[stage] = 0
+            self._order.append(stage)
+        return ring
+
+    def _add(self, stage, elapsed_ns):
+        ring = self._ring(stage)
+        ring[self._counts[stage] % self.window] = elapsed_ns
+        self._counts[stage] += 1
+
+    def begin(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._last = _perf_ns()
+
+    def lap(self, stage):
+        if not self.enabled:
+            return
+        now = _perf_ns()
+        self._add(stage, now - self._last)
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self._add("total", _perf_ns() - self._frame_start)
+        self.frames += 1
+        self._overlay_age += 1
+
+    # ---------------------------------------------------------------------
+    def percentiles(self, stage, q=(50, 95, 99)):
+        """Rolling percentiles of `stage` in milliseconds."""
+        count = self._counts.get(stage, 0)
+        if count == 0:
+            return [0.0 for _ in q]
+        samples = self._rings[stage][:min(count, self.window)]
+        return [v / 1e6 for v in np.percentile(samples, q)]
+
+    def fps(self):
+        """Loop rate over the rolling window, from the "total" samples."""
+        count = self._counts.get("total", 0)
+        if count == 0:
+            return 0.0
+        samples = self._rings["total"][:min(count, self.window)]
+        mean_ns = samples.mean()
+        return 1e9 / mean_ns if mean_ns > 0 else 0.0
+
+    def summary(self):
+        result = {"frames": self.frames, "fps": round(self.fps(), 2), "stages": {}}
+        for stage in self._order:
+            p50, p95, p99 = self.percentiles(stage)
+            result["stages"][stage] = {
+                "samples": self._counts[stage],
+                "p50_ms": round(p50, 3),
+                "p95_ms": round(p95, 3),
+                "p99_ms": round(p99, 3),
+            }
+        return result
+
+    def print_summary(self):
+        if not self.enabled or self.frames == 0:
+            return
+        summary = self.summary()
+        print(f"[PROFILE] {summary['frames']} frames, {summary['fps']:.1f} FPS "
+              f"(last {self.window} frames)")
+        print(f"[PROFILE] {'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, s in summary["stages"].items():
+            print(f"[PROFILE] {stage:<12}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+    # ---------------------------------------------------------------------
+    def draw(self, frame, origin=(450, 20)):
+        """Draws FPS and per-stage p50/p95 on the frame (text refreshed every few frames)."""
+        if not self.enabled:
+            return
+        if self._overlay_age >= self.overlay_every:
+            self._overlay_age = 0
+            self._overlay_lines = [f"FPS: {self.fps():.1f}"]
+            for stage in self._order:
+                if stage == "total":
+                    continue
+                p50, p95, _ = self.percentiles(stage, (50, 95, 99))
+                self._overlay_lines.append(f"{stage}: {p50:.1f}/{p95:.1f} ms")
+
+        x, y = origin
+        for line in self._overlay_lines:
+            cv2.putText(frame, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1)
+            y += 18
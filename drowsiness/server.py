@@ -0,0 +1,320 @@
+"""
+Multi-camera / multi-driver server.
+
+N camera streams (device indices, video files or RTSP/HTTP URLs) feed one
+shared work queue served by a pool of detector/landmark worker processes.
+Every worker loads the dlib models once, so memory does not grow with the
+number of cameras; each stream keeps its own drowsiness state machine in the
+server process.
+
+Frames travel through one shared-memory slot per stream (grayscale only) and
+each stream has at most one frame in flight: while a frame is being
+analysed, newer live frames are dropped (and counted) instead of queueing up.
+"""
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from .models import MODEL_68
+from .state import DrowsinessStateMachine
+
+
+# -------------------------------------------------------------------------
+# Worker process
+# -------------------------------------------------------------------------
+def _worker_main(work_queue, result_queue, model):
+    from .face_detection import PyramidFaceDetector
+    from .models import ModelManager
+    from .stages import DlibLandmarkExtractor, EarMetric
+
+    # One process per core already; keep OpenCV single-threaded inside it
+    cv2.setNumThreads(1)
+    models = ModelManager.instance()
+    hog = models.detector()
+    landmarks = DlibLandmarkExtractor(model)
+    metric = EarMetric()
+
+    detectors = {}      # stream id -> PyramidFaceDetector (only holds the ROI hint)
+    slots = {}          # stream id -> (shared memory name, SharedMemory, ndarray)
+
+    while True:
+        item = work_queue.get()
+        if item is None:
+            break
+        stream_id, slot_name, shape, seq, timestamp = item
+
+        slot = slots.get(stream_id)
+        if slot is None or slot[0] != slot_name or slot[2].shape != shape:
+            # New stream, or its slot was re-created (e.g. another resolution)
+            if slot is not None:
+                slot[1].close()
+            shm = shared_memory.SharedMemory(name=slot_name)
+            slot = slots[stream_id] = (slot_name, shm,
+                                       np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+        gray = slot[2]
+
+        detector = detectors.get(stream_id)
+        if detector is None:
+            detector = detectors[stream_id] = PyramidFaceDetector(hog)
+
+        box = None
+        ears = None
+        try:
+            faces = detector(gray)
+            if faces:
+                face = faces[0]
+                box = (face.left(), face.top(), face.right(), face.bottom())
+                ears = metric.compute(landmarks.extract(gray, face))
+        except Exception as e:
+            print(f"Warning: worker failed on stream {stream_id}: {e}")
+
+        result_queue.put((stream_id, seq, timestamp, box, ears))
+
+    for _, shm, _ in slots.values():
+        shm.close()
+
+
+# -------------------------------------------------------------------------
+# Streams
+# -------------------------------------------------------------------------
+class Stream:
+    """One camera: capture thread, shared-memory slot and its own state machine."""
+
+    def __init__(self, stream_id, spec, state, realtime=True):
+        self.id = stream_id
+        self.spec = spec
+        self.state = state
+        self.realtime = realtime
+        self.is_file = not _is_live(spec)
+
+        self.idle = threading.Event()
+        self.idle.set()
+        self.finished = False
+        self.seq = 0
+
+        self.shm = None
+        self.gray = None
+
+        # --- Statistics ---
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_lost = 0        # in flight when a worker died
+        self.events = 0
+
+    def slot(self, shape):
+        if self.gray is None or self.gray.shape != shape:
+            self.release_slot()
+            self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+            self.gray = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf)
+        return self.gray
+
+    def release_slot(self):
+        if self.shm is not None:
+            self.gray = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def stats(self):
+        return {
+            "read": self.frames_read,
+            "processed": self.frames_processed,
+            "dropped": self.frames_dropped,
+            "lost": self.frames_lost,
+            "events": self.events,
+            "status": self.state.status,
+        }
+
+
+def _is_live(spec):
+    """Camera index (also "0" from the command line) or a stream URL."""
+    return isinstance(spec, int) or str(spec).isdigit() or "://" in str(spec)
+
+
+def _open_capture(spec):
+    source = int(spec) if isinstance(spec, int) or str(spec).isdigit() else spec
+    return cv2.VideoCapture(source)
+
+
+# -------------------------------------------------------------------------
+class MultiStreamServer:
+    """
+    Runs N streams against a pool of `workers` detector processes.
+
+    `on_event(stream, event, ears)` is called in the server thread for every
+    state machine event (defaults to printing it).
+    """
+
+    def __init__(self, specs, workers=2, model=MODEL_68, realtime=True,
+                 state_factory=DrowsinessStateMachine, on_event=None):
+        self.streams = [Stream(i, spec, state_factory(), realtime=realtime)
+                        for i, spec in enumerate(specs)]
+        self.workers = workers
+        self.model = model
+        self.on_event = on_event or self._print_event
+
+        ctx = mp.get_context("spawn")
+        self._ctx = ctx
+        self._work_queue = ctx.Queue(maxsize=len(self.streams) + workers)
+        self._result_queue = ctx.Queue()
+        self._processes = []
+        self._exited = set()
+        self._readers = []
+        self._running = False
+
+    # ---------------------------------------------------------------------
+    def _read_loop(self, stream):
+        cap = _open_capture(stream.spec)
+        if not cap.isOpened():
+            print(f"ERROR: Could not open stream {stream.id} ({stream.spec})")
+            stream.finished = True
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame = None
+        failures = 0
+        while self._running:
+            ret, frame = cap.read(frame)
+            if not ret:
+                if stream.is_file:
+                    break
+                failures += 1
+                if failures % 50 == 0:
+                    # Network cameras drop out: reconnect
+                    cap.release()
+                    cap = _open_capture(stream.spec)
+                time.sleep(0.02)
+                continue
+            failures = 0
+            stream.frames_read += 1
+
+            if stream.is_file and not stream.realtime:
+                # Offline replay: analyse every frame, never drop
+                while self._running and not stream.idle.wait(0.1):
+                    pass
+            elif not stream.idle.is_set():
+                stream.frames_dropped += 1
+                continue
+            if not self._running:
+                break
+
+            timestamp = stream.frames_read / fps if stream.is_file else time.monotonic()
+            gray = stream.slot(frame.shape[:2])
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+
+            stream.idle.clear()
+            stream.seq += 1
+            self._work_queue.put((stream.id, stream.shm.name, gray.shape, stream.seq, timestamp))
+
+            if stream.is_file and stream.realtime:
+                time.sleep(1.0 / fps)
+
+        cap.release()
+        stream.finished = True
+
+    def _handle_result(self, stream_id, seq, timestamp, box, ears):
+        stream = self.streams[stream_id]
+        if seq != stream.seq:
+            return      # given up on when a worker died; a newer frame is in flight
+        stream.frames_processed += 1
+
+        if ears is None:
+            stream.state.no_face(timestamp)
+        else:
+            event = stream.state.update(ears[2], timestamp)
+            if event is not None:
+                stream.events += 1
+                self.on_event(stream, event, ears)
+        stream.idle.set()
+
+    def _check_workers(self):
+        """
+        A worker that exits takes its frame with it, and that frame's stream
+        would wait for the result forever. Which stream it was is unknown, so
+        every stream with a frame in flight is released; a result that still
+        arrives for one of those frames is ignored (see _handle_result).
+        """
+        for p in self._processes:
+            if p.exitcode is None or p in self._exited:
+                continue
+            self._exited.add(p)
+            print(f"ERROR: Detector worker {p.pid} exited (code {p.exitcode}), "
+                  f"{len(self._processes) - len(self._exited)} left")
+            for stream in self.streams:
+                if not stream.idle.is_set():
+                    stream.frames_lost += 1
+                    stream.idle.set()
+
+    def _print_event(self, stream, event, ears):
+        print(f"[{time.strftime('%H:%M:%S')}] [cam {stream.id}] {event} - EAR: {ears[2]}")
+
+    # ---------------------------------------------------------------------
+    def start(self):
+        self._running = True
+        for _ in range(self.workers):
+            p = self._ctx.Process(target=_worker_main,
+                                  args=(self._work_queue, self._result_queue, self.model),
+                                  daemon=True)
+            p.start()
+            self._processes.append(p)
+
+        for stream in self.streams:
+            t = threading.Thread(target=self._read_loop, args=(stream,),
+                                 name=f"stream-{stream.id}", daemon=True)
+            t.start()
+            self._readers.append(t)
+
+    def serve(self, status_every=10.0, duration=None):
+        """Collects results until all streams end, `duration` passes or Ctrl+C."""
+        started = last_status = time.monotonic()
+        try:
+            while True:
+                try:
+                    self._handle_result(*self._result_queue.get(timeout=0.2))
+                except queue.Empty:
+                    pass
+
+                now = time.monotonic()
+                self._check_workers()
+                if all(s.finished and s.idle.is_set() for s in self.streams):
+                    break
+                if not any(p.is_alive() for p in self._processes):
+                    print("ERROR: All detector workers have exited")
+                    break
+                if duration is not None and now - started >= duration:
+                    break
+                if status_every and now - last_status >= status_every:
+                    last_status = now
+                    self.print_status()
+        except KeyboardInterrupt:
+            print("\n[EXIT] Interrupted by user (Ctrl+C)")
+
+    def stop(self):
+        self._running = False
+        for t in self._readers:
+            t.join(timeout=2.0)
+        for _ in self._processes:
+            try:
+                # A crashed worker leaves the queue full; never block shutdown on it
+                self._work_queue.put(None, timeout=0.5)
+            except queue.Full:
+                break
+        for p in self._processes:
+            p.join(timeout=5.0)
+            if p.is_alive():
+                p.terminate()
+        for stream in self.streams:
+            stream.release_slot()
+
+    def print_status(self):
+        for stream in self.streams:
+            s = stream.stats()
+            print(f"[cam {stream.id}] read {s['read']} | processed {s['processed']} | "
+                  f"dropped {s['dropped']} | lost {s['lost']} | events {s['events']} | "
+                  f"{s['status']}")
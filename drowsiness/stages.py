@@ -0,0 +1,506 @@
+"""
+Swappable pipeline stages.
+
+Every stage is a small class with one job; Pipeline only relies on the
+methods of the base classes below, so any stage can be replaced (a faster
+detector, a file or synthetic frame source, a different eye metric, a silent
+alarm sink for tests/benchmarks, ...).
+
+Heavy libraries (dlib, pygame) are only imported when a stage that needs
+them is constructed, never at import time.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from .ear import EYE_PARTS, corner_face_box, eye_aspect_ratio, eye_region, landmarks_to_array
+from .frame_grabber import PIXEL_BGR, PIXEL_YUYV, FrameGrabber
+from .models import EYE_MODEL, MODEL_68, ModelManager, load_measured
+from .state import EVENT_ALARM_STOPPED, EVENT_HIGH_ALARM, EVENT_LOW_ALARM
+
+
+# -------------------------------------------------------------------------
+# Frame sources
+# -------------------------------------------------------------------------
+class FrameSource:
+    """
+    Produces frames. read() returns (ok, frame, timestamp_seconds).
+    A `live` source may fail a read and recover; a non-live one is finished.
+    Timestamps only ever increase (time.monotonic() for a camera, media
+    time for a file); wall_time() gives the wall-clock time of the last
+    frame for display and logs.
+
+    A source that already has the gray image (raw Y plane / mono camera)
+    returns it from gray() so the pipeline skips its own conversion; its
+    frames may then be that gray image. bgr(frame) gives the colour image
+    for display and recording, which only ask for it at their own rate.
+    """
+
+    live = False
+
+    def open(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def gray(self):
+        """Gray image of the last frame read, or None if the pipeline must convert."""
+        return None
+
+    def wall_time(self):
+        """Wall-clock time (time.time()) of the last frame read; here: when it was read."""
+        return time.time()
+
+    def bgr(self, frame):
+        """BGR version of the last frame read (the frame itself if it is BGR already)."""
+        if frame.ndim == 3:
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class CameraSource(FrameSource):
+    """
+    Live camera through the threaded ring-buffer FrameGrabber.
+
+    pixel_format "yuyv" / "grey" reads raw frames. The frame is then the
+    gray image: the Y plane (or the mono frame itself), with no colour
+    conversion at all. bgr() converts the current raw frame on demand, so
+    the YUYV->BGR cost is only paid for the frames a preview or a clip
+    actually uses. All outputs go into buffers reused from frame to frame.
+    """
+
+    live = True
+
+    def __init__(self, device=0, width=640, height=480, fps=30, buffer_size=4,
+                 pixel_format="bgr"):
+        self.grabber = FrameGrabber(device, width=width, height=height, fps=fps,
+                                    buffer_size=buffer_size, pixel_format=pixel_format)
+        self._raw = None
+        self._gray = None
+        self._bgr = None
+
+    @property
+    def pixel_format(self):
+        return self.grabber.pixel_format
+
+    def open(self):
+        return self.grabber.start()
+
+    def read(self):
+        ret, raw = self.grabber.read()
+        if not ret:
+            return False, None, time.monotonic()
+        # When the frame was captured, not when we got to it (it may have
+        # waited in the ring while the last frame was analysed)
+        timestamp = self.grabber.frame_time
+
+        self._raw = raw
+        fmt = self.grabber.pixel_format
+        if fmt == PIXEL_BGR:
+            return True, raw, timestamp
+
+        if fmt == PIXEL_YUYV:
+            # dlib misreads strided views, so the Y plane is compacted (a copy, no maths)
+            self._gray = cv2.extractChannel(raw, 0, dst=self._gray)
+        else:
+            self._gray = raw.reshape(raw.shape[:2])
+        return True, self._gray, timestamp
+
+    def gray(self):
+        return self._gray if self.grabber.pixel_format != PIXEL_BGR else None
+
+    def wall_time(self):
+        return self.grabber.frame_wall_time
+
+    def bgr(self, frame):
+        fmt = self.grabber.pixel_format
+        if fmt == PIXEL_BGR or frame is not self._gray:
+            return super().bgr(frame)
+        if fmt == PIXEL_YUYV:
+            # The raw slot stays ours until the next read()
+            self._bgr = cv2.cvtColor(self._raw, cv2.COLOR_YUV2BGR_YUYV, dst=self._bgr)
+        else:
+            self._bgr = cv2.cvtColor(self._gray, cv2.COLOR_GRAY2BGR, dst=self._bgr)
+        return self._bgr
+
+    def close(self):
+        self.grabber.release()
+
+    def stats(self):
+        return self.grabber.stats()
+
+
+class VideoFileSource(FrameSource):
+    """
+    Reads a recorded video frame by frame (no frames are dropped).
+    Timestamps are media time: frame_index / fps.
+    """
+
+    def __init__(self, path, start_frame=0):
+        self.path = path
+        self.start_frame = start_frame
+        self.cap = None
+        self.fps = 30.0
+        self.index = start_frame
+        self._frame = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        if self.start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        return True
+
+    def read(self):
+        ret, self._frame = self.cap.read(self._frame)
+        if not ret:
+            return False, None, 0.0
+        timestamp = self.index / self.fps
+        self.index += 1
+        return True, self._frame, timestamp
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def stats(self):
+        return {"frames": self.index - self.start_frame}
+
+
+# -------------------------------------------------------------------------
+# Face detectors
+# -------------------------------------------------------------------------
+class FaceDetector:
+    """
+    Finds the face to analyse. detect(gray) returns a dlib.rectangle or None.
+    A `multi_face` detector also exposes `tracks` and `driver` (see
+    MultiFaceDetector); the pipeline then processes every tracked face.
+
+    `hog_detector` may be any backend from detectors.py (Haar, DNN, ...);
+    by default it is the shared dlib HOG detector.
+    """
+
+    multi_face = False
+
+    def detect(self, gray):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class HogFaceDetector(FaceDetector):
+    """Plain dlib HOG detector on the full frame, every frame."""
+
+    def __init__(self, upsample=0, hog_detector=None):
+        if hog_detector is None:
+            hog_detector = ModelManager.instance().detector()
+        self.detector = hog_detector
+        self.upsample = upsample
+
+    def detect(self, gray):
+        faces = self.detector(gray, self.upsample)
+        return faces[0] if len(faces) > 0 else None
+
+
+class TrackingFaceDetector(FaceDetector):
+    """
+    HOG detection on an ROI / downscaled pyramid, run only every few frames,
+    with a correlation tracker in between (see FaceTracker and
+    PyramidFaceDetector).
+    """
+
+    def __init__(self, redetect_interval=10, min_confidence=7.0,
+                 scale=0.5, max_misses=5, hog_detector=None):
+        from .face_detection import PyramidFaceDetector
+        from .face_tracker import FaceTracker
+
+        if hog_detector is None:
+            hog_detector = ModelManager.instance().detector()
+        self.pyramid = PyramidFaceDetector(hog_detector, scale=scale, max_misses=max_misses)
+        self.tracker = FaceTracker(self.pyramid, redetect_interval=redetect_interval,
+                                   min_confidence=min_confidence)
+
+    def detect(self, gray):
+        return self.tracker.update(gray)
+
+    def reset(self):
+        self.tracker.reset()
+
+    def stats(self):
+        stats = self.tracker.stats()
+        stats.update(self.pyramid.stats())
+        return stats
+
+
+class MultiFaceDetector(FaceDetector):
+    """
+    Tracks every face with a stable ID (see FaceTrackSet). detect() returns
+    the driver's box; passengers are available through `tracks`.
+    """
+
+    multi_face = True
+
+    def __init__(self, driver_policy="largest", redetect_interval=5, min_confidence=7.0,
+                 upsample=0, hog_detector=None, **track_options):
+        from .face_tracks import FaceTrackSet
+
+        if hog_detector is None:
+            hog_detector = ModelManager.instance().detector()
+        self.upsample = upsample
+        self._hog = hog_detector
+        self.track_set = FaceTrackSet(self._scan, driver_policy=driver_policy,
+                                      redetect_interval=redetect_interval,
+                                      min_confidence=min_confidence, **track_options)
+
+    def _scan(self, gray):
+        return self._hog(gray, self.upsample)
+
+    @property
+    def tracks(self):
+        return self.track_set.tracks
+
+    @property
+    def driver(self):
+        return self.track_set.driver
+
+    def detect(self, gray):
+        self.track_set.update(gray)
+        driver = self.track_set.driver
+        return driver.box if driver is not None and driver.visible else None
+
+    def reset(self):
+        self.track_set.reset()
+
+    def stats(self):
+        return self.track_set.stats()
+
+
+# -------------------------------------------------------------------------
+# Landmarks
+# -------------------------------------------------------------------------
+class LandmarkExtractor:
+    """extract(gray, face) returns a (num_parts, 2) landmark array."""
+
+    num_parts = 68
+
+    def extract(self, gray, face):
+        raise NotImplementedError
+
+
+class DlibLandmarkExtractor(LandmarkExtractor):
+    """
+    dlib shape predictor, loaded through the shared ModelManager. `model` is
+    an alias ("68", "eye"), a file name on the model search path or a path.
+    """
+
+    def __init__(self, model=MODEL_68, predictor=None):
+        if predictor is None:
+            predictor = ModelManager.instance().predictor(model)
+        self.predictor = predictor
+        self.num_parts = self._count_parts(predictor)
+
+    @staticmethod
+    def _count_parts(predictor):
+        # dlib does not expose the layout of a predictor; fit it once on a blank image
+        import dlib
+        blank = np.zeros((64, 64), dtype=np.uint8)
+        return predictor(blank, dlib.rectangle(0, 0, 63, 63)).num_parts
+
+    def extract(self, gray, face):
+        return landmarks_to_array(self.predictor(gray, face))
+
+
+class EyeRegionLandmarkExtractor(DlibLandmarkExtractor):
+    """
+    Fits only the 12 eye points: a compact eye predictor (see
+    train_eye_predictor.py) runs on the eye band of the face box
+    (ear.EYE_REGION) instead of the whole face. The "crop" is just the
+    rectangle given to dlib, no pixels are copied. Returns (12, 2)
+    landmarks in the order of points 36-47.
+
+    With `anchor_model` (MODEL_5, ~9 MB) the band is placed from the four
+    eye corners of the 5-point predictor instead of the face box
+    proportions (ear.CORNER_BOX), so it stays on the eyes with the looser
+    boxes of the non-HOG detectors (about half the EAR error on Haar boxes).
+    This is a memory option, not a speed one: the 5-point fit costs about
+    as much as most of the 68-point fit, but both models together are
+    ~10 MB instead of ~100 MB.
+    """
+
+    def __init__(self, model=EYE_MODEL, predictor=None, anchor_model=None):
+        super().__init__(model, predictor)
+        self.model = model
+        if self.num_parts != EYE_PARTS:
+            raise ValueError(f"'{model}' gives {self.num_parts} points, an eye predictor "
+                             f"gives {EYE_PARTS}")
+        import dlib
+        self._rectangle = dlib.rectangle
+        self.anchor = None
+        if anchor_model is not None:
+            self.anchor = ModelManager.instance().predictor(anchor_model)
+            parts = self._count_parts(self.anchor)
+            if parts != 5:
+                raise ValueError(f"'{anchor_model}' gives {parts} points, the anchor needs the "
+                                 f"5-point predictor")
+
+    def region(self, face, gray=None):
+        if self.anchor is not None and gray is not None:
+            corners = landmarks_to_array(self.anchor(gray, face))
+            return self._rectangle(*eye_region(*corner_face_box(corners)))
+        return self._rectangle(*eye_region(face.left(), face.top(), face.right(), face.bottom()))
+
+    def extract(self, gray, face):
+        return landmarks_to_array(self.predictor(gray, self.region(face, gray)))
+
+    def compare(self, gray, face, reference=MODEL_68, repeats=30):
+        """
+        Measures this stage against the full-face `reference` predictor on
+        one real face: median fit time of each and the memory each model
+        takes once loaded (fresh copies, freed again). Slow (it loads the
+        reference model); meant to run once, off the analysis thread.
+        """
+        models = ModelManager.instance()
+        eye, eye_mb = load_measured(models.resolve(self.model))
+        ref, ref_mb = load_measured(models.resolve(reference))
+
+        def median_ms(fit):
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                fit()
+                times.append((time.perf_counter() - start) * 1000.0)
+            return float(np.median(times))
+
+        # The eye side includes placing the band (the 5-point fit with an anchor)
+        eye_ms = median_ms(lambda: eye(gray, self.region(face, gray)))
+        ref_ms = median_ms(lambda: ref(gray, face))
+        return {
+            "eye_ms": round(eye_ms, 3),
+            "ref_ms": round(ref_ms, 3),
+            "speedup": round(ref_ms / eye_ms, 1) if eye_ms > 0 else None,
+            "eye_rss_mb": round(eye_mb, 1) if eye_mb is not None else None,
+            "ref_rss_mb": round(ref_mb, 1) if ref_mb is not None else None,
+            "memory_saved_mb": round(ref_mb - eye_mb, 1)
+            if eye_mb is not None and ref_mb is not None else None,
+        }
+
+
+# -------------------------------------------------------------------------
+# Eye metrics
+# -------------------------------------------------------------------------
+class EyeMetric:
+    """compute(landmarks) returns (left, right, combined) eye openness values."""
+
+    # Smallest landmark layout the metric can work with
+    min_parts = 68
+
+    def compute(self, landmarks):
+        raise NotImplementedError
+
+
+class EarMetric(EyeMetric):
+    """
+    Eye aspect ratio; the combined value is the mean rounded to `decimals`.
+    Works on the 68-point layout and on the 12 eye points alone.
+    """
+
+    min_parts = EYE_PARTS
+
+    def __init__(self, decimals=2):
+        self.decimals = decimals
+
+    def compute(self, landmarks):
+        left_ear, right_ear = eye_aspect_ratio(landmarks)
+        ear = (left_ear + right_ear) / 2
+        if self.decimals is not None:
+            ear = round(ear, self.decimals)
+        return left_ear, right_ear, ear
+
+
+# -------------------------------------------------------------------------
+# Alarm sinks
+# -------------------------------------------------------------------------
+class AlarmSink:
+    """Receives state machine events: on_event(event, result)."""
+
+    def on_event(self, event, result):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullAlarmSink(AlarmSink):
+    """Ignores all events (headless runs, benchmarks)."""
+
+
+class AudioAlarmSink(AlarmSink):
+    """
+    Turns events into AlarmEngine commands. The engine plays the sounds on
+    its own thread, so on_event() never waits for audio.
+    """
+
+    def __init__(self, engine, verbose=True):
+        from .audio import LEVEL_HIGH, LEVEL_LOW
+
+        self.engine = engine
+        self.verbose = verbose
+        self._high = LEVEL_HIGH
+        self._low = LEVEL_LOW
+
+        print("Initializing audio system...")
+        if engine.start():
+            print("✓ Sound files loaded successfully.")
+        else:
+            print("Program will continue without sound.")
+
+    def _log(self, message):
+        if self.verbose:
+            print(f"[{time.strftime('%H:%M:%S')}] {message}")
+
+    def on_event(self, event, result):
+        if event == EVENT_HIGH_ALARM:
+            if self.engine.level == self._low:
+                self.engine.escalate()
+            else:
+                self.engine.play(self._high)
+            self._log(f"🚨 HIGH ALARM - EAR: {result.ear}")
+        elif event == EVENT_LOW_ALARM:
+            self.engine.play(self._low)
+            self._log(f"⚠️ LOW ALARM - EAR: {result.ear}")
+        elif event == EVENT_ALARM_STOPPED:
+            self.engine.stop()
+            self._log(f"✅ Driver is AWAKE - Alarm STOPPED - EAR: {result.ear}")
+
+    def stop(self):
+        self.engine.stop()
+
+    def close(self):
+        self.engine.close()
+
+
+class PygameAlarmSink(AudioAlarmSink):
+    """Plays the high/low alarm sounds through pygame.mixer."""
+
+    def __init__(self, high_sound, low_sound, verbose=True):
+        from .audio import AlarmEngine, PygameBackend
+
+        super().__init__(AlarmEngine(PygameBackend(), high_sound, low_sound), verbose=verbose)
@@ -0,0 +1,229 @@
+import time
+
+
+# --- Default thresholds ---
+EYE_AR_THRESH = 0.26
+EYE_AR_PRE_THRESH = 0.30
+# Durations in milliseconds: the old 60 / 200 / 5 frame counts at 30 FPS
+CLOSED_MS_HIGH = 2000
+FATIGUE_MS_LOW = 6667
+AWAKE_MS_NEEDED = 167
+ALARM_COOLDOWN = 3  # Seconds between alarm replays
+# A longer gap between two frames (stall, dropped frames) counts as this much
+MAX_FRAME_GAP_MS = 500
+# Sliding-window alarms (only with an EyeClosureStats, see perclos.py)
+PERCLOS_LOW = 0.15
+PERCLOS_HIGH = 0.30
+MICROSLEEPS_HIGH = 2
+WINDOW_ALARM_COOLDOWN = 30  # Seconds between two window-based alarms
+WINDOW_MIN_COVERAGE = 0.5   # Part of the window that must be filled first
+
+# --- Driver status (what the screen shows) ---
+STATUS_ACTIVE = "active"
+STATUS_FATIGUE = "fatigue"      # EAR below the pre-threshold, not yet alarming
+STATUS_TIRED = "tired"          # low alarm zone
+STATUS_DROWSY = "drowsy"        # high alarm zone
+STATUS_CLOSING = "closing"      # EAR below the threshold, not yet alarming
+STATUS_NO_FACE = "no_face"
+
+# --- Events returned by update() ---
+EVENT_HIGH_ALARM = "high_alarm"
+EVENT_LOW_ALARM = "low_alarm"
+EVENT_ALARM_STOPPED = "alarm_stopped"
+
+# --- Why the last alarm fired (alarm_reason) ---
+REASON_CLOSURE = "closure"          # eyes closed for closed_ms_high
+REASON_FATIGUE = "fatigue"          # eyes half closed for fatigue_ms_low
+REASON_PERCLOS = "perclos"
+REASON_MICROSLEEP = "microsleep"
+
+
+# -------------------------------------------------------------------------
+class DrowsinessStateMachine:
+    """
+    The drowsiness decision logic, without any camera, drawing or audio
+    code, so it can be driven by live frames or replayed over recorded EAR
+    values.
+
+    Eye closure is measured in time, not frames: every update() adds the
+    time since the previous frame (capped at `max_frame_gap_ms`) to the
+    current zone. The alert timing therefore does not change with the frame
+    rate, frame skipping or dropped frames. The *_counter attributes still
+    count frames, for display and telemetry only.
+    Timestamps must never go backwards: use time.monotonic() (the default)
+    or media time, not the wall clock.
+
+    With `closure_stats` (an EyeClosureStats), slow-blink fatigue and
+    repeated micro-sleeps also raise the alarms: PERCLOS over the window
+    above `perclos_low` / `perclos_high`, or `microsleeps_high` micro-sleeps.
+    These alarms are one-shot warnings, at most one per
+    `window_alarm_cooldown` seconds. Opening the eyes does not cancel them.
+    The micro-sleep alarm only repeats after a new micro-sleep: the old
+    ones stay in the window for longer than the cooldown.
+
+    update() returns one of the EVENT_* constants when the alarm should
+    (re)start or stop, otherwise None. `status` always holds the current
+    driver status.
+    """
+
+    def __init__(self, ear_thresh=EYE_AR_THRESH, ear_pre_thresh=EYE_AR_PRE_THRESH,
+                 closed_ms_high=CLOSED_MS_HIGH, fatigue_ms_low=FATIGUE_MS_LOW,
+                 awake_ms_needed=AWAKE_MS_NEEDED, alarm_cooldown=ALARM_COOLDOWN,
+                 max_frame_gap_ms=MAX_FRAME_GAP_MS, closure_stats=None,
+                 perclos_low=PERCLOS_LOW, perclos_high=PERCLOS_HIGH,
+                 microsleeps_high=MICROSLEEPS_HIGH, window_alarm_cooldown=WINDOW_ALARM_COOLDOWN):
+        self.ear_thresh = ear_thresh
+        self.ear_pre_thresh = ear_pre_thresh
+        self.closed_ms_high = closed_ms_high
+        self.fatigue_ms_low = fatigue_ms_low
+        self.awake_ms_needed = awake_ms_needed
+        self.alarm_cooldown = alarm_cooldown
+        self.max_frame_gap_ms = max_frame_gap_ms
+        self.closure_stats = closure_stats
+        self.perclos_low = perclos_low
+        self.perclos_high = perclos_high
+        self.microsleeps_high = microsleeps_high
+        self.window_alarm_cooldown = window_alarm_cooldown
+        self.reset()
+
+    def reset(self):
+        # --- Counters ---
+        self.drowsy_counter = 0
+        self.pre_drowsy_counter = 0
+        self.awake_counter = 0
+
+        # --- Durations (ms) ---
+        self.drowsy_ms = 0.0
+        self.pre_drowsy_ms = 0.0
+        self.awake_ms = 0.0
+        self._last_time = None
+
+        # --- Alarm Management ---
+        self.alarm_high_on = False
+        self.alarm_low_on = False
+        self.last_alarm_time_high = float("-inf")
+        self.last_alarm_time_low = float("-inf")
+        self.last_window_alarm_time = float("-inf")
+        self.last_microsleep_alarm_time = float("-inf")
+        self.alarm_reason = None
+
+        if self.closure_stats is not None:
+            self.closure_stats.reset()
+        self.status = STATUS_ACTIVE
+
+    # ---------------------------------------------------------------------
+    def _elapsed_ms(self, now):
+        """Milliseconds since the previous frame (0 for the first one)."""
+        last = self._last_time
+        self._last_time = now
+        if last is None:
+            return 0.0
+        return min(max(0.0, (now - last) * 1000.0), self.max_frame_gap_ms)
+
+    def update(self, ear, now=None):
+        if now is None:
+            now = time.monotonic()
+        dt = self._elapsed_ms(now)
+        event = None
+        if self.closure_stats is not None:
+            self.closure_stats.update(ear, now)
+
+        # Severe Drowsiness (EAR < 0.26)
+        if ear < self.ear_thresh:
+            self.drowsy_counter += 1
+            self.drowsy_ms += dt
+            self.pre_drowsy_counter = 0
+            self.pre_drowsy_ms = 0.0
+            self.awake_counter = 0
+            self.awake_ms = 0.0
+            self.status = STATUS_CLOSING
+
+            if self.drowsy_ms >= self.closed_ms_high:
+                self.status = STATUS_DROWSY
+                if (now - self.last_alarm_time_high) > self.alarm_cooldown:
+                    event = EVENT_HIGH_ALARM
+                    self.alarm_reason = REASON_CLOSURE
+                    self.alarm_high_on = True
+                    self.alarm_low_on = False
+                    self.last_alarm_time_high = now
+
+        # Fatigue (0.26 <= EAR < 0.30)
+        elif ear < self.ear_pre_thresh:
+            self.pre_drowsy_counter += 1
+            self.pre_drowsy_ms += dt
+            self.drowsy_counter = 0
+            self.drowsy_ms = 0.0
+            self.awake_counter = 0
+            self.awake_ms = 0.0
+            self.status = STATUS_FATIGUE
+
+            if self.pre_drowsy_ms >= self.fatigue_ms_low:
+                self.status = STATUS_TIRED
+                if (now - self.last_alarm_time_low) > self.alarm_cooldown:
+                    event = EVENT_LOW_ALARM
+                    self.alarm_reason = REASON_FATIGUE
+                    self.alarm_low_on = True
+                    self.alarm_high_on = False
+                    self.last_alarm_time_low = now
+
+        # Normal State (Awake - EAR >= 0.30)
+        else:
+            self.awake_counter += 1
+            self.awake_ms += dt
+            self.status = STATUS_ACTIVE
+
+            # A short stretch of open eyes stops the alarm immediately
+            if self.awake_ms >= self.awake_ms_needed:
+                if self.alarm_high_on or self.alarm_low_on:
+                    event = EVENT_ALARM_STOPPED
+
+                self.drowsy_counter = 0
+                self.drowsy_ms = 0.0
+                self.pre_drowsy_counter = 0
+                self.pre_drowsy_ms = 0.0
+                self.alarm_high_on = False
+                self.alarm_low_on = False
+
+        if event is None and self.closure_stats is not None:
+            event = self._window_alarm(now)
+        return event
+
+    def _window_alarm(self, now):
+        stats = self.closure_stats
+        if stats.coverage() < WINDOW_MIN_COVERAGE:
+            return None
+        if now - self.last_window_alarm_time < self.window_alarm_cooldown:
+            return None
+
+        if (stats.microsleeps >= self.microsleeps_high
+                and stats.last_microsleep_time > self.last_microsleep_alarm_time):
+            event, self.alarm_reason = EVENT_HIGH_ALARM, REASON_MICROSLEEP
+            self.last_microsleep_alarm_time = now
+        elif stats.perclos >= self.perclos_high:
+            event, self.alarm_reason = EVENT_HIGH_ALARM, REASON_PERCLOS
+        elif stats.perclos >= self.perclos_low:
+            event, self.alarm_reason = EVENT_LOW_ALARM, REASON_PERCLOS
+        else:
+            return None
+        self.last_window_alarm_time = now
+        return event
+
+    def no_face(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        dt = self._elapsed_ms(now)
+        if self.closure_stats is not None:
+            self.closure_stats.gap()
+
+        # Gradually reset counters: closure time decays as fast as it built up
+        self.drowsy_counter = max(0, self.drowsy_counter - 1)
+        self.pre_drowsy_counter = max(0, self.pre_drowsy_counter - 1)
+        self.drowsy_ms = max(0.0, self.drowsy_ms - dt)
+        self.pre_drowsy_ms = max(0.0, self.pre_drowsy_ms - dt)
+        self.awake_counter = 0
+        self.awake_ms = 0.0
+        self.status = STATUS_NO_FACE
+
+    @property
+    def alarm_on(self):
+        return self.alarm_high_on or self.alarm_low_on
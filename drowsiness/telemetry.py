@@ -0,0 +1,207 @@
+"""
+Per-frame telemetry log.
+
+Records are fixed-width NumPy structured rows (see TELEMETRY_DTYPE). The
+writer fills a preallocated chunk and appends it to disk when full, so
+memory stays bounded no matter how long the shift is. The reader memory-maps
+the file, so a multi-hour session can be queried without loading it.
+
+File layout: 8-byte magic, uint32 header length, JSON header (padded to a
+64-byte boundary), then the raw records.
+"""
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from .state import (STATUS_ACTIVE, STATUS_CLOSING, STATUS_DROWSY, STATUS_FATIGUE,
+                    STATUS_NO_FACE, STATUS_TIRED)
+
+MAGIC = b"DRWSTEL1"
+HEADER_ALIGN = 64
+
+TELEMETRY_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("frame", "<u4"),
+    ("left_ear", "<f4"),
+    ("right_ear", "<f4"),
+    ("ear", "<f4"),
+    ("face", "<i2", (4,)),              # left, top, right, bottom (-1 = no face)
+    ("drowsy_counter", "<u2"),
+    ("pre_drowsy_counter", "<u2"),
+    ("awake_counter", "<u2"),
+    ("alarm", "u1"),                    # ALARM_* below
+    ("status", "u1"),                   # index into STATUS_CODES
+    ("wall_time", "<f8"),               # time.time() of the frame (NaN if unknown)
+])
+
+ALARM_NONE = 0
+ALARM_LOW = 1
+ALARM_HIGH = 2
+
+STATUS_CODES = [STATUS_ACTIVE, STATUS_FATIGUE, STATUS_TIRED,
+                STATUS_CLOSING, STATUS_DROWSY, STATUS_NO_FACE]
+_STATUS_INDEX = {name: i for i, name in enumerate(STATUS_CODES)}
+
+_NO_FACE = (-1, -1, -1, -1)
+_U16_MAX = np.iinfo(np.uint16).max
+
+
+# -------------------------------------------------------------------------
+def fill_record(row, timestamp, frame, state, left_ear=np.nan, right_ear=np.nan,
+                ear=np.nan, face=None, wall_time=np.nan):
+    """
+    Fills one TELEMETRY_DTYPE row in place. `timestamp` is the pipeline's
+    monotonic (or media) time, `wall_time` the wall clock for display.
+    """
+    row["timestamp"] = timestamp
+    row["frame"] = frame
+    row["left_ear"] = left_ear
+    row["right_ear"] = right_ear
+    row["ear"] = ear
+    row["face"] = _NO_FACE if face is None else (face.left(), face.top(),
+                                                 face.right(), face.bottom())
+    row["drowsy_counter"] = min(state.drowsy_counter, _U16_MAX)
+    row["pre_drowsy_counter"] = min(state.pre_drowsy_counter, _U16_MAX)
+    row["awake_counter"] = min(state.awake_counter, _U16_MAX)
+    row["alarm"] = (ALARM_HIGH if state.alarm_high_on
+                    else ALARM_LOW if state.alarm_low_on else ALARM_NONE)
+    row["status"] = _STATUS_INDEX.get(state.status, 0)
+    row["wall_time"] = np.nan if wall_time is None else wall_time
+
+
+class TelemetryWriter:
+    """Streams telemetry rows to `path` in chunks of `chunk_size` records."""
+
+    def __init__(self, path, chunk_size=4096, metadata=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._chunk = np.zeros(chunk_size, dtype=TELEMETRY_DTYPE)
+        self._count = 0
+        self.records_written = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        header = {
+            "version": 2,
+            "dtype": TELEMETRY_DTYPE.descr,
+            "created": time.time(),
+            "status_codes": STATUS_CODES,
+            "metadata": metadata or {},
+        }
+        payload = json.dumps(header).encode("utf-8")
+        used = len(MAGIC) + 4 + len(payload)
+        payload += b" " * (-used % HEADER_ALIGN)
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(struct.pack("<I", len(payload)))
+        self._file.write(payload)
+
+    # ---------------------------------------------------------------------
+    def record(self, timestamp, frame, state, left_ear=np.nan, right_ear=np.nan,
+               ear=np.nan, face=None, wall_time=np.nan):
+        """Appends one frame. `state` is the DrowsinessStateMachine after the update."""
+        fill_record(self._chunk[self._count], timestamp, frame, state,
+                    left_ear, right_ear, ear, face, wall_time)
+        self._count += 1
+        if self._count == self.chunk_size:
+            self.flush()
+
+    def write_records(self, records):
+        """Appends ready-made TELEMETRY_DTYPE rows (e.g. a window kept in memory)."""
+        self.flush()
+        np.asarray(records, dtype=TELEMETRY_DTYPE).tofile(self._file)
+        self.records_written += len(records)
+        self._file.flush()
+
+    def flush(self):
+        if self._count:
+            self._chunk[:self._count].tofile(self._file)
+            self.records_written += self._count
+            self._count = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------------------------------------------------------
+class TelemetryLog:
+    """
+    Read-only, memory-mapped view of a telemetry file.
+
+    `records` is a structured array backed by the file, so slicing and
+    column access only touch the pages that are actually used.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"'{path}' is not a telemetry log")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(header_len).decode("utf-8"))
+
+        dtype = np.dtype([tuple(field) for field in self.header["dtype"]])
+        offset = len(MAGIC) + 4 + header_len
+        # A crash can leave a partially written record at the end; ignore it
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=dtype, mode="r",
+                                     offset=offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+        self.status_codes = self.header.get("status_codes", STATUS_CODES)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    # ---------------------------------------------------------------------
+    def between(self, start, end):
+        """Records with start <= timestamp < end (timestamps are monotonic)."""
+        ts = self.records["timestamp"]
+        lo, hi = np.searchsorted(ts, [start, end], side="left")
+        return self.records[lo:hi]
+
+    def alarm_onsets(self, level=None):
+        """Indices of the frames where an alarm switched on."""
+        alarm = np.asarray(self.records["alarm"])
+        if len(alarm) == 0:
+            return np.zeros(0, dtype=np.intp)
+        previous = np.concatenate([[ALARM_NONE], alarm[:-1]])
+        onsets = (alarm != ALARM_NONE) & (alarm != previous)
+        if level is not None:
+            onsets &= alarm == level
+        return np.flatnonzero(onsets)
+
+    def summary(self):
+        if len(self.records) == 0:
+            return {"frames": 0}
+        ts = self.records["timestamp"]
+        ear = np.asarray(self.records["ear"])
+        face = np.isfinite(ear)
+        return {
+            "frames": int(len(self.records)),
+            "duration_s": float(ts[-1] - ts[0]),
+            "frames_with_face": int(face.sum()),
+            "mean_ear": float(ear[face].mean()) if face.any() else None,
+            "low_alarms": int(len(self.alarm_onsets(ALARM_LOW))),
+            "high_alarms": int(len(self.alarm_onsets(ALARM_HIGH))),
+        }
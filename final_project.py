@@ -1,277 +1,462 @@
-import cv2
-import dlib
-from scipy.spatial import distance
-import pygame
+import os
+import threading
 import time
 
+import cv2
+
+from drowsiness import (CMD_QUIT, CMD_RESET, CMD_STATS, EYE_MODEL, MODEL_68, AlarmEngine,
+                        AudioAlarmSink, CameraSource, ClipRecorder, ControlChannel,
+                        DlibLandmarkExtractor, DriverProfileStore, DrowsinessStateMachine,
+                        EarCalibrator, EventPublisher, EyeClosureStats, EyeRegionLandmarkExtractor,
+                        MjpegPreview, ModelManager, MotionGate, MultiFaceDetector, Pipeline,
+                        RateGovernor, StageProfiler, TelemetryWriter, TrackingFaceDetector,
+                        WindowPreview, make_detector_backend, select_backend)
+from drowsiness.audio import make_backend
+from drowsiness.display import draw_result, draw_tracks
+from drowsiness.filters import make_filters
+
 # --- Constants ---
-EYE_AR_THRESH = 0.26        
-EYE_AR_PRE_THRESH = 0.30    
-CONSEC_FRAMES_HIGH = 60     
-CONSEC_FRAMES_LOW = 200     
+EYE_AR_THRESH = 0.26
+EYE_AR_PRE_THRESH = 0.30
+# Eyes closed / half closed this long (ms) before the high / low alarm
+CLOSED_MS_HIGH = 2000
+FATIGUE_MS_LOW = 6667
 ALARM_COOLDOWN = 3  # Seconds between alarm replays
 
-# 🌟 فریم‌های لازم برای تشخیص بیداری (کم‌تر = سریع‌تر قطع میشه)
-AWAKE_FRAMES_NEEDED = 5  # 5 فریم متوالی چشم باز = قطع فوری آلارم
+# Camera pixel format: "yuyv" / "grey" give the detector the raw luma plane
+# (no BGR->gray conversion); falls back to "bgr" if the camera refuses it
+CAMERA_PIXEL_FORMAT = "yuyv"
 
-# ⚠️ Update these paths
-ALARM_HIGH_SOUND = r"F:\\University\\7th term\\Computer vision\\project\\Drowsiness-Detection\\alarms\\alarm_high.wav"
-ALARM_LOW_SOUND = r"F:\\University\\7th term\\Computer vision\\project\\Drowsiness-Detection\\alarms\\alarm_low.wav"
+# Face detector backend: "hog", "hog-half", "haar", "res10", "yunet", or
+# "auto" to time the available ones on this machine at startup and use the
+# fastest that still finds DETECTOR_RECALL_FLOOR of the faces
+FACE_DETECTOR = "auto"
+DETECTOR_RECALL_FLOOR = 0.9
+DETECTOR_BENCHMARK_FRAMES = 15
 
-# --- Counters ---
-DROWSY_COUNTER = 0
-PRE_DROWSY_COUNTER = 0
-AWAKE_COUNTER = 0  # 🌟 شمارنده جدید برای تشخیص بیداری
+# Face tracking: run the HOG detector only every N frames or on low confidence
+REDETECT_INTERVAL = 10
+TRACK_MIN_CONFIDENCE = 7.0
 
-# --- Alarm Management ---
-alarm_high_on = False
-alarm_low_on = False
-last_alarm_time_high = 0
-last_alarm_time_low = 0
+# Face detection: search the last face ROI / a downscaled frame first
+DETECT_SCALE = 0.5
+DETECT_MAX_MISSES = 5   # misses before falling back to a full-resolution scan
 
-# -------------------------------------------------------------------------
-def calculate_EAR(eye):
-    A = distance.euclidean(eye[1], eye[5])
-    B = distance.euclidean(eye[2], eye[4])
-    C = distance.euclidean(eye[0], eye[3])
-    ear_aspect_ratio = (A + B) / (2.0 * C)
-    return ear_aspect_ratio
+# Track every face in the cabin (passengers get their own state, only the
+# driver triggers the alarm). Driver = "largest", "left" or "right" face.
+TRACK_ALL_FACES = False
+DRIVER_POSITION = "largest"
 
-# -------------------------------------------------------------------------
-# Initialize pygame mixer for audio
-print("Initializing audio system...")
-try:
-    pygame.mixer.init()
-    alarm_high = pygame.mixer.Sound(ALARM_HIGH_SOUND)
-    alarm_low = pygame.mixer.Sound(ALARM_LOW_SOUND)
-    print("✓ Sound files loaded successfully.")
-except Exception as e:
-    print(f"ERROR loading sound files: {e}")
-    print("Program will continue without sound.")
-    alarm_high = None
-    alarm_low = None
+# Per-driver calibration: the open-eye EAR is learned in the first seconds of
+# every session and stored per driver (set DRIVER_ID to None to disable)
+DRIVER_ID = os.environ.get("DROWSINESS_DRIVER", "default")
+PROFILES_PATH = "profiles/drivers.json"
 
-# -------------------------------------------------------------------------
-# Initialize Dlib and OpenCV
-print("Initializing camera and face detector...")
-cap = cv2.VideoCapture(0)
+# Jitter filters before the state machine: landmarks "one-euro" / "none",
+# EAR "median" / "ema" / "none" (see benchmark.py --filters all)
+LANDMARK_FILTER = "one-euro"
+EAR_FILTER = "none"
+
+# PERCLOS / blink / micro-sleep statistics over a sliding window; they also
+# raise the alarms for slow-blink fatigue (set to 0 to disable)
+PERCLOS_WINDOW_S = 60
+
+# Analyse only IDLE_RATE_HZ frames/s while the driver is clearly alert
+# (full rate again as soon as EAR nears the thresholds or the face is lost)
+ADAPTIVE_RATE = True
+IDLE_RATE_HZ = 8
+
+# Preview: "window" (OpenCV window), "mjpeg" (http://127.0.0.1:PREVIEW_PORT/)
+# or "none" for headless units - then nothing is drawn at all. The preview
+# runs on its own thread at no more than PREVIEW_FPS.
+PREVIEW = os.environ.get("DROWSINESS_PREVIEW", "window")
+PREVIEW_FPS = 10
+PREVIEW_PORT = 8080
+
+# Control without a keyboard: SIGTERM quits, SIGUSR1 resets, SIGUSR2 prints
+# the statistics; or send "quit" / "reset" / "stats" to this socket (a Unix
+# socket path, or a localhost TCP port; None to disable)
+CONTROL_SOCKET = "/tmp/drowsiness.sock" if os.name != "nt" else 8765
+
+# Skip frames in which the eye region did not change (parked / idling car):
+# the last EAR is reused and the timers keep running; a full analysis at
+# least every MOTION_MAX_SKIP_S seconds
+MOTION_GATE = True
+MOTION_MAX_SKIP_S = 1.0
+
+# Stage latency timers (near-zero cost when disabled) and on-frame HUD
+PROFILE_STAGES = True
+SHOW_PROFILE_HUD = True
+
+# Per-frame telemetry log (set to None to disable)
+TELEMETRY_PATH = f"logs/telemetry_{time.strftime('%Y%m%d_%H%M%S')}.drwtel"
+
+# Alert events (onset / escalation / cleared / face_lost / manual_reset) for
+# the fleet backend, batched and delivered in the background. Comma-separated
+# sinks: a .jsonl path, "unix:/path.sock", "http(s)://...", "ws://..." or
+# "mqtt://host:1883/topic" (see drowsiness/event_sinks.py); empty disables
+EVENT_SINKS = os.environ.get("DROWSINESS_EVENT_SINKS",
+                             f"logs/events_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
 
-if not cap.isOpened():
-    print("ERROR: Could not open camera")
-    exit()
+# Evidence clips: the last CLIP_PRE_S seconds are kept in memory (downscaled
+# JPEGs); on every alarm they are saved with the next CLIP_POST_S seconds
+# and the telemetry of the same window (set CLIPS_DIR to None to disable)
+CLIPS_DIR = "clips"
+CLIP_PRE_S = 10
+CLIP_POST_S = 5
+CLIP_FPS = 10
 
-# Set camera properties for better performance
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
+# 🌟 زمان لازم برای تشخیص بیداری (کم‌تر = سریع‌تر قطع میشه)
+AWAKE_MS_NEEDED = 167  # ~5 فریم در 30 FPS چشم باز = قطع فوری آلارم
 
-hog_face_detector = dlib.get_frontal_face_detector()
+# Alarm sounds live next to this script
+ALARMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alarms")
+ALARM_HIGH_SOUND = os.path.join(ALARMS_DIR, "alarm_high.wav")
+ALARM_LOW_SOUND = os.path.join(ALARMS_DIR, "alarm_low.mp3")
+# "pygame" plays the sounds; "null" / "file" (writes ALARM_SINK_PATH) are silent
+ALARM_BACKEND = "pygame"
+ALARM_SINK_PATH = "logs/alarms.log"
 
-try:
-    dlib_facelandmark = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
-    print("✓ Face landmark detector loaded.")
-except RuntimeError:
-    print("ERROR: 'shape_predictor_68_face_landmarks.dat' not found.")
-    cap.release()
-    exit()
+# Landmark model: MODEL_68, or a path. Extra model directories can be listed
+# in $DROWSINESS_MODEL_PATH. With EYE_ONLY_LANDMARKS, the compact 12-point
+# eye predictor (EYE_MODEL, see train_eye_predictor.py) is used instead:
+# only the eye band of the face is fitted and the 68-point model is never loaded.
+LANDMARK_MODEL = MODEL_68
+EYE_ONLY_LANDMARKS = False
+# Eye-only mode: MODEL_5 places the eye band from the 5-point eye corners
+# (+9 MB and ~0.5 ms per face; steadier with the Haar / DNN face boxes);
+# None places it from the face box proportions
+EYE_ANCHOR_MODEL = None
+# Eye-only mode: on the first face, measure the fit time and model memory
+# against LANDMARK_MODEL once (loads it briefly, on a background thread)
+EYE_ONLY_COMPARE = True
+WINDOW_NAME = "Driver Drowsiness Detection System"
 
-print("✓ Starting monitoring... (Press ESC to quit)")
-print("-" * 60)
 
 # -------------------------------------------------------------------------
-# Main Loop
-frame_count = 0
-faces = []
+def print_model_sizes(models):
+    eye_mb = os.path.getsize(models.resolve(EYE_MODEL)) / (1024 * 1024)
+    try:
+        full_mb = os.path.getsize(models.resolve(LANDMARK_MODEL)) / (1024 * 1024)
+    except FileNotFoundError:
+        print(f"✓ Eye-only landmarks: model {eye_mb:.1f} MB")
+        return
+    print(f"✓ Eye-only landmarks: model {eye_mb:.1f} MB instead of {full_mb:.1f} MB on disk")
+
+
+def report_eye_only(landmarks, gray, face):
+    """Measured speedup and memory saved against the full-face model (runs once)."""
+    try:
+        r = landmarks.compare(gray, face, LANDMARK_MODEL)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"WARNING: No eye-only comparison with '{LANDMARK_MODEL}': {e}")
+        return
+    print(f"[EYE-ONLY] Landmark fit {r['eye_ms']} ms vs {r['ref_ms']} ms (x{r['speedup']}) | "
+          f"model memory {r['eye_rss_mb']} MB vs {r['ref_rss_mb']} MB "
+          f"({r['memory_saved_mb']} MB saved)")
 
-try:
-    while True:
-        ret, frame = cap.read()
+
+def choose_face_detector(source):
+    if FACE_DETECTOR != "auto":
+        return make_detector_backend(FACE_DETECTOR)
+
+    # Time the backends on real frames from this camera
+    frames = []
+    for _ in range(DETECTOR_BENCHMARK_FRAMES * 5):
+        if len(frames) == DETECTOR_BENCHMARK_FRAMES:
+            break
+        ret, frame, _ = source.read()
         if not ret:
-            print("WARNING: Failed to read frame")
             continue
+        gray = source.gray()
+        frames.append(gray.copy() if gray is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    if not frames:
+        print("WARNING: No camera frames for the detector benchmark, using 'hog'")
+        return make_detector_backend("hog")
+
+    # The tracker runs the backend on the ROI crop and the downscaled frame,
+    # so measure it there (MultiFaceDetector scans full frames)
+    pyramid = None if TRACK_ALL_FACES else {"scale": DETECT_SCALE, "max_misses": DETECT_MAX_MISSES}
+    name, backend, report = select_backend(frames, recall_floor=DETECTOR_RECALL_FLOOR,
+                                           pyramid=pyramid)
+    for candidate, r in report.items():
+        recall = f"{r['recall'] * 100:.0f}%" if r["recall"] is not None else "-"
+        print(f"[DETECTOR] {candidate:<9} {r['ms']:7.2f} ms/frame | recall {recall} | "
+              f"false positives {r['false_positives']}")
+    print(f"✓ Face detector: {name}")
+    return backend
+
+
+def build_pipeline():
+    # Load the models in the background while audio and camera start up
+    models = ModelManager.instance()
+    try:
+        models.preload(EYE_MODEL if EYE_ONLY_LANDMARKS else LANDMARK_MODEL)
+    except FileNotFoundError as e:
+        print(f"ERROR: {e}")
+        return None
+
+    # Sounds are decoded once here; playback runs on its own audio thread
+    alarm = AudioAlarmSink(AlarmEngine(make_backend(ALARM_BACKEND, ALARM_SINK_PATH),
+                                       ALARM_HIGH_SOUND, ALARM_LOW_SOUND))
+
+    print("Initializing camera and face detector...")
+    # Capture runs on its own thread so detection always gets the newest frame
+    source = CameraSource(0, width=640, height=480, fps=30, pixel_format=CAMERA_PIXEL_FORMAT)
+    if not source.open():
+        print("ERROR: Could not open camera")
+        alarm.close()
+        return None
+    print(f"📷 Camera pixel format: {source.pixel_format}")
+
+    try:
+        backend = choose_face_detector(source)
+    except (ValueError, FileNotFoundError, RuntimeError, cv2.error) as e:
+        print(f"ERROR: Could not create face detector '{FACE_DETECTOR}': {e}")
+        source.close()
+        alarm.close()
+        return None
 
-        frame_count += 1
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces every frame
-        faces = hog_face_detector(gray)
-        
-        current_time = time.time()
-
-        # Process if faces detected
-        if len(faces) > 0:
-            face = faces[0]
-            
-            try:
-                face_landmarks = dlib_facelandmark(gray, face)
-            except Exception as e:
-                print(f"Warning: Could not extract landmarks: {e}")
-                continue
-
-            leftEye = []
-            rightEye = []
-
-            # Extract Left Eye (Points 36-41)
-            for n in range(36, 42):
-                x = face_landmarks.part(n).x
-                y = face_landmarks.part(n).y
-                leftEye.append((x, y))
-                
-                next_point = n + 1
-                if n == 41: next_point = 36
-                x2 = face_landmarks.part(next_point).x
-                y2 = face_landmarks.part(next_point).y
-                cv2.line(frame, (x, y), (x2, y2), (0, 255, 0), 2)
-
-            # Extract Right Eye (Points 42-47)
-            for n in range(42, 48):
-                x = face_landmarks.part(n).x
-                y = face_landmarks.part(n).y
-                rightEye.append((x, y))
-                
-                next_point = n + 1
-                if n == 47: next_point = 42
-                x2 = face_landmarks.part(next_point).x
-                y2 = face_landmarks.part(next_point).y
-                cv2.line(frame, (x, y), (x2, y2), (0, 255, 0), 2)
-
-            # Calculate EAR
-            try:
-                left_ear = calculate_EAR(leftEye)
-                right_ear = calculate_EAR(rightEye)
-                EAR = (left_ear + right_ear) / 2
-                EAR = round(EAR, 2)
-            except Exception as e:
-                print(f"Warning: EAR calculation error: {e}")
-                continue
-
-            # --- Drowsiness Detection Logic ---
-            
-            # Severe Drowsiness (EAR < 0.26)
-            if EAR < EYE_AR_THRESH:
-                DROWSY_COUNTER += 1
-                PRE_DROWSY_COUNTER = 0
-                AWAKE_COUNTER = 0  # 🌟 ریست counter بیداری
-                
-                if DROWSY_COUNTER >= CONSEC_FRAMES_HIGH:
-                    cv2.putText(frame, "!!! DROWSY ALERT !!!", (20, 100),
-                                cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 4)
-                    
-                    # Play high alarm with cooldown
-                    if (current_time - last_alarm_time_high) > ALARM_COOLDOWN:
-                        if alarm_high is not None:
-                            try:
-                                pygame.mixer.stop()
-                                alarm_high.play()
-                                print(f"[{time.strftime('%H:%M:%S')}] 🚨 HIGH ALARM - EAR: {EAR}")
-                            except Exception as e:
-                                print(f"Error playing high alarm: {e}")
-                        
-                        alarm_high_on = True
-                        alarm_low_on = False
-                        last_alarm_time_high = current_time
-
-            # Fatigue (0.26 <= EAR < 0.30)
-            elif EAR < EYE_AR_PRE_THRESH:
-                PRE_DROWSY_COUNTER += 1
-                DROWSY_COUNTER = 0
-                AWAKE_COUNTER = 0  # 🌟 ریست counter بیداری
-                
-                if PRE_DROWSY_COUNTER >= CONSEC_FRAMES_LOW:
-                    cv2.putText(frame, "Tired - Take a Break!", (20, 100),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 165, 255), 3)
-                    
-                    # Play low alarm with cooldown
-                    if (current_time - last_alarm_time_low) > ALARM_COOLDOWN:
-                        if alarm_low is not None:
-                            try:
-                                pygame.mixer.stop()
-                                alarm_low.play()
-                                print(f"[{time.strftime('%H:%M:%S')}] ⚠️ LOW ALARM - EAR: {EAR}")
-                            except Exception as e:
-                                print(f"Error playing low alarm: {e}")
-                        
-                        alarm_low_on = True
-                        alarm_high_on = False
-                        last_alarm_time_low = current_time
-            
-            # Normal State (Awake - EAR >= 0.30)
-            else:
-                AWAKE_COUNTER += 1  # 🌟 افزایش counter بیداری
-                
-                # 🌟 اگر چند فریم متوالی چشم باز بود، فوراً آلارم را قطع کن
-                if AWAKE_COUNTER >= AWAKE_FRAMES_NEEDED:
-                    # قطع فوری آلارم
-                    if alarm_high_on or alarm_low_on:
-                        try:
-                            pygame.mixer.stop()
-                            print(f"[{time.strftime('%H:%M:%S')}] ✅ Driver is AWAKE - Alarm STOPPED - EAR: {EAR}")
-                        except Exception as e:
-                            print(f"Error stopping alarm: {e}")
-                    
-                    # Reset all counters
-                    DROWSY_COUNTER = 0
-                    PRE_DROWSY_COUNTER = 0
-                    alarm_high_on = False
-                    alarm_low_on = False
-                
-                cv2.putText(frame, "Active - Monitoring", (20, 100),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-            # Display information
-            cv2.putText(frame, f"EAR: {EAR}", (10, 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Status bar at bottom
-            status_text = f"Drowsy: {DROWSY_COUNTER}/{CONSEC_FRAMES_HIGH} | Tired: {PRE_DROWSY_COUNTER}/{CONSEC_FRAMES_LOW} | Awake: {AWAKE_COUNTER}"
-            cv2.putText(frame, status_text, (10, 450),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    if TRACK_ALL_FACES:
+        detector = MultiFaceDetector(driver_policy=DRIVER_POSITION,
+                                     min_confidence=TRACK_MIN_CONFIDENCE,
+                                     hog_detector=backend)
+    else:
+        detector = TrackingFaceDetector(redetect_interval=REDETECT_INTERVAL,
+                                        min_confidence=TRACK_MIN_CONFIDENCE,
+                                        scale=DETECT_SCALE,
+                                        max_misses=DETECT_MAX_MISSES,
+                                        hog_detector=backend)
 
+    model = EYE_MODEL if EYE_ONLY_LANDMARKS else LANDMARK_MODEL
+    try:
+        if EYE_ONLY_LANDMARKS:
+            landmarks = EyeRegionLandmarkExtractor(EYE_MODEL, anchor_model=EYE_ANCHOR_MODEL)
         else:
-            # No face detected
-            cv2.putText(frame, "No Face Detected", (20, 100),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            
-            # Gradually reset counters
-            DROWSY_COUNTER = max(0, DROWSY_COUNTER - 1)
-            PRE_DROWSY_COUNTER = max(0, PRE_DROWSY_COUNTER - 1)
-            AWAKE_COUNTER = 0
-
-        # Show frame
-        cv2.imshow("Driver Drowsiness Detection System", frame)
-
-        # Check for ESC key to exit
-        key = cv2.waitKey(1) & 0xFF
-        if key == 27:  # ESC
-            print("\n[EXIT] User pressed ESC - Closing program...")
-            break
-        elif key == ord('r'):  # Press 'r' to reset counters
-            DROWSY_COUNTER = 0
-            PRE_DROWSY_COUNTER = 0
-            AWAKE_COUNTER = 0
-            pygame.mixer.stop()
-            print("[RESET] Counters reset manually & alarm stopped")
+            landmarks = DlibLandmarkExtractor(LANDMARK_MODEL)
+        load_times = ", ".join(f"{name} {sec:.2f}s" for name, sec in models.load_times().items())
+        print(f"✓ Face landmark detector loaded ({load_times}).")
+        if EYE_ONLY_LANDMARKS:
+            print_model_sizes(models)
+    except (FileNotFoundError, RuntimeError, ValueError) as e:
+        print(f"ERROR: Could not load '{model}': {e}")
+        source.close()
+        alarm.close()
+        return None
+
+    state = DrowsinessStateMachine(ear_thresh=EYE_AR_THRESH,
+                                   ear_pre_thresh=EYE_AR_PRE_THRESH,
+                                   closed_ms_high=CLOSED_MS_HIGH,
+                                   fatigue_ms_low=FATIGUE_MS_LOW,
+                                   awake_ms_needed=AWAKE_MS_NEEDED,
+                                   alarm_cooldown=ALARM_COOLDOWN,
+                                   closure_stats=EyeClosureStats(window_s=PERCLOS_WINDOW_S,
+                                                                 closed_thresh=EYE_AR_THRESH)
+                                   if PERCLOS_WINDOW_S else None)
+
+    calibrator = None
+    if DRIVER_ID:
+        calibrator = EarCalibrator(DriverProfileStore(PROFILES_PATH), DRIVER_ID)
+        if calibrator.loaded:
+            print(f"✓ Driver '{DRIVER_ID}': thresholds {calibrator.ear_thresh:.3f} / "
+                  f"{calibrator.ear_pre_thresh:.3f} (from {calibrator.sessions} session(s))")
+        else:
+            print(f"Calibrating new driver '{DRIVER_ID}' - keep your eyes open normally...")
+
+    landmark_filter, ear_filter = make_filters(LANDMARK_FILTER, EAR_FILTER, landmarks.num_parts)
+
+    telemetry = None
+    if TELEMETRY_PATH:
+        telemetry = TelemetryWriter(TELEMETRY_PATH)
+        print(f"✓ Telemetry -> {TELEMETRY_PATH}")
+
+    events = None
+    sinks = [spec.strip() for spec in EVENT_SINKS.split(",") if spec.strip()]
+    if sinks:
+        try:
+            events = EventPublisher(sinks, driver_id=DRIVER_ID or None).start()
+            print(f"✓ Alert events -> {', '.join(sinks)}")
+        except (ValueError, OSError) as e:
+            print(f"WARNING: Could not set up the event sinks: {e}")
+
+    recorder = None
+    if CLIPS_DIR:
+        recorder = ClipRecorder(CLIPS_DIR, pre_s=CLIP_PRE_S, post_s=CLIP_POST_S, fps=CLIP_FPS)
+        print(f"✓ Alarm clips -> {CLIPS_DIR}/ ({CLIP_PRE_S}s before, {CLIP_POST_S}s after)")
+
+    return Pipeline(source, detector, landmarks,
+                    state_machine=state,
+                    alarm=alarm,
+                    telemetry=telemetry,
+                    profiler=StageProfiler(enabled=PROFILE_STAGES),
+                    governor=RateGovernor(idle_hz=IDLE_RATE_HZ, ear_pre_thresh=EYE_AR_PRE_THRESH)
+                    if ADAPTIVE_RATE else None,
+                    calibrator=calibrator,
+                    landmark_filter=landmark_filter,
+                    ear_filter=ear_filter,
+                    motion_gate=MotionGate(max_skip_s=MOTION_MAX_SKIP_S) if MOTION_GATE else None,
+                    events=events,
+                    recorder=recorder)
+
+
+def print_stats(pipeline):
+    grab_stats = pipeline.source.stats()
+    print(f"[STATS] Frames captured: {grab_stats['captured']} | "
+          f"processed: {grab_stats['delivered']} | dropped: {grab_stats['dropped']}")
+    detect_stats = pipeline.detector.stats()
+    print(f"[STATS] Full face detections: {detect_stats['detections_run']}/{detect_stats['frames']} "
+          f"frames ({detect_stats['detection_rate'] * 100:.1f}%)")
+    if "tracks_created" in detect_stats:
+        print(f"[STATS] Face tracks created: {detect_stats['tracks_created']} | "
+              f"driver changes: {detect_stats['driver_changes']}")
+    else:
+        print(f"[STATS] Detector hits - ROI: {detect_stats['roi_hits']} | "
+              f"downscaled: {detect_stats['downscaled_hits']} | "
+              f"full-frame scans: {detect_stats['full_frame_searches']}")
+    if pipeline.governor is not None:
+        gov = pipeline.governor.stats()
+        print(f"[STATS] Frames analysed: {gov['frames_processed']}/{gov['frames_seen']} | "
+              f"skipped while alert: {gov['skipped_fraction'] * 100:.1f}% | "
+              f"CPU saved: ~{gov['cpu_saved_s']:.1f}s | "
+              f"idle sampling: every {gov['idle_sample_ms']:.0f} ms (shorter blinks may be missed)")
+    if pipeline.motion_gate is not None:
+        gate = pipeline.motion_gate.stats()
+        print(f"[STATS] Unchanged frames reused: {gate['frames_skipped']}/{gate['frames_seen']} "
+              f"({gate['skipped_fraction'] * 100:.1f}%) | forced refreshes: {gate['forced_refreshes']}")
+    if pipeline.calibrator is not None:
+        cal = pipeline.calibrator.summary()
+        print(f"[STATS] Driver '{cal['driver']}': open-eye EAR {cal['open_ear']} | "
+              f"thresholds {cal['ear_thresh']} / {cal['ear_pre_thresh']} | sessions: {cal['sessions']}")
+    if pipeline.state.closure_stats is not None:
+        closure = pipeline.state.closure_stats.summary()
+        print(f"[STATS] Last {closure['window_s']}s - PERCLOS: {closure['perclos'] * 100:.1f}% | "
+              f"blinks/min: {closure['blink_rate_per_min']} | "
+              f"mean blink: {closure['mean_blink_ms']} ms | micro-sleeps: {closure['microsleeps']}")
+    if pipeline.events is not None:
+        events = pipeline.events.stats()
+        print(f"[STATS] Alert events published: {events['published']} | dropped: {events['dropped']}")
+        for name, sink in events["sinks"].items():
+            print(f"[STATS]   {name}: delivered {sink['delivered']} | failures {sink['failures']} | "
+                  f"dropped {sink['dropped']} | pending {sink['pending']}")
+    if pipeline.recorder is not None:
+        clips = pipeline.recorder.stats()
+        print(f"[STATS] Alarm clips written: {clips['clips_written']}/{clips['clips_started']} | "
+              f"dropped: {clips['clips_dropped']} | buffer: {clips['buffered_kb']} KB")
+    if pipeline.telemetry is not None:
+        print(f"[STATS] Telemetry records written: {pipeline.telemetry.records_written}")
+    pipeline.profiler.print_summary()
+
+
+# -------------------------------------------------------------------------
+def make_preview(control):
+    if PREVIEW == "window":
+        return WindowPreview(WINDOW_NAME, max_fps=PREVIEW_FPS, control=control).start()
+    if PREVIEW == "mjpeg":
+        preview = MjpegPreview(port=PREVIEW_PORT, max_fps=PREVIEW_FPS).start()
+        print(f"✓ Preview stream -> {preview.url}")
+        return preview
+    if PREVIEW != "none":
+        print(f"WARNING: Unknown preview '{PREVIEW}', running headless")
+    return None
+
+
+def draw_overlay(frame, result, pipeline):
+    draw_result(frame, result, pipeline.state)
+    if result.tracks is not None:
+        draw_tracks(frame, result, pipeline.detector.track_set.driver_id)
+    if SHOW_PROFILE_HUD:
+        pipeline.profiler.draw(frame)
+        if pipeline.governor is not None:
+            cv2.putText(frame, f"Analysis: {pipeline.governor.rate_hz():.0f} Hz "
+                               f"({pipeline.governor.mode})", (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+    closure = pipeline.state.closure_stats
+    if closure is not None:
+        cv2.putText(frame, f"PERCLOS: {closure.perclos * 100:.1f}% | "
+                           f"Blinks/min: {closure.blink_rate:.0f}", (10, 80),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
 
-except KeyboardInterrupt:
-    print("\n[EXIT] Program interrupted by user (Ctrl+C)")
+def main():
+    started = time.perf_counter()
+    pipeline = build_pipeline()
+    if pipeline is None:
+        return 1
 
-except Exception as e:
-    print(f"\n[ERROR] Unexpected error occurred: {e}")
-    import traceback
-    traceback.print_exc()
+    control = ControlChannel()
+    control.install_signal_handlers()
+    if CONTROL_SOCKET:
+        try:
+            control.listen(CONTROL_SOCKET)
+            print(f"✓ Control socket -> {CONTROL_SOCKET}")
+        except OSError as e:
+            print(f"WARNING: Could not open control socket '{CONTROL_SOCKET}': {e}")
+    preview = make_preview(control)
+
+    quit_hint = "ESC in the window" if PREVIEW == "window" else "Ctrl+C / SIGTERM"
+    print(f"✓ Starting monitoring... ({quit_hint} to quit)")
+    print("-" * 60)
+    first_ear = []
+    calibrated = []
+    compared = [not (EYE_ONLY_LANDMARKS and EYE_ONLY_COMPARE)]
+
+    def on_frame(result):
+        if not first_ear and result.ear is not None:
+            first_ear.append(time.perf_counter() - started)
+            print(f"[STARTUP] First valid EAR {first_ear[0]:.2f}s after start")
+        if not compared[0] and result.face is not None and result.gray is not None:
+            compared[0] = True
+            threading.Thread(target=report_eye_only, daemon=True,
+                             args=(pipeline.landmarks, result.gray.copy(), result.face)).start()
+        if not calibrated and pipeline.calibrator is not None and pipeline.calibrator.done:
+            calibrated.append(True)
+            cal = pipeline.calibrator
+            print(f"[CALIBRATION] Open-eye EAR {cal.open_ear:.3f} -> thresholds "
+                  f"{cal.ear_thresh:.3f} / {cal.ear_pre_thresh:.3f} (saved)")
+
+        # Draw only the frames the preview will show (never when headless)
+        canvas = (preview.canvas(result.frame, pipeline.source.bgr)
+                  if preview is not None else None)
+        if canvas is not None:
+            draw_overlay(canvas, result, pipeline)
+            preview.publish()
+            pipeline.profiler.lap("draw")
+
+        command = control.poll()
+        if command == CMD_QUIT:
+            print("\n[EXIT] Quit requested - Closing program...")
+            return False
+        elif command == CMD_RESET:
+            pipeline.reset()
+            print("[RESET] Counters reset manually & alarm stopped")
+        elif command == CMD_STATS:
+            print_stats(pipeline)
+        return True
 
-finally:
-    # Cleanup
-    print("\n[CLEANUP] Shutting down...")
-    
     try:
-        pygame.mixer.stop()
-        pygame.mixer.quit()
-    except:
-        pass
-    
-    cap.release()
-    cv2.destroyAllWindows()
-    
-    print("[DONE] Program closed successfully.")
-    print("=" * 60)
+        pipeline.run(on_frame)
+
+    except KeyboardInterrupt:
+        print("\n[EXIT] Program interrupted by user (Ctrl+C)")
+
+    except Exception as e:
+        print(f"\n[ERROR] Unexpected error occurred: {e}")
+        import traceback
+        traceback.print_exc()
+
+    finally:
+        # Cleanup
+        print("\n[CLEANUP] Shutting down...")
+        if preview is not None:
+            preview.close()
+        control.close()
+        pipeline.close()
+        print_stats(pipeline)
+
+        print("[DONE] Program closed successfully.")
+        print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
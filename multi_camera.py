@@ -0,0 +1,45 @@
+"""
+Monitor several cameras / drivers from one process.
+
+    python multi_camera.py 0 1 rtsp://127.0.0.1:8554/cab3 recordings/cab4.mp4 --workers 4
+
+Streams can be device indices, video files or network URLs. Detection and
+landmarks run in a shared pool of worker processes (models loaded once per
+worker); every stream has its own drowsiness state.
+"""
+import argparse
+import os
+
+from drowsiness import MODEL_68
+from drowsiness.server import MultiStreamServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera drowsiness server")
+    parser.add_argument("streams", nargs="+", help="device indices, video files or URLs")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="detector worker processes")
+    parser.add_argument("--model", default=MODEL_68, help="68-point shape predictor")
+    parser.add_argument("--no-realtime", action="store_true",
+                        help="replay video files as fast as possible without dropping frames")
+    parser.add_argument("--status-every", type=float, default=10.0,
+                        help="seconds between status lines (0 = off)")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    server = MultiStreamServer(args.streams, workers=args.workers, model=args.model,
+                               realtime=not args.no_realtime)
+    print(f"✓ Serving {len(server.streams)} stream(s) with {args.workers} worker(s)...")
+    server.start()
+    try:
+        server.serve(status_every=args.status_every, duration=args.duration)
+    finally:
+        print("\n[CLEANUP] Shutting down...")
+        server.stop()
+        server.print_status()
+        print("[DONE]")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
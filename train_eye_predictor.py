@@ -0,0 +1,196 @@
+"""
+Builds the compact 12-point eye predictor used by EyeRegionLandmarkExtractor.
+
+Takes iBUG-style dlib XML annotations (e.g. the 300-W
+labels_ibug_300W_train.xml, 68 points per face box), keeps points 36-47,
+replaces every face box with its eye band (ear.eye_region, the same band
+the live stage uses) and trains a small dlib shape predictor on that.
+
+With --test, the new model is checked against the 68-point model on the
+test set: fitting time, model size, memory after loading and how far its
+EAR is from the 68-point EAR.
+
+    python train_eye_predictor.py labels_ibug_300W_train.xml --test labels_ibug_300W_test.xml
+    python train_eye_predictor.py --compare-only --test labels_ibug_300W_test.xml
+"""
+import argparse
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import cv2
+import numpy as np
+
+from drowsiness import EYE_MODEL, MODEL_68, ModelManager
+from drowsiness.ear import eye_aspect_ratio, eye_region, landmarks_to_array
+from drowsiness.models import load_measured
+
+EYE_POINTS = range(36, 48)
+
+
+# -------------------------------------------------------------------------
+def convert_annotations(xml_in, xml_out):
+    """
+    Writes an eye-band copy of a 68-point dataset. Image paths are made
+    absolute, so the new XML can live anywhere. Returns (kept, skipped) boxes.
+    """
+    tree = ET.parse(xml_in)
+    base = os.path.dirname(os.path.abspath(xml_in))
+    kept = skipped = 0
+
+    for image in tree.getroot().iter("image"):
+        image.set("file", os.path.join(base, image.get("file")))
+        for box in list(image.findall("box")):
+            parts = {int(p.get("name")): p for p in box.findall("part")}
+            if box.get("ignore") == "1" or any(i not in parts for i in EYE_POINTS):
+                image.remove(box)
+                skipped += 1
+                continue
+
+            left, top = int(box.get("left")), int(box.get("top"))
+            right = left + int(box.get("width")) - 1
+            bottom = top + int(box.get("height")) - 1
+            x0, y0, x1, y1 = eye_region(left, top, right, bottom)
+            box.set("left", str(x0))
+            box.set("top", str(y0))
+            box.set("width", str(x1 - x0 + 1))
+            box.set("height", str(y1 - y0 + 1))
+
+            for index, part in parts.items():
+                if index in EYE_POINTS:
+                    part.set("name", f"{index - EYE_POINTS.start:02d}")
+                else:
+                    box.remove(part)
+            kept += 1
+
+    tree.write(xml_out)
+    return kept, skipped
+
+
+def train(xml, model_out, tree_depth=3, cascade_depth=10, trees_per_level=300,
+          oversampling=20, nu=0.1, feature_pool_size=400):
+    import dlib
+
+    options = dlib.shape_predictor_training_options()
+    options.tree_depth = tree_depth
+    options.cascade_depth = cascade_depth
+    options.num_trees_per_cascade_level = trees_per_level
+    options.oversampling_amount = oversampling
+    options.nu = nu
+    options.feature_pool_size = feature_pool_size
+    options.num_threads = os.cpu_count() or 1
+    options.be_verbose = True
+    dlib.train_shape_predictor(xml, model_out, options)
+
+
+# -------------------------------------------------------------------------
+def compare_models(xml_68, eye_model, reference=MODEL_68, max_faces=500):
+    """
+    Fits both models on the faces of a 68-point test set and returns
+    {"eye": {...}, "68": {...}, "ear_mae": ..., "faces": ...}.
+    """
+    import dlib
+
+    models = ModelManager.instance()
+    eye_path, ref_path = models.resolve(eye_model), models.resolve(reference)
+    eye, eye_rss = load_measured(eye_path)
+    ref, ref_rss = load_measured(ref_path)
+
+    eye_ms, ref_ms, ear_errors = [], [], []
+    base = os.path.dirname(os.path.abspath(xml_68))
+    for image in ET.parse(xml_68).getroot().iter("image"):
+        gray = cv2.imread(os.path.join(base, image.get("file")), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        for box in image.findall("box"):
+            if box.get("ignore") == "1":
+                continue
+            left, top = int(box.get("left")), int(box.get("top"))
+            right = left + int(box.get("width")) - 1
+            bottom = top + int(box.get("height")) - 1
+            face = dlib.rectangle(left, top, right, bottom)
+
+            start = time.perf_counter()
+            ref_points = landmarks_to_array(ref(gray, face))
+            ref_ms.append((time.perf_counter() - start) * 1000.0)
+            start = time.perf_counter()
+            eye_points = landmarks_to_array(eye(gray, dlib.rectangle(*eye_region(left, top, right, bottom))))
+            eye_ms.append((time.perf_counter() - start) * 1000.0)
+
+            ear_errors.append(abs(np.mean(eye_aspect_ratio(eye_points))
+                                  - np.mean(eye_aspect_ratio(ref_points))))
+            if len(ear_errors) >= max_faces:
+                break
+        if len(ear_errors) >= max_faces:
+            break
+
+    def summary(path, times, rss):
+        return {
+            "file_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+            "rss_mb": round(rss, 1) if rss is not None else None,
+            "ms_per_face": round(float(np.median(times)), 3) if times else None,
+        }
+
+    return {
+        "eye": summary(eye_path, eye_ms, eye_rss),
+        "68": summary(ref_path, ref_ms, ref_rss),
+        "ear_mae": round(float(np.mean(ear_errors)), 4) if ear_errors else None,
+        "faces": len(ear_errors),
+    }
+
+
+def print_comparison(report):
+    eye, ref = report["eye"], report["68"]
+    print(f"--- {report['faces']} test faces")
+    for name, r in (("68-point", ref), ("eye", eye)):
+        print(f"    {name:<9} {r['ms_per_face']} ms/face | file {r['file_mb']} MB | "
+              f"memory after load +{r['rss_mb']} MB")
+    if eye["ms_per_face"] and ref["ms_per_face"]:
+        print(f"    speedup x{ref['ms_per_face'] / eye['ms_per_face']:.1f} | "
+              f"model {ref['file_mb'] - eye['file_mb']:.1f} MB smaller | "
+              f"EAR mean abs. difference {report['ear_mae']}")
+
+
+# -------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Train the 12-point eye predictor")
+    parser.add_argument("train_xml", nargs="?", help="iBUG-style 68-point training XML")
+    parser.add_argument("--test", help="68-point test XML (accuracy and the comparison)")
+    parser.add_argument("--out", default=os.path.join("models", EYE_MODEL), help="model output path")
+    parser.add_argument("--tree-depth", type=int, default=3)
+    parser.add_argument("--cascade-depth", type=int, default=10)
+    parser.add_argument("--trees-per-level", type=int, default=300)
+    parser.add_argument("--oversampling", type=int, default=20)
+    parser.add_argument("--compare-only", action="store_true",
+                        help="skip training, compare an existing --out model on --test")
+    args = parser.parse_args()
+
+    if not args.compare_only:
+        if not args.train_xml:
+            parser.error("train_xml is required unless --compare-only is given")
+        if os.path.dirname(args.out):
+            os.makedirs(os.path.dirname(args.out), exist_ok=True)
+        eye_xml = os.path.splitext(args.out)[0] + "_train.xml"
+        kept, skipped = convert_annotations(args.train_xml, eye_xml)
+        print(f"✓ {kept} eye regions -> {eye_xml} ({skipped} boxes skipped)")
+        if kept == 0:
+            print("ERROR: No usable 68-point boxes in the training XML")
+            return 1
+
+        start = time.time()
+        train(eye_xml, args.out, tree_depth=args.tree_depth, cascade_depth=args.cascade_depth,
+              trees_per_level=args.trees_per_level, oversampling=args.oversampling)
+        print(f"✓ Trained {args.out} in {time.time() - start:.0f}s")
+
+    if args.test:
+        import dlib
+
+        test_xml = os.path.splitext(args.out)[0] + "_test.xml"
+        convert_annotations(args.test, test_xml)
+        print(f"[TEST] Mean landmark error: {dlib.test_shape_predictor(test_xml, args.out):.2f} px")
+        print_comparison(compare_models(args.test, os.path.abspath(args.out)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())